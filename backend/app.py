@@ -208,6 +208,19 @@ async def startup_event():
     print("[STARTUP] App is up. Scheduling background cache load...")
     asyncio.create_task(_background_cache_load())
 
+    try:
+        from sf_replica import replica_enabled, start_replica_worker
+        if replica_enabled():
+            start_replica_worker()
+    except Exception as e:
+        print(f"[WARNING] Salesforce replica not started: {e}")
+
+    try:
+        from routes.vcr_index import get_vcr_index
+        get_vcr_index()
+    except Exception as e:
+        print(f"[WARNING] VCR index not started: {e}")
+
 
 @app.get("/health")
 async def health():
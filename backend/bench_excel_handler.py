@@ -0,0 +1,115 @@
+"""
+Benchmark for excel_handler lease cleaning.
+
+Builds synthetic lease registers (merged-cell gaps, a mix of numeric cells,
+'£1,234.56' text cells, dashes and blanks) and measures rows/sec for the vectorised
+clean_hsbc_leases() against the old per-cell apply(clean_currency_column)
+pipeline. Also checks both produce the same numbers.
+
+Usage:
+    python bench_excel_handler.py              # 1k, 10k, 100k rows
+    python bench_excel_handler.py 5000 250000  # custom sizes
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from excel_handler import CURRENCY_COLUMNS, clean_currency_column, clean_currency_series, clean_hsbc_leases
+
+
+def make_register(rows, seed=42):
+    """Synthetic register shaped like HSBC_Leases.xlsx after pd.read_excel."""
+    rng = np.random.default_rng(seed)
+
+    def money(n):
+        # read_excel hands back numbers for numeric cells and strings for text
+        # cells: ~70% floats, ~25% '£12,345.00' text, the rest '-' or blank
+        amounts = np.round(rng.uniform(0, 60000, n))
+        values = pd.Series(amounts, dtype=object)
+        text = rng.random(n) < 0.25
+        values[text] = [f"£{a:,.2f}" for a in amounts[text]]
+        values[rng.random(n) < 0.03] = '-'
+        values[rng.random(n) < 0.02] = None
+        return values
+
+    identifiers = pd.Series([f"HSBC {i // 4}" for i in range(rows)], dtype=object)
+    identifiers[np.arange(rows) % 4 != 0] = None  # merged cells → NaN below the first row
+
+    data = {
+        'Identifier ': identifiers,
+        'Type': rng.choice(['Motor Vehicle', 'Equipment'], rows),
+        'Registration ': [f"AB{i % 100:02d} {chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}C" for i in range(rows)],
+        'Make and Model ': rng.choice(['Ford Transit', 'VW Crafter', 'Vauxhall Vivaro'], rows),
+        'Term (months)': rng.choice([36, 48, 60], rows),
+        'Agreement Start Date ': pd.to_datetime('2022-01-01') + pd.to_timedelta(rng.integers(0, 900, rows), unit='D'),
+    }
+    for col in CURRENCY_COLUMNS:
+        data[f"{col} (£)"] = money(rows)
+    return pd.DataFrame(data)
+
+
+def legacy_clean(df):
+    """The pre-vectorisation pipeline: per-column ffill, per-cell apply, per-value '£' scan."""
+    df.columns = df.columns.str.strip()
+    df.columns = [c.replace(' (£)', '') for c in df.columns]
+    df = df.rename(columns={'Registration': 'Registration Doc', 'Term (months)': 'Agreement term (months)'})
+    for column in df.columns:
+        df[column] = df[column].ffill()
+    for col in CURRENCY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].apply(clean_currency_column)
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            sample_values = df[col].dropna().head(5).astype(str)
+            if any('£' in str(val) for val in sample_values):
+                df[col] = df[col].apply(clean_currency_column)
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.dropna(axis=1, how='all').dropna(how='all').reset_index(drop=True)
+    return df
+
+
+def timed(fn, df, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        frame = df.copy()
+        started = time.perf_counter()
+        result = fn(frame)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _currency_only(clean_column):
+    def run(df):
+        for col in df.columns:
+            if col.startswith(tuple(CURRENCY_COLUMNS)):
+                df[col] = clean_column(df[col])
+        return df
+    return run
+
+
+def main(sizes):
+    print(f"{'rows':>8} | {'step':<16} | {'legacy rows/s':>14} | {'vectorised rows/s':>17} | {'speed-up':>8}")
+    print("-" * 77)
+    for rows in sizes:
+        df = make_register(rows)
+        repeat = 3 if rows <= 10_000 else 1
+
+        legacy_s, legacy = timed(legacy_clean, df, repeat)
+        fast_s, fast = timed(lambda d: clean_hsbc_leases(d, verbose=False), df, repeat)
+        for col in CURRENCY_COLUMNS:
+            if not np.allclose(legacy[col].to_numpy(float), fast[col].to_numpy(float), equal_nan=True):
+                raise AssertionError(f"'{col}' differs between legacy and vectorised cleaning")
+        print(f"{rows:>8} | {'full pipeline':<16} | {rows / legacy_s:>14,.0f} | {rows / fast_s:>17,.0f} | {legacy_s / fast_s:>7.1f}x")
+
+        legacy_s, _ = timed(_currency_only(lambda c: pd.to_numeric(c.apply(clean_currency_column), errors='coerce')), df, repeat)
+        fast_s, _ = timed(_currency_only(clean_currency_series), df, repeat)
+        print(f"{rows:>8} | {'currency columns':<16} | {rows / legacy_s:>14,.0f} | {rows / fast_s:>17,.0f} | {legacy_s / fast_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
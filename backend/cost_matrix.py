@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+cost_matrix.py — columnar vehicle × cost-type totals.
+
+GROUP BY Vehicle__c, Type__c rows are packed into a dense float matrix
+(one row per vehicle, one column per type) so fleet totals, per-type totals,
+rankings and monthly averages are numpy reductions instead of nested dict
+loops. Vehicle order follows the vehicle list passed in.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class CostMatrix:
+    def __init__(self, vehicle_ids: List[str], types: List[str],
+                 values: np.ndarray, present: np.ndarray):
+        self.vehicle_ids = vehicle_ids
+        self.types       = types
+        self.values      = values     # float64 [n_vehicles, n_types]
+        self.present     = present    # bool    [n_vehicles, n_types] — a row existed
+
+    @classmethod
+    def from_grouped_rows(cls, vehicle_ids: List[str], rows: List[dict],
+                          amount_field: str, default_type: str = "Other") -> "CostMatrix":
+        """Build from aggregate rows {Vehicle__c, Type__c, <amount_field>}; unknown vehicles are dropped."""
+        index = {vid: i for i, vid in enumerate(vehicle_ids)}
+        type_index: Dict[str, int] = {}
+        coords = []
+        for r in rows:
+            i = index.get(r.get("Vehicle__c"))
+            if i is None:
+                continue
+            t = r.get("Type__c") or default_type
+            j = type_index.setdefault(t, len(type_index))
+            coords.append((i, j, float(r.get(amount_field) or 0)))
+
+        values  = np.zeros((len(vehicle_ids), len(type_index)), dtype=np.float64)
+        present = np.zeros(values.shape, dtype=bool)
+        if coords:
+            rows_i, cols_j, amounts = (np.array(c) for c in zip(*coords))
+            rows_i = rows_i.astype(np.intp)
+            cols_j = cols_j.astype(np.intp)
+            np.add.at(values, (rows_i, cols_j), amounts)
+            present[rows_i, cols_j] = True
+        return cls(list(vehicle_ids), list(type_index), values, present)
+
+    # ── reductions ───────────────────────────────────────────────────────────
+
+    def vehicle_totals(self) -> np.ndarray:
+        return self.values.sum(axis=1)
+
+    def type_totals(self) -> Dict[str, float]:
+        return dict(zip(self.types, self.values.sum(axis=0).tolist()))
+
+    def monthly_averages(self, months: int = 12) -> np.ndarray:
+        return self.vehicle_totals() / months
+
+    def vehicles_with_costs(self) -> int:
+        return int(self.present.any(axis=1).sum())
+
+    def ranking(self, limit: Optional[int] = None) -> np.ndarray:
+        """Vehicle indexes by total cost, highest first (ties keep input order)."""
+        order = np.argsort(-np.round(self.vehicle_totals(), 2), kind="stable")
+        return order if limit is None else order[:limit]
+
+    def breakdown(self, i: int) -> Dict[str, float]:
+        """{type: amount} for the types vehicle i actually has rows for."""
+        cols = np.flatnonzero(self.present[i])
+        return {self.types[j]: float(self.values[i, j]) for j in cols}
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+driver_index.py — one identity per driver across Webfleet and Salesforce.
+
+Webfleet knows drivers by name1/drivername, email and driver number;
+Salesforce by ServiceResource Id, Name and RelatedRecord.Email. The names
+rarely agree byte-for-byte ("Smith, John", "John Smith (SM6)", "JOHN  SMITH"),
+which used to make score joins and chat lookups miss silently.
+
+DriverIndex merges the sources into identities keyed by email, driver
+number, SF Id and normalised name, with:
+  - lookup()  — exact id/email, then normalised name, then word-order-free
+                name, then (optionally) a trigram fuzzy match with a single
+                plausible candidate
+  - search()  — substring and fuzzy name search for chat, via token and
+                trigram posting lists instead of scanning every driver
+
+The process-wide index is rebuilt (and swapped in whole) whenever a source
+refreshes: update_driver_index(webfleet_drivers=...) after the OptiDrive pull,
+update_driver_index(engineers=...) after the leaderboard rebuild.
+"""
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+_BRACKETS_RE = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+FUZZY_MIN_SCORE = 0.8     # Dice similarity a lookup() fuzzy match must reach
+FUZZY_MIN_MARGIN = 0.1    # ... with no runner-up within this of the threshold
+SEARCH_MIN_SCORE = 0.5
+
+
+def normalise_name(name) -> str:
+    """'  Smith-Jones, JOHN (SM6) + van ' → 'smith jones john'"""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    text = _BRACKETS_RE.sub(" ", text).split("+")[0].lower()
+    return " ".join(_NON_ALNUM_RE.sub(" ", text).split())
+
+
+def token_key(name: str) -> str:
+    """Word-order-free key: 'smith john' and 'john smith' agree."""
+    return " ".join(sorted(normalise_name(name).split()))
+
+
+def trigrams(text: str, padded: bool = True) -> set:
+    text = f"  {text} " if padded else text
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def _clean(value) -> str:
+    return str(value).strip().lower() if value else ""
+
+
+class DriverIndex:
+    def __init__(self):
+        self.entries: List[dict] = []
+        self._by_email: Dict[str, int] = {}
+        self._by_driver_no: Dict[str, int] = {}
+        self._by_sf_id: Dict[str, int] = {}
+        self._by_name: Dict[str, List[int]] = defaultdict(list)
+        self._by_token_key: Dict[str, List[int]] = defaultdict(list)
+        self._by_token: Dict[str, set] = defaultdict(set)
+        self._by_trigram: Dict[str, set] = defaultdict(set)
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ── building ─────────────────────────────────────────────────────────────
+
+    def add(self, name: str = None, email: str = None, driver_no: str = None,
+            sf_id: str = None, source: str = None, data=None) -> dict:
+        """Add (or merge into an existing) identity; returns the entry."""
+        email, driver_no, sf_id = _clean(email), _clean(driver_no), (sf_id or "").strip()
+        key = normalise_name(name)
+
+        i = (self._by_email.get(email) if email else None)
+        if i is None and driver_no:
+            i = self._by_driver_no.get(driver_no)
+        if i is None and sf_id:
+            i = self._by_sf_id.get(sf_id)
+        if i is None and key:
+            # Same name: merge when unambiguous and either this record has no
+            # email to disagree with, or the match came from the other system
+            # (Webfleet and Salesforce emails often differ for one person)
+            same = set(self._by_name.get(key, ())) or set(self._by_token_key.get(token_key(key), ()))
+            if len(same) == 1:
+                j = next(iter(same))
+                if not email or (source and source not in self.entries[j]["sources"]):
+                    i = j
+
+        if i is None:
+            i = len(self.entries)
+            self.entries.append({"id": i, "name": name or "", "email": "", "emails": [], "driver_no": "",
+                                 "sf_id": "", "names": set(), "sources": set(), "data": None})
+        entry = self.entries[i]
+
+        if email and email not in entry["emails"]:
+            entry["emails"].append(email)
+            entry["email"] = entry["email"] or email
+            self._by_email.setdefault(email, i)
+        if driver_no and not entry["driver_no"]:
+            entry["driver_no"] = driver_no
+            self._by_driver_no[driver_no] = i
+        if sf_id and not entry["sf_id"]:
+            entry["sf_id"] = sf_id
+            self._by_sf_id[sf_id] = i
+        if source:
+            entry["sources"].add(source)
+        if data is not None:
+            entry["data"] = data
+        if key and key not in entry["names"]:
+            entry["names"].add(key)
+            if name and (source == "salesforce" or not entry["name"]):
+                entry["name"] = name
+            self._by_name[key].append(i)
+            self._by_token_key[token_key(key)].append(i)
+            for tok in key.split():
+                self._by_token[tok].add(i)
+            for g in trigrams(key, padded=False):
+                self._by_trigram[g].add(i)
+        return entry
+
+    # ── reads ────────────────────────────────────────────────────────────────
+
+    def by_email(self, email) -> Optional[dict]:
+        i = self._by_email.get(_clean(email))
+        return self.entries[i] if i is not None else None
+
+    def by_driver_no(self, driver_no) -> Optional[dict]:
+        i = self._by_driver_no.get(_clean(driver_no))
+        return self.entries[i] if i is not None else None
+
+    def by_sf_id(self, sf_id) -> Optional[dict]:
+        i = self._by_sf_id.get((sf_id or "").strip())
+        return self.entries[i] if i is not None else None
+
+    def lookup(self, name: str = None, email: str = None, driver_no: str = None,
+               sf_id: str = None, fuzzy: bool = True) -> Optional[dict]:
+        """The single identity these details point to, or None if absent / ambiguous."""
+        for found in (self.by_email(email) if email else None,
+                      self.by_driver_no(driver_no) if driver_no else None,
+                      self.by_sf_id(sf_id) if sf_id else None):
+            if found is not None:
+                return found
+
+        key = normalise_name(name)
+        if not key:
+            return None
+        for hits in (self._by_name.get(key), self._by_token_key.get(token_key(key))):
+            if hits:
+                unique = set(hits)
+                return self.entries[hits[0]] if len(unique) == 1 else None
+        if not fuzzy:
+            return None
+
+        # Fuzzy fallback only with a single plausible candidate: two similar
+        # names ("Jon Smith" / "John Smith") must not share one driver's score
+        ranked = self._fuzzy(key, limit=2)
+        if not ranked or ranked[0][0] < FUZZY_MIN_SCORE:
+            return None
+        if len(ranked) > 1 and (ranked[1][0] >= FUZZY_MIN_SCORE - FUZZY_MIN_MARGIN
+                                or ranked[0][0] - ranked[1][0] < FUZZY_MIN_MARGIN):
+            print(f"[DRIVERS] Ambiguous fuzzy match for '{name}': "
+                  f"{[self.entries[i]['name'] for _, i in ranked]} - skipped")
+            return None
+        entry = self.entries[ranked[0][1]]
+        print(f"[DRIVERS] Fuzzy match '{name}' -> '{entry['name']}' ({ranked[0][0]:.2f})")
+        return entry
+
+    def search(self, query: str, limit: int = 20, min_score: float = SEARCH_MIN_SCORE) -> List[dict]:
+        """
+        Identities whose name contains the query (or is contained in it), then
+        fuzzy matches — best first.
+        """
+        q = normalise_name(query)
+        if not q:
+            return []
+        q_tokens = q.split()
+        matches: Dict[int, float] = {}
+
+        # query ⊂ name: every unpadded trigram of the query must be in the name
+        grams = trigrams(q, padded=False)
+        if grams:
+            candidates = set.intersection(*(self._by_trigram.get(g, set()) for g in grams))
+        else:
+            # 1–2 characters: names with a token starting with it
+            candidates = {i for tok, ids in self._by_token.items() if tok.startswith(q) for i in ids}
+        for i in candidates:
+            if any(q in key for key in self.entries[i]["names"]):
+                matches[i] = 1.0
+
+        # name ⊂ query: every token of the name appears in the query
+        token_hits = defaultdict(int)
+        for tok in set(q_tokens):
+            for i in self._by_token.get(tok, ()):
+                token_hits[i] += 1
+        for i, n in token_hits.items():
+            if i not in matches and any(
+                    n >= len(key.split()) and key in q for key in self.entries[i]["names"]):
+                matches[i] = 1.0
+
+        for score, i in self._fuzzy(q, limit=limit):
+            if score >= min_score and i not in matches:
+                matches[i] = score
+
+        ranked = sorted(matches.items(), key=lambda kv: (-kv[1], self.entries[kv[0]]["name"]))
+        return [self.entries[i] for i, _ in ranked[:limit]]
+
+    def _fuzzy(self, key: str, limit: int) -> List[tuple]:
+        """[(dice score, entry id)] ranked, using trigram postings to pick candidates."""
+        q_grams = trigrams(key, padded=False)
+        counts = defaultdict(int)
+        for g in q_grams:
+            for i in self._by_trigram.get(g, ()):
+                counts[i] += 1
+        if not counts:
+            return []
+        # Only score entries sharing a fair share of trigrams
+        floor = max(1, len(q_grams) // 3)
+        q_padded = trigrams(key)
+        scored = []
+        for i, n in counts.items():
+            if n < floor:
+                continue
+            best = max(_dice(q_padded, trigrams(k)) for k in self.entries[i]["names"])
+            scored.append((best, i))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return scored[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "identities": len(self.entries),
+            "with_email": len(self._by_email),
+            "with_driver_no": len(self._by_driver_no),
+            "with_sf_id": len(self._by_sf_id),
+            "linked": sum(1 for e in self.entries if len(e["sources"]) > 1),
+        }
+
+
+def build_driver_index(webfleet_drivers: Iterable[dict] = (), engineers: Iterable[dict] = ()) -> DriverIndex:
+    """
+    webfleet_drivers: showDriverReportExtern rows (name1/drivername, email, driverno)
+    engineers:        {'Id', 'Name', 'Email', 'data'} per Salesforce engineer
+    """
+    index = DriverIndex()
+    for d in webfleet_drivers or ():
+        if isinstance(d, dict):
+            index.add(name=d.get("name1") or d.get("drivername"), email=d.get("email"),
+                      driver_no=d.get("driverno"), source="webfleet")
+    for e in engineers or ():
+        index.add(name=e.get("Name"), email=e.get("Email"), sf_id=e.get("Id"),
+                  source="salesforce", data=e.get("data"))
+    return index
+
+
+# ── process-wide index ──────────────────────────────────────────────────────
+
+_sources = {"webfleet": [], "salesforce": []}
+_index = DriverIndex()
+_index_lock = threading.Lock()
+
+
+def update_driver_index(webfleet_drivers: List[dict] = None, engineers: List[dict] = None) -> DriverIndex:
+    """Replace one or both sources and swap in a freshly built index."""
+    global _index
+    with _index_lock:
+        if webfleet_drivers is not None:
+            _sources["webfleet"] = webfleet_drivers
+        if engineers is not None:
+            _sources["salesforce"] = engineers
+        _index = build_driver_index(_sources["webfleet"], _sources["salesforce"])
+        print(f"[DRIVERS] Identity index rebuilt: {_index.stats()}")
+        return _index
+
+
+def get_driver_index() -> DriverIndex:
+    return _index
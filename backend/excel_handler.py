@@ -3,6 +3,7 @@ Excel handler for HSBC Leases data
 Handles merged cells, cleans currency columns, and converts to numeric values
 """
 
+import numpy as np
 import pandas as pd
 import openpyxl
 from pathlib import Path
@@ -37,61 +38,72 @@ def clean_currency_column(value):
         return None
 
 
-def unmerge_cells_forward_fill(df, file_path):
+# Everything that is not part of the number: currency symbol, thousands separators
+_CURRENCY_NOISE_RE = r'[£,]'
+
+# Currency columns to clean
+CURRENCY_COLUMNS = [
+    'Net Capital',
+    'VAT on Acquisition',
+    'RFL',
+    'Capital Cost',
+    'Arrangement Fee',
+    'Finance Interest',
+    'Initial Payment',
+    'Monthly Installment',
+    'Final Payment',
+    'Total Repayment'
+]
+
+
+def clean_currency_series(series):
     """
-    Handle merged cells in Excel by forward filling NaN values in each column.
+    Vectorised clean_currency_column over a whole column.
+    '£1,234.50' → 1234.5; blanks, dashes and anything unparseable → NaN
+
+    Cells pandas already read as numbers go through one pd.to_numeric pass;
+    only text cells are stripped of '£' / ',' and parsed, each distinct
+    value once (merged cells are forward filled, so values repeat heavily).
     """
-    for column in df.columns:
-        df[column] = df[column].ffill()
-    return df
+    if pd.api.types.is_bool_dtype(series):
+        return pd.Series(float('nan'), index=series.index)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
 
+    cells = series.to_numpy(dtype=object)
+    is_text = np.fromiter((type(v) is str for v in cells), dtype=bool, count=len(cells))
+    # bools are not amounts (float('True') fails in clean_currency_column too)
+    is_other = ~is_text & np.fromiter((type(v) is not bool for v in cells), dtype=bool, count=len(cells))
 
-def read_and_clean_hsbc_leases(file_path, sheet_name=None, verbose=True):
-    """
-    Read HSBC Leases Excel file and clean the data.
-    Auto-detects sheet name if not provided.
+    values = np.full(len(cells), np.nan)
+    if is_other.any():
+        values[is_other] = pd.to_numeric(pd.Series(cells[is_other]), errors='coerce').to_numpy(dtype='float64')
+    if is_text.any():
+        codes, uniques = pd.factorize(cells[is_text])
+        cleaned = pd.Series(uniques, dtype=object).str.replace(_CURRENCY_NOISE_RE, '', regex=True)
+        values[is_text] = pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype='float64')[codes]
+    return pd.Series(values, index=series.index, name=series.name)
 
-    Args:
-        file_path: Path to HSBC_Leases.xlsx or HSBC_Leases_Fixed.xlsx
-        sheet_name: Sheet name to read (auto-detected if None)
 
-    Returns:
-        Cleaned DataFrame with proper data types and filled merged cells
+def unmerge_cells_forward_fill(df, file_path=None):
     """
+    Handle merged cells in Excel by forward filling NaN values in each column.
+    """
+    return df.ffill()
 
-    # Currency columns to clean
-    currency_columns = [
-        'Net Capital',
-        'VAT on Acquisition',
-        'RFL',
-        'Capital Cost',
-        'Arrangement Fee',
-        'Finance Interest',
-        'Initial Payment',
-        'Monthly Installment',
-        'Final Payment',
-        'Total Repayment'
-    ]
-
-    # Auto-detect sheet name
-    if sheet_name is None:
-        xl = pd.ExcelFile(file_path)
-        available = xl.sheet_names
-        if 'Leases' in available:
-            sheet_name = 'Leases'
-        else:
-            sheet_name = available[0]
-        if verbose:
-            print(f"Auto-detected sheet: '{sheet_name}' (available: {available})")
 
-    # Read Excel file
-    if verbose:
-        print(f"Reading Excel file: {file_path}")
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
+def _looks_like_currency(series, sample_size=5):
+    sample = series.dropna().head(sample_size)
+    return bool(len(sample)) and sample.astype(str).str.contains('£', regex=False).any()
 
-    if verbose:
-        print(f"Original shape: {df.shape}")
 
+def clean_hsbc_leases(df, verbose=True):
+    """
+    Cleaning half of read_and_clean_hsbc_leases: normalise column names,
+    forward fill merged cells, convert currency columns to floats and drop
+    empty rows/columns. Works on any DataFrame, so it can be benchmarked
+    without an xlsx round trip.
+    """
     # Strip whitespace from column names
     if verbose:
         print("\nStripping whitespace from column names...")
@@ -115,39 +127,31 @@ def read_and_clean_hsbc_leases(file_path, sheet_name=None, verbose=True):
     # Forward fill merged cells
     if verbose:
         print("\nHandling merged cells with forward fill...")
-    df = unmerge_cells_forward_fill(df, file_path)
+    df = unmerge_cells_forward_fill(df)
     
     # Clean currency columns
     if verbose:
         print("\nCleaning currency columns...")
-    for col in currency_columns:
+    to_clean = []
+    for col in CURRENCY_COLUMNS:
         if col in df.columns:
-            if verbose:
-                print(f"  - Cleaning '{col}'")
-            df[col] = df[col].apply(clean_currency_column)
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            to_clean.append(col)
         else:
             # Try to find similar column names
             matching_cols = [c for c in df.columns if col.lower() in c.lower()]
             if matching_cols:
-                actual_col = matching_cols[0]
-                if verbose:
-                    print(f"  - Cleaning '{actual_col}' (mapped from '{col}')")
-                df[actual_col] = df[actual_col].apply(clean_currency_column)
-                df[actual_col] = pd.to_numeric(df[actual_col], errors='coerce')
-    
-    # Clean all remaining columns that might contain currency
-    if verbose:
-        print("\nCleaning all remaining currency-like columns...")
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            # Check if column contains currency values
-            sample_values = df[col].dropna().head(5).astype(str)
-            if any('£' in str(val) for val in sample_values):
-                if verbose:
-                    print(f"  - Cleaning '{col}' (contains currency)")
-                df[col] = df[col].apply(clean_currency_column)
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+                to_clean.append(matching_cols[0])
+
+    # Any other text column that contains currency values
+    to_clean += [
+        col for col in df.columns
+        if col not in to_clean and df[col].dtype == 'object' and _looks_like_currency(df[col])
+    ]
+
+    for col in dict.fromkeys(to_clean):
+        if verbose:
+            print(f"  - Cleaning '{col}'")
+        df[col] = clean_currency_series(df[col])
     
     # Drop unnamed columns and empty columns
     if verbose:
@@ -171,6 +175,41 @@ def read_and_clean_hsbc_leases(file_path, sheet_name=None, verbose=True):
     return df
 
 
+def read_and_clean_hsbc_leases(file_path, sheet_name=None, verbose=True):
+    """
+    Read HSBC Leases Excel file and clean the data.
+    Auto-detects sheet name if not provided.
+
+    Args:
+        file_path: Path to HSBC_Leases.xlsx or HSBC_Leases_Fixed.xlsx
+        sheet_name: Sheet name to read (auto-detected if None)
+
+    Returns:
+        Cleaned DataFrame with proper data types and filled merged cells
+    """
+
+    # Auto-detect sheet name
+    if sheet_name is None:
+        xl = pd.ExcelFile(file_path)
+        available = xl.sheet_names
+        if 'Leases' in available:
+            sheet_name = 'Leases'
+        else:
+            sheet_name = available[0]
+        if verbose:
+            print(f"Auto-detected sheet: '{sheet_name}' (available: {available})")
+
+    # Read Excel file
+    if verbose:
+        print(f"Reading Excel file: {file_path}")
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+
+    if verbose:
+        print(f"Original shape: {df.shape}")
+
+    return clean_hsbc_leases(df, verbose=verbose)
+
+
 def get_lease_summary(df):
     """
     Get summary statistics of the lease data
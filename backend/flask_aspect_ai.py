@@ -287,7 +287,7 @@ def chat():
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'healthy', 'auth_configured': bool(MICROSOFT_CLIENT_ID and MICROSOFT_CLIENT_SECRET), 'salesforce_connected': sf_service is not None, 'webfleet_connected': wf_service is not None, 'groq_initialized': groq_service is not None, 'production_ready': all([sf_service, wf_service, groq_service])})
+    return jsonify({'status': 'healthy', 'auth_configured': bool(MICROSOFT_CLIENT_ID and MICROSOFT_CLIENT_SECRET), 'salesforce_connected': sf_service is not None, 'webfleet_connected': wf_service is not None, 'groq_initialized': groq_service is not None, 'production_ready': all([sf_service, wf_service, groq_service]), 'intent_router': groq_service.intent_stats() if hasattr(groq_service, 'intent_stats') else None})
 
 
 if __name__ == '__main__':
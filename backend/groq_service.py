@@ -18,12 +18,18 @@ Changes from original:
 
   - Added analyse_vehicle_images for VCR AI image analysis (llama-3.2-11b-vision-preview)
 
+  - Local fast-path intent routing (intent_router.py) ahead of the LLM classifier
+
 """
 import os
 import json
 import re
 import base64
+import hashlib
+import threading
 import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 
@@ -39,6 +45,8 @@ except ImportError:
 
 
 from salesforce_service import SalesforceService
+from driver_index import get_driver_index
+from intent_router import IntentRouter
 
 
 # Try to import Webfleet service
@@ -50,6 +58,30 @@ except ImportError:
     print("[WARNING] WebfleetService not available")
 
 
+# VCR image analysis: parallel vision calls, reports cached by image content hash
+VCR_AI_CONCURRENCY = int(os.getenv("VCR_AI_CONCURRENCY", "4"))
+VCR_AI_CACHE_SIZE  = int(os.getenv("VCR_AI_CACHE_SIZE", "2000"))
+
+_image_reports: "OrderedDict[str, Dict]" = OrderedDict()
+_image_reports_lock = threading.Lock()
+
+
+def _cached_image_report(key: str) -> Optional[Dict]:
+    with _image_reports_lock:
+        report = _image_reports.get(key)
+        if report is not None:
+            _image_reports.move_to_end(key)
+        return report
+
+
+def _remember_image_report(key: str, report: Dict):
+    with _image_reports_lock:
+        _image_reports[key] = report
+        _image_reports.move_to_end(key)
+        while len(_image_reports) > VCR_AI_CACHE_SIZE:
+            _image_reports.popitem(last=False)
+
+
 class GroqService:
     """
     Intelligent AI service that understands user intent and routes to 
@@ -57,6 +89,8 @@ class GroqService:
     """
 
     def __init__(self, driver_cache=None):
+        self.intent_router = IntentRouter(known_locations=self._known_locations)
+
         if not GROQ_AVAILABLE:
             print("[WARNING] Groq not available - chat will have limited functionality")
             self.client = None
@@ -112,6 +146,11 @@ class GroqService:
         print("[OK] GroqService: Salesforce service attached")
 
 
+    def _known_locations(self) -> list:
+        sf = getattr(self, "sf", None)
+        return sf.get_service_territories() if sf else []
+
+
     def set_webfleet_service(self, wf_service):
         self.webfleet = wf_service
         print("[OK] GroqService: Webfleet service attached")
@@ -121,6 +160,11 @@ class GroqService:
         return self.client is not None
 
 
+    def intent_stats(self) -> dict:
+        """Fast-path vs LLM intent classification counters."""
+        return self.intent_router.stats()
+
+
     def _search_driver_cache(self, driver_name: str) -> List[Dict[str, Any]]:
         """
         Search driver cache with partial name matching (case-insensitive)
@@ -129,6 +173,13 @@ class GroqService:
         if not driver_name or not self.driver_cache:
             return []
 
+        # Shared identity index (built with the leaderboard) — token/trigram
+        # lookup that also tolerates reordered or misspelt names
+        index = get_driver_index()
+        hits = [e['data'] for e in index.search(driver_name) if e.get('data') is not None]
+        if hits:
+            return hits
+
         clean_search = re.sub(r'\s*\([^)]*\)\s*', ' ', driver_name).strip().lower()
 
         matches = []
@@ -152,6 +203,17 @@ class GroqService:
             return {"intent": {"intent": "error"}, "data": [], "count": 0, "error": "Groq service not available"}
 
         try:
+            # Fast path: confident local classification skips the LLM round trip
+            intent_data = self.intent_router.route(user_question)
+            if intent_data is not None:
+                print(f"⚡ Intent (fast path): {intent_data['intent']} | Entity: {intent_data.get('entity')} | Source: {intent_data.get('source', 'auto')}")
+                result = self._execute_intent(intent_data)
+                return {
+                    "intent": intent_data,
+                    "data": result,
+                    "count": len(result) if isinstance(result, list) else (1 if result else 0)
+                }
+
             last_vehicle = self._extract_vehicle_from_history(conversation_history or [])
             last_driver = self._extract_driver_from_history(conversation_history or [])
 
@@ -280,6 +342,7 @@ Output ONLY valid JSON:
             intent_data = json.loads(intent_json)
 
             print(f"🎯 Intent: {intent_data['intent']} | Entity: {intent_data.get('entity')} | Source: {intent_data.get('source', 'auto')}")
+            self.intent_router.record_llm(user_question, intent_data, last_vehicle, last_driver)
 
             result = self._execute_intent(intent_data)
 
@@ -511,13 +574,16 @@ Keep response under 200 words."""
         """
         Sends each VCR image to Llama Vision and returns a condition report per image.
         Uses the SAME self.client (same API key), different model: llama-3.2-11b-vision-preview
+
+        Images are analysed VCR_AI_CONCURRENCY at a time and reports come back
+        in input order. Successful reports are remembered by the image's
+        cache_key (content hash), so re-analysis and identical photos skip the
+        model call.
         """
         if not self.is_available():
             return [{"error": "Groq service not available"}]
 
-        results = []
-
-        for image in images:
+        def _analyse(image: Dict) -> Dict:
             raw = ""
             try:
                 prompt = f"""You are a professional fleet vehicle inspector AI working for a UK utilities company.
@@ -581,28 +647,51 @@ Rules:
                 raw = response.choices[0].message.content.strip()
                 raw = raw.replace("```json", "").replace("```", "").strip()
                 parsed = json.loads(raw)
-                results.append(parsed)
                 print(f"[VCR_AI] ✅ Analysed: {image.get('title')} → {parsed.get('overall_condition')}")
+                _remember_image_report(image["cache_key"], parsed)
+                return parsed
 
             except json.JSONDecodeError:
                 print(f"[VCR_AI] ⚠️ JSON parse failed for {image.get('title')}")
-                results.append({
+                return {
                     "image_title": image.get('title', 'Unknown'),
                     "overall_condition": "AMBER",
                     "error": "Could not parse AI response",
                     "raw_response": raw,
                     "action_required": "Manual Review",
                     "priority": "MEDIUM"
-                })
+                }
 
             except Exception as e:
                 print(f"[VCR_AI] ❌ Error analysing {image.get('title')}: {e}")
-                results.append({
+                return {
                     "image_title": image.get('title', 'Unknown'),
                     "overall_condition": "AMBER",
                     "error": str(e),
                     "action_required": "Manual Review",
                     "priority": "MEDIUM"
-                })
+                }
+
+        # Reuse earlier reports; photos with identical content are analysed once
+        context = {"engineer": engineer_name, "vehicle": vehicle_name, "reg_no": reg_no}
+        results: List[Optional[Dict]] = [None] * len(images)
+        pending: Dict[str, List[int]] = {}
+        for i, image in enumerate(images):
+            image["cache_key"] = image.get("cache_key") or hashlib.sha256(image["base64"].encode()).hexdigest()
+            cached = _cached_image_report(image["cache_key"])
+            if cached is not None:
+                results[i] = {**cached, **context, "image_title": image.get("title", "Unknown")}
+            else:
+                pending.setdefault(image["cache_key"], []).append(i)
+
+        print(f"[VCR_AI] {len(images)} image(s): {len(images) - sum(map(len, pending.values()))} from cache, "
+              f"{len(pending)} to analyse")
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(VCR_AI_CONCURRENCY, len(pending))) as pool:
+                futures = {key: pool.submit(_analyse, images[idxs[0]]) for key, idxs in pending.items()}
+                for key, idxs in pending.items():
+                    report = futures[key].result()
+                    for i in idxs:
+                        results[i] = {**report, "image_title": images[i].get("title", "Unknown")}
 
         return results
\ No newline at end of file
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+image_cache.py — bounded on-disk cache for Salesforce ContentVersion images.
+
+ContentVersion rows are immutable (an edit creates a new version Id), so the
+VersionData bytes behind /api/vehicle-condition/image/{id} can be kept
+forever under their Id. The cache directory holds:
+
+    <id>            original bytes, streamed to disk straight from Salesforce
+    <id>.w320.jpg   resized thumbnails (widths snapped to THUMBNAIL_WIDTHS)
+    <id>.json       {content_type, etag} for the original
+
+Entries are evicted least-recently-used once the directory grows past
+IMAGE_CACHE_MAX_MB; access order survives restarts through file mtimes.
+original() and thumbnail() hand back an open file rather than a path, so an
+eviction that unlinks the entry mid-request can't pull it out from under a
+resize or a response. Responses are served from that handle in chunks with
+ETag / If-None-Match and single-range Range support.
+
+Thumbnails need Pillow; without it the original image is served instead.
+"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    print("[WARNING] Pillow not installed - image thumbnails disabled")
+
+_dir = os.path.dirname(os.path.abspath(__file__))
+
+IMAGE_CACHE_DIR    = os.getenv("IMAGE_CACHE_DIR", os.path.join(_dir, "image_cache"))
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+THUMBNAIL_WIDTHS   = (160, 320, 640, 1280)
+THUMBNAIL_QUALITY  = 80
+CHUNK_SIZE         = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_SAFE_ID_RE = re.compile(r"^[A-Za-z0-9]{15,18}$")
+
+
+def snap_width(width: int) -> int:
+    """Smallest configured thumbnail width ≥ width (bounds the number of variants)."""
+    for w in THUMBNAIL_WIDTHS:
+        if width <= w:
+            return w
+    return THUMBNAIL_WIDTHS[-1]
+
+
+class ImageCache:
+    def __init__(self, root: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()   # filename → size, oldest first
+        self._size = 0
+        self._fills: dict = {}                                    # filename → _Fill
+        self._stats = {"hits": 0, "misses": 0, "thumbnails": 0, "evictions": 0}
+        self._scan()
+
+    def _scan(self):
+        files = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+            elif os.path.isfile(path):
+                st = os.stat(path)
+                files.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+        if files:
+            print(f"[IMAGE_CACHE] {len(files)} files, {self._size / 1048576:.1f} MB in {self.root}")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    # ── bookkeeping ──────────────────────────────────────────────────────────
+
+    def _touch(self, name: str) -> bool:
+        with self._lock:
+            if name not in self._entries:
+                return False
+            self._entries.move_to_end(name)
+        try:
+            os.utime(self.path(name))
+        except OSError:
+            with self._lock:
+                self._size -= self._entries.pop(name, 0)
+            return False
+        return True
+
+    def _added(self, name: str):
+        size = os.path.getsize(self.path(name))
+        evict = []
+        with self._lock:
+            self._size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                evict.append(old)
+            self._stats["evictions"] += len(evict)
+        for old in evict:
+            try:
+                os.remove(self.path(old))
+            except OSError:
+                pass
+
+    @contextlib.asynccontextmanager
+    async def _filling(self, name: str):
+        """One fill per file at a time; later arrivals wait and then find it cached."""
+        fill = self._fills.get(name)
+        if fill is None:
+            fill = self._fills[name] = _Fill()
+        # Counted rather than lock.locked(): during the hand-off to a waiter
+        # the lock reads unlocked, and dropping it then would let a new
+        # arrival start a second download into the same .tmp file
+        fill.users += 1
+        try:
+            async with fill.lock:
+                yield
+        finally:
+            fill.users -= 1
+            if fill.users == 0 and self._fills.get(name) is fill:
+                del self._fills[name]
+
+    # ── fills ────────────────────────────────────────────────────────────────
+
+    async def original(self, version_id: str, download: Callable) -> Tuple[BinaryIO, dict]:
+        """
+        (open file, meta) for a version's bytes, downloading on a miss; the
+        caller closes the file. `download(dest_path)` must stream the body into
+        dest_path and return its content type. Concurrent misses for one Id
+        share a download.
+        """
+        if not _SAFE_ID_RE.match(version_id):
+            raise HTTPException(status_code=400, detail=f"Invalid ContentVersion Id: {version_id}")
+        meta_name = f"{version_id}.json"
+
+        async with self._filling(version_id):
+            if self._touch(version_id) and self._touch(meta_name):
+                self._stats["hits"] += 1
+                with open(self.path(meta_name)) as f:
+                    meta = json.load(f)
+                return open(self.path(version_id), "rb"), meta
+
+            self._stats["misses"] += 1
+            tmp = self.path(f"{version_id}.tmp")
+            try:
+                content_type = await download(tmp)
+                digest = await run_in_threadpool(_sha256_file, tmp)
+                os.replace(tmp, self.path(version_id))
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            meta = {"content_type": content_type, "etag": f'"{digest[:32]}"'}
+            with open(self.path(meta_name), "w") as f:
+                json.dump(meta, f)
+            # Open before _added(), which may evict
+            handle = open(self.path(version_id), "rb")
+            self._added(version_id)
+            self._added(meta_name)
+            return handle, meta
+
+    async def thumbnail(self, version_id: str, source: BinaryIO, meta: dict, width: int) -> Tuple[BinaryIO, dict]:
+        """
+        (open file, meta) of a JPEG at most `width` px wide, generated once
+        from the original's open file `source` (left open for the caller).
+        """
+        width = snap_width(width)
+        name = f"{version_id}.w{width}.jpg"
+        thumb_meta = {"content_type": "image/jpeg", "etag": meta["etag"][:-1] + f'-w{width}"'}
+
+        async with self._filling(name):
+            if self._touch(name):
+                self._stats["hits"] += 1
+                return open(self.path(name), "rb"), thumb_meta
+            tmp = self.path(f"{name}.tmp")
+            try:
+                await run_in_threadpool(_resize, source, tmp, width)
+                os.replace(tmp, self.path(name))
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            handle = open(self.path(name), "rb")
+            self._added(name)
+            self._stats["thumbnails"] += 1
+            return handle, thumb_meta
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "files": len(self._entries),
+                "size_mb": round(self._size / 1048576, 1),
+                "max_mb": round(self.max_bytes / 1048576, 1),
+                "thumbnails_enabled": PIL_AVAILABLE,
+            }
+
+
+class _Fill:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock  = asyncio.Lock()
+        self.users = 0
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _resize(source: BinaryIO, dest: str, width: int):
+    source.seek(0)
+    with Image.open(source) as img:
+        img.draft("RGB", (width, width * 4))     # JPEG: decode at reduced scale
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        if img.width > width:
+            img.thumbnail((width, width * 4))
+        img.save(dest, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+
+
+# ── serving ─────────────────────────────────────────────────────────────────
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _iter_file(f: BinaryIO, start: int, length: int):
+    with f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(request: Request, f: BinaryIO, meta: dict, cache_control: str) -> Response:
+    """
+    Serve an open cached file in chunks, honouring If-None-Match and a single
+    byte Range. Takes ownership of `f` and closes it.
+    """
+    etag = meta["etag"]
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Access-Control-Allow-Origin": "*",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        f.close()
+        return Response(status_code=304, headers=headers)
+
+    size = os.fstat(f.fileno()).st_size
+    start, end, status = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        m = _RANGE_RE.match(range_header.strip())
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            else:
+                start = max(0, size - int(m.group(2)))
+            if start > end or start >= size:
+                f.close()
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_file(f, start, end - start + 1), status_code=status,
+                             media_type=meta["content_type"], headers=headers)
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache()
+    return _cache
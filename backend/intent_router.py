@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+intent_router.py — local fast path in front of GroqService's LLM intent classifier.
+
+Most chatbot questions are short and unambiguous ("how many vehicles",
+"spare vans", "driver score for John Smith"). IntentRouter.route() answers
+those without a model call:
+
+  1. LRU of normalised questions → earlier classification (fast path or LLM)
+  2. regex rules for the intents that carry an entity or parameters
+     (vehicle ids, driver names, score thresholds, depots); a depot is only
+     taken from a question that is nothing but "vehicles at <depot>" and names
+     a known service territory
+  3. a small token classifier over the catalogue of example phrasings
+     (the same intents as the few-shot prompt), for parameter-free intents;
+     a question only matches an example that contains all of its words
+
+and returns None when it isn't confident, so the caller falls through to
+the LLM. Questions that lean on the conversation ("it", "that driver") always
+go to the LLM, which sees the history.
+
+Counters (fast-path / cache / LLM and the resulting hit rate) are in stats().
+"""
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, Optional
+
+INTENT_CACHE_SIZE = 512
+CLASSIFIER_MIN_SCORE = 0.75    # token-set Dice with the closest example phrasing
+CLASSIFIER_MIN_MARGIN = 0.15   # ... and lead over the best other intent
+
+_PUNCT_RE = re.compile(r"[^a-z0-9.\-\s]+|(?<!\d)\.|\.(?!\d)")   # keeps decimal points
+_VEHICLE_RE = re.compile(r"\bveh-?\s?(\d+)\b", re.IGNORECASE)
+_CONTEXTUAL_RE = re.compile(r"\b(it|its|this|that|these|those|them|he|she|his|her|they|their)\b")
+_NUMBER = r"(\d+(?:\.\d+)?)"
+
+_STOPWORDS = {"a", "an", "the", "me", "please", "can", "you", "could", "i", "we", "of", "is", "are",
+              "what", "whats", "do", "does", "to", "for", "out", "our", "my", "all", "give", "tell"}
+
+# Example phrasings per parameter-free intent (see the few-shot prompt in groq_service.py)
+INTENT_EXAMPLES = {
+    "count_all_vehicles": [
+        "how many vehicles are there", "how many vans", "total vehicles", "number of vehicles",
+        "vehicle count", "how many vehicles do we have", "fleet size", "total fleet",
+    ],
+    "list_all_drivers": [
+        "list all drivers", "show drivers", "who are the drivers", "driver list", "list drivers and vehicles",
+    ],
+    "list_webfleet_drivers": [
+        "driver scores", "driving scores", "list driver scores", "show all driver scores",
+        "get me driver scores", "list drivers from webfleet", "webfleet drivers", "drivers scores",
+    ],
+    "get_optidrive": [
+        "optidrive", "optidrive indicators", "show optidrive indicators", "optidrive data",
+    ],
+    "get_webfleet_vehicles": [
+        "webfleet vehicles", "show webfleet vehicles", "vehicles from webfleet", "webfleet vans",
+    ],
+    "get_spare_vehicles": [
+        "spare vehicles", "spare vans", "show spare vehicles", "available vehicles", "available vans",
+        "unallocated vehicles", "which vans are spare",
+    ],
+    "get_maintenance_schedule": [
+        "maintenance schedule", "service schedule", "vehicles due service", "upcoming maintenance",
+        "which vehicles need maintenance", "vehicles needing service",
+    ],
+}
+
+_COUNT_STATUSES = {"allocated": "Allocated", "spare": "Spare", "sold": "Sold", "garage": "Garage",
+                   "written off": "Written Off", "reserved": "Reserved"}
+
+# "vehicles at <depot>" — the whole (normalised) question, nothing before or after
+_LOCATION_RE = re.compile(r"^(?:show|list|get|find)?\s*(?:me )?(?:all )?(?:the )?(?:vehicles|vans) (?:at|in) "
+                          r"(?:the )?([a-z][a-z ]*?)(?: depot)?$")
+_LOCATION_REJECT_RE = re.compile(r"\b(at|in|on|near|from|for|with|by|allocated|spare|sold|garage|written|"
+                                 r"reserved|available|unallocated|risk|service|use|total|fleet)\b")
+
+
+def normalise_question(text: str) -> str:
+    """'  How many VANS?? ' → 'how many vans'"""
+    return " ".join(_PUNCT_RE.sub(" ", (text or "").lower()).split())
+
+
+def _tokens(text: str) -> set:
+    return {t.rstrip("s") if len(t) > 3 else t for t in text.split() if t not in _STOPWORDS}
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def _intent(name: str, entity=None, source: str = "salesforce", **parameters) -> dict:
+    return {"intent": name, "entity": entity, "parameters": parameters, "source": source}
+
+
+class IntentRouter:
+    def __init__(self, cache_size: int = INTENT_CACHE_SIZE,
+                 known_locations: Callable[[], Iterable[str]] = None):
+        self.cache_size = cache_size
+        # Service territory names, e.g. GroqService → SalesforceService.get_service_territories
+        self.known_locations = known_locations
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"fast_path": 0, "cache": 0, "llm": 0}
+        self._by_rule: Dict[str, int] = defaultdict(int)
+        # Compiled catalogue: [(intent, example token set)]
+        self._examples = [(intent, _tokens(normalise_question(e)))
+                          for intent, examples in INTENT_EXAMPLES.items() for e in examples]
+
+    # ── routing ──────────────────────────────────────────────────────────────
+
+    def route(self, question: str) -> Optional[dict]:
+        """Intent dict for a confident local classification, else None (ask the LLM)."""
+        q = normalise_question(question)
+        if not q or _CONTEXTUAL_RE.search(q):
+            return None
+
+        with self._lock:
+            cached = self._cache.get(q)
+            if cached is not None:
+                self._cache.move_to_end(q)
+                self._stats["cache"] += 1
+                return dict(cached)
+
+        found = self._rules(q, question) or self._classify(q)
+        if found is None:
+            return None
+        intent_data, rule = found
+        with self._lock:
+            self._stats["fast_path"] += 1
+            self._by_rule[rule] += 1
+        self._remember(q, intent_data)
+        return dict(intent_data)
+
+    def record_llm(self, question: str, intent_data: dict, last_vehicle: str = None, last_driver: str = None):
+        """
+        Count an LLM classification and cache it for identical, context-free questions.
+
+        The LLM also sees the previous vehicle/driver from the user's history, so
+        "show the costs" may resolve to one conversation's vehicle. Such results
+        are only cached when there was no history context, or when the entity
+        they carry is spelled out in the question itself.
+        """
+        with self._lock:
+            self._stats["llm"] += 1
+        q = normalise_question(question)
+        if not q or _CONTEXTUAL_RE.search(q) or intent_data.get("intent") in (None, "error"):
+            return
+        if last_vehicle or last_driver:
+            entity = normalise_question(str(intent_data.get("entity") or ""))
+            if not entity or not re.search(rf"(?<![\w-]){re.escape(entity)}(?![\w-])", q):
+                return
+        self._remember(q, intent_data)
+
+    def _remember(self, q: str, intent_data: dict):
+        with self._lock:
+            self._cache[q] = intent_data
+            self._cache.move_to_end(q)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ── rules ────────────────────────────────────────────────────────────────
+
+    def _rules(self, q: str, original: str) -> Optional[tuple]:
+        # Specific vehicle
+        m = _VEHICLE_RE.search(original)
+        if m:
+            veh = f"VEH-{m.group(1)}"
+            if re.search(r"\bwho\b.*\b(driv|allocat|assign|has)", q):
+                return _intent("get_vehicle_driver", veh), "vehicle_driver"
+            if re.search(r"\b(cost|costs|spend|spent|invoice)", q):
+                return _intent("get_vehicle_costs", veh), "vehicle_costs"
+            if re.search(r"\b(lease|leased|ownership|owned)\b", q):
+                return _intent("get_vehicle_lease", veh), "vehicle_lease"
+            if re.search(r"\b(mot|service|serviced|maintenance|repair)", q):
+                return _intent("get_vehicle_maintenance", veh), "vehicle_maintenance"
+            return _intent("get_vehicle_info", veh), "vehicle_info"
+
+        is_driver = re.search(r"\bdriv(er|ers|ing)\b", q)
+        is_score = re.search(r"\bscor(e|es|ing)\b|\boptidrive\b", q)
+
+        # Score thresholds
+        if is_driver or is_score:
+            m = re.search(rf"\bbetween {_NUMBER} and {_NUMBER}\b", q)
+            if m:
+                lo, hi = sorted((float(m.group(1)), float(m.group(2))))
+                return _intent("get_drivers_by_score_range", source="webfleet", min_score=lo, max_score=hi), "score_between"
+            m = re.search(rf"\b(above|over|higher than|more than|greater than|at least) {_NUMBER}\b", q)
+            if m:
+                return _intent("get_drivers_by_score_range", source="webfleet",
+                               min_score=float(m.group(2)), max_score=10), "score_above"
+            m = re.search(rf"\b(below|under|lower than|less than|at most) {_NUMBER}\b", q)
+            if m:
+                return _intent("get_drivers_by_score_range", source="webfleet",
+                               min_score=0, max_score=float(m.group(2))), "score_below"
+            m = re.search(rf"\bscore (?:of )?{_NUMBER}\b", q)
+            if m:
+                return _intent("get_drivers_by_score", source="webfleet", score=float(m.group(1))), "score_exact"
+            if re.search(r"\b(bad|poor|worst|weak|low scoring|lowest)\b|\blow scores?\b|\bpoorly\b", q):
+                return _intent("get_drivers_by_score_range", source="webfleet", min_score=0, max_score=5), "score_low"
+
+        # Score for a named driver
+        if is_score:
+            m = re.search(r"\b(?:score|scores|rating)\s+(?:for|of)\s+([A-Za-z][A-Za-z'\- ]+?)\s*\??$", original.strip())
+            if m and not re.search(r"\b(all|every|the|drivers?|engineers?|everyone)\b", m.group(1), re.IGNORECASE):
+                return _intent("get_driver_score", m.group(1).strip(), source="webfleet"), "driver_score"
+
+        # Counts by status
+        m = re.search(r"\bhow many (allocated|spare|sold|garage|written off|reserved) (vehicles|vans)\b", q)
+        if m:
+            return _intent("count_by_status", status=_COUNT_STATUSES[m.group(1)]), "count_status"
+
+        # Depot / location
+        m = _LOCATION_RE.match(q)
+        if m and not _LOCATION_REJECT_RE.search(m.group(1)):
+            location = self._known_location(m.group(1))
+            if location:
+                return _intent("get_vehicles_by_location", location=location), "location"
+
+        return None
+
+    def _known_location(self, candidate: str) -> Optional[str]:
+        """Territory name as stored in Salesforce, or None if it isn't one (→ LLM)."""
+        if self.known_locations is None:
+            return None
+        try:
+            names = {normalise_question(n): n for n in (self.known_locations() or []) if n}
+        except Exception as e:
+            print(f"[INTENT] ⚠️ Could not load service territories: {e}")
+            return None
+        return names.get(candidate) or names.get(f"{candidate} depot")
+
+    def _classify(self, q: str) -> Optional[tuple]:
+        tokens = _tokens(q)
+        if not tokens:
+            return None
+        best: Dict[str, float] = {}
+        for intent, example in self._examples:
+            # Every word of the question must be in the example: unexplained
+            # words ("best", "fuel", "last quarter") are what the LLM is for
+            if not tokens <= example:
+                continue
+            score = _dice(tokens, example)
+            if score > best.get(intent, 0.0):
+                best[intent] = score
+        ranked = sorted(best.items(), key=lambda kv: -kv[1])
+        if not ranked or ranked[0][1] < CLASSIFIER_MIN_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < CLASSIFIER_MIN_MARGIN:
+            return None
+        intent = ranked[0][0]
+        source = "webfleet" if intent in ("list_webfleet_drivers", "get_optidrive", "get_webfleet_vehicles") else "salesforce"
+        return _intent(intent, source=source), "classifier"
+
+    # ── metrics ──────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            by_rule = dict(self._by_rule)
+            cached = len(self._cache)
+        total = sum(stats.values())
+        return {
+            **stats,
+            "total": total,
+            "fast_path_hit_rate": round((stats["fast_path"] + stats["cache"]) / total, 3) if total else 0.0,
+            "by_rule": by_rule,
+            "cached_questions": cached,
+        }
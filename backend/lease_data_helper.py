@@ -18,70 +18,96 @@ except ImportError as e:
 import pandas as pd
 from pathlib import Path
 
-_trade_group_cache = None
-_trade_group_cache_df = None
-
-
-def get_lease_data(file_path=None, as_dict=False):
+from lease_repository import get_lease_repository
+
+_BASE_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
+_resolved_path = None
+
+
+def _default_lease_path():
+    """First HSBC_Leases workbook found; remembered until it disappears."""
+    global _resolved_path
+    if _resolved_path and os.path.isfile(_resolved_path):
+        return _resolved_path
+
+    possible_paths = [
+        Path("/app/HSBC_Leases_Fixed.xlsx"),
+        Path("/app/HSBC_Leases.xlsx"),
+        _BASE_DIR / "HSBC_Leases_Fixed.xlsx",
+        _BASE_DIR / "HSBC_Leases.xlsx",
+        _BASE_DIR / ".." / "HSBC_Leases_Fixed.xlsx",
+        _BASE_DIR / ".." / "HSBC_Leases.xlsx",
+    ]
+    for path in possible_paths:
+        if path.exists():
+            _resolved_path = str(path.absolute())
+            print(f"[INFO] Found HSBC_Leases file at: {_resolved_path}")
+            return _resolved_path
+    return None
+
+
+def _lease_snapshot(file_path=None):
+    """Parsed lease register for file_path (default workbook when None), or None."""
     if read_and_clean_hsbc_leases is None:
         print("[WARNING] excel_handler unavailable, returning empty DataFrame")
-        return [] if as_dict else pd.DataFrame()
+        return None
 
+    file_path = file_path or _default_lease_path()
     if file_path is None:
-        possible_paths = [
-            Path("/app/HSBC_Leases_Fixed.xlsx"),
-            Path("/app/HSBC_Leases.xlsx"),
-            Path(os.path.dirname(os.path.abspath(__file__))) / "HSBC_Leases_Fixed.xlsx",
-            Path(os.path.dirname(os.path.abspath(__file__))) / "HSBC_Leases.xlsx",
-            Path(os.path.dirname(os.path.abspath(__file__))) / ".." / "HSBC_Leases_Fixed.xlsx",
-            Path(os.path.dirname(os.path.abspath(__file__))) / ".." / "HSBC_Leases.xlsx",
-        ]
-
-        for path in possible_paths:
-            if path.exists():
-                file_path = str(path.absolute())
-                print(f"[INFO] Found HSBC_Leases file at: {file_path}")
-                break
-
-        if file_path is None:
-            print("[WARNING] HSBC_Leases.xlsx not found — returning empty data")
-            return [] if as_dict else pd.DataFrame()
+        print("[WARNING] HSBC_Leases.xlsx not found — returning empty data")
+        return None
 
     try:
-        df = read_and_clean_hsbc_leases(file_path, verbose=False)
-        if as_dict:
-            return df.to_dict('records')
-        return df
+        snap = get_lease_repository().snapshot(file_path)
+        snap.frame  # parse now so read errors surface here
+        return snap
     except Exception as e:
         print(f"[WARNING] Failed to read lease data: {e}")
+        return None
+
+
+def _from_index(index, key, as_dict):
+    df = index.get(key)
+    if df is None:
         return [] if as_dict else pd.DataFrame()
+    return df.to_dict('records') if as_dict else df
 
 
-def get_lease_by_identifier(identifier):
-    df = get_lease_data()
-    if df.empty:
-        return pd.DataFrame()
-    return df[df['Identifier'] == identifier]
+def get_lease_data(file_path=None, as_dict=False):
+    """Cleaned lease register. The DataFrame is shared — copy before modifying."""
+    snap = _lease_snapshot(file_path)
+    if snap is None:
+        return [] if as_dict else pd.DataFrame()
+    return snap.records if as_dict else snap.frame
 
 
-def get_leases_by_type(lease_type):
-    df = get_lease_data()
-    if df.empty:
-        return pd.DataFrame()
-    return df[df['Type'] == lease_type]
+def get_lease_by_identifier(identifier, as_dict=False):
+    snap = _lease_snapshot()
+    if snap is None:
+        return [] if as_dict else pd.DataFrame()
+    return _from_index(snap.by_identifier, identifier, as_dict)
 
 
-def get_financial_summary():
-    df = get_lease_data()
-    if df.empty:
-        return {'total_records': 0, 'motor_vehicles': 0, 'equipment': 0,
-                'total_net_capital': 0, 'total_capital_cost': 0, 'total_repayment': 0,
-                'avg_net_capital': 0, 'avg_capital_cost': 0, 'avg_repayment': 0}
+def get_leases_by_type(lease_type, as_dict=False):
+    snap = _lease_snapshot()
+    if snap is None:
+        return [] if as_dict else pd.DataFrame()
+    return _from_index(snap.by_type, lease_type, as_dict)
+
+
+def get_lease_by_registration(registration, as_dict=False):
+    snap = _lease_snapshot()
+    if snap is None:
+        return [] if as_dict else pd.DataFrame()
+    return _from_index(snap.by_registration, str(registration).strip().upper(), as_dict)
 
+
+def _financial_summary(snap):
+    df = snap.frame
     return {
         'total_records': len(df),
-        'motor_vehicles': len(df[df['Type'] == 'Motor Vehicle']) if 'Type' in df.columns else 0,
-        'equipment': len(df[df['Type'] == 'Equipment']) if 'Type' in df.columns else 0,
+        'motor_vehicles': len(snap.by_type.get('Motor Vehicle', ())) if 'Type' in df.columns else 0,
+        'equipment': len(snap.by_type.get('Equipment', ())) if 'Type' in df.columns else 0,
         'total_net_capital': float(df['Net Capital'].sum()) if 'Net Capital' in df.columns else 0,
         'total_capital_cost': float(df['Capital Cost'].sum()) if 'Capital Cost' in df.columns else 0,
         'total_repayment': float(df['Total Repayment'].sum()) if 'Total Repayment' in df.columns else 0,
@@ -91,52 +117,60 @@ def get_financial_summary():
     }
 
 
+def get_financial_summary():
+    snap = _lease_snapshot()
+    if snap is None or snap.frame.empty:
+        return {'total_records': 0, 'motor_vehicles': 0, 'equipment': 0,
+                'total_net_capital': 0, 'total_capital_cost': 0, 'total_repayment': 0,
+                'avg_net_capital': 0, 'avg_capital_cost': 0, 'avg_repayment': 0}
+    return dict(snap.derive('financial_summary', _financial_summary))
+
+
+# Vehicle__c changes rarely; the repository refreshes this map on its own TTL
+TRADE_GROUP_CACHE_TTL = 600
+
+
 def get_trade_groups():
     try:
-        from salesforce_service import SalesforceService
-        sf = SalesforceService()
+        from salesforce_service import get_salesforce_service
+        sf = get_salesforce_service()
         vehicle_query = """
             SELECT Reg_No__c, Trade_Group__c
             FROM Vehicle__c
             WHERE Reg_No__c != NULL
         """
-        vehicles = sf.sf.query_all(vehicle_query).get('records', [])
-        return {v.get('Reg_No__c', '').upper(): v.get('Trade_Group__c', 'Not Assigned') for v in vehicles}
+        vehicles = sf.query_soql(vehicle_query, cache_ttl=TRADE_GROUP_CACHE_TTL)
+        return {(v.get('Reg_No__c') or '').upper(): v.get('Trade_Group__c') or 'Not Assigned' for v in vehicles}
     except Exception as e:
         print(f"[WARNING] Could not load trade groups from Salesforce: {e}")
         return {}
 
 
-def get_lease_data_with_trade_groups(file_path=None, as_dict=False):
-    df = get_lease_data(file_path, as_dict=False)
-
-    if df is None or (isinstance(df, pd.DataFrame) and df.empty):
-        return [] if as_dict else pd.DataFrame()
-
-    reg_to_trade = get_trade_groups()
+def _trade_view(file_path=None):
+    snap = _lease_snapshot(file_path)
+    if snap is None or snap.frame.empty:
+        return None
+    return get_lease_repository().with_trade_groups(snap.path, get_trade_groups)
 
-    if 'Registration Doc' in df.columns:
-        df['Trade Group'] = df['Registration Doc'].apply(
-            lambda x: reg_to_trade.get(str(x).upper(), 'Not Assigned') if pd.notna(x) else 'Not Assigned'
-        )
-    else:
-        df['Trade Group'] = 'Not Assigned'
 
-    if as_dict:
-        return df.to_dict('records')
-    return df
+def get_lease_data_with_trade_groups(file_path=None, as_dict=False):
+    """Lease register plus a 'Trade Group' column. The DataFrame is shared — copy before modifying."""
+    view = _trade_view(file_path)
+    if view is None:
+        return [] if as_dict else pd.DataFrame()
+    df, records, _ = view
+    return records if as_dict else df
 
 
 def get_unique_trade_groups():
-    df = get_lease_data_with_trade_groups()
-    if isinstance(df, pd.DataFrame) and df.empty:
+    view = _trade_view()
+    if view is None:
         return []
-    trade_groups = df['Trade Group'].unique().tolist()
-    return sorted([t for t in trade_groups if t])
+    return sorted([t for t in view[2] if t])
 
 
-def get_leases_by_trade_group(trade_group):
-    df = get_lease_data_with_trade_groups()
-    if isinstance(df, pd.DataFrame) and df.empty:
-        return pd.DataFrame()
-    return df[df['Trade Group'] == trade_group]
+def get_leases_by_trade_group(trade_group, as_dict=False):
+    view = _trade_view()
+    if view is None:
+        return [] if as_dict else pd.DataFrame()
+    return _from_index(view[2], trade_group, as_dict)
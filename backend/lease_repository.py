@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+lease_repository.py — HSBC lease register parsed once per file version.
+
+Every lease endpoint used to reopen HSBC_Leases.xlsx (pandas or openpyxl) and
+re-clean it on each request. The repository keeps one parsed snapshot per
+workbook path and only re-parses when the file's mtime or size changes.
+
+Each snapshot holds:
+  - frame     — read_and_clean_hsbc_leases() output (shared, treat as read-only),
+                loaded from the columnar snapshot when one matches the file
+  - raw rows  — openpyxl rows keyed by the sheet's row-2 headers, as used by
+                the older /api/cost/leases/* endpoints
+  - indexes   — by registration, identifier and type, built on first use
+  - derive()  — any caller-specific view, computed once per file version
+
+Trade groups come from Salesforce (Vehicle__c.Reg_No__c → Trade_Group__c) and
+are refreshed every LEASE_TRADE_GROUP_TTL seconds; the trade-group view and
+its index are rebuilt only when that map actually changes.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+LEASE_TRADE_GROUP_TTL = int(os.getenv("LEASE_TRADE_GROUP_TTL", "600"))
+
+
+def _file_signature(path: str):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _normalise_reg(value) -> str:
+    return str(value).strip().upper() if value is not None and not pd.isna(value) else ""
+
+
+def _index_frame(df: pd.DataFrame, column: str, key: Callable = None) -> Dict[str, pd.DataFrame]:
+    if column not in df.columns:
+        return {}
+    keys = df[column].map(key) if key else df[column]
+    return {k: df.iloc[pos] for k, pos in keys.groupby(keys, sort=False).indices.items()}
+
+
+def _is_trade_map(value) -> bool:
+    return isinstance(value, dict) and all(
+        isinstance(k, str) and isinstance(v, str) for k, v in value.items())
+
+
+def _read_raw_rows(path: str) -> List[dict]:
+    """Rows 3+ keyed by the (unstripped) row-2 headers — the layout load_lease_data() used."""
+    import openpyxl
+    wb = openpyxl.load_workbook(path, data_only=True, read_only=True)
+    try:
+        rows = wb.active.iter_rows(min_row=2, values_only=True)
+        header_row = next(rows, ())
+        headers = [(i, h) for i, h in enumerate(header_row) if h]
+        out = []
+        for values in rows:
+            out.append({h: (values[i] if i < len(values) else None) for i, h in headers})
+        return out
+    finally:
+        wb.close()
+
+
+class LeaseSnapshot:
+    """One parsed version of a lease workbook plus lazily-built views of it."""
+
+    def __init__(self, path: str, signature):
+        self.path      = path
+        self.signature = signature
+        self.loaded_at = time.time()
+        self._lock     = threading.RLock()   # views may build on other views
+        self._views: Dict[str, object] = {}
+
+    def derive(self, name: str, builder: Callable[["LeaseSnapshot"], object]):
+        """builder(snapshot) computed once for this file version, then served from memory."""
+        view = self._views.get(name)
+        if view is None and name not in self._views:
+            with self._lock:
+                if name not in self._views:
+                    started = time.time()
+                    self._views[name] = builder(self)
+                    print(f"[LEASES] Built '{name}' for {os.path.basename(self.path)} in {time.time() - started:.3f}s")
+                view = self._views[name]
+        return view
+
+    # ── core views ───────────────────────────────────────────────────────────
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        def _load(_):
+            from lease_snapshot import load_cleaned_leases
+            return load_cleaned_leases(self.path)
+        return self.derive("frame", _load)
+
+    @property
+    def records(self) -> List[dict]:
+        return self.derive("records", lambda s: s.frame.to_dict("records"))
+
+    @property
+    def raw_rows(self) -> List[dict]:
+        return self.derive("raw_rows", lambda s: _read_raw_rows(s.path))
+
+    @property
+    def by_registration(self) -> Dict[str, pd.DataFrame]:
+        return self.derive("by_registration",
+                           lambda s: _index_frame(s.frame, "Registration Doc", _normalise_reg))
+
+    @property
+    def by_identifier(self) -> Dict[str, pd.DataFrame]:
+        return self.derive("by_identifier", lambda s: _index_frame(s.frame, "Identifier"))
+
+    @property
+    def by_type(self) -> Dict[str, pd.DataFrame]:
+        return self.derive("by_type", lambda s: _index_frame(s.frame, "Type"))
+
+
+class LeaseRepository:
+    def __init__(self, trade_group_ttl: int = LEASE_TRADE_GROUP_TTL):
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, LeaseSnapshot] = {}
+        self.trade_group_ttl = trade_group_ttl
+        self._trade_map: Dict[str, str] = {}
+        self._trade_map_at = 0.0
+        # Separate from _lock so a slow Salesforce call never blocks snapshot()
+        self._trade_refresh_lock = threading.Lock()
+        self._trade_views: Dict[str, tuple] = {}
+        self.reloads = 0
+
+    def snapshot(self, path: str) -> LeaseSnapshot:
+        """Current snapshot for `path`, re-parsed only if the file changed on disk."""
+        path = os.path.abspath(path)
+        signature = _file_signature(path)
+        snap = self._snapshots.get(path)
+        if snap is not None and snap.signature == signature:
+            return snap
+        with self._lock:
+            snap = self._snapshots.get(path)
+            if snap is None or snap.signature != signature:
+                if snap is not None:
+                    print(f"[LEASES] {os.path.basename(path)} changed on disk — reloading")
+                snap = LeaseSnapshot(path, signature)
+                self._snapshots[path] = snap
+                self.reloads += 1
+            return snap
+
+    # ── trade groups ─────────────────────────────────────────────────────────
+
+    def trade_group_map(self, loader: Callable[[], Dict[str, str]]) -> Dict[str, str]:
+        if time.time() - self._trade_map_at <= self.trade_group_ttl:
+            return self._trade_map
+        # One refresher at a time; everyone else keeps serving the current map.
+        # Only the very first load (no map yet) waits for it.
+        if not self._trade_refresh_lock.acquire(blocking=not self._trade_map_at):
+            return self._trade_map
+        try:
+            if time.time() - self._trade_map_at > self.trade_group_ttl:
+                fresh = loader()
+                if not _is_trade_map(fresh):
+                    print(f"[LEASES] ⚠️ trade group loader returned {type(fresh).__name__}, "
+                          f"not a reg → trade map — keeping previous map")
+                    fresh = {}
+                with self._lock:
+                    # Keep the previous map if Salesforce is unavailable
+                    if fresh or not self._trade_map:
+                        self._trade_map = fresh
+                    self._trade_map_at = time.time()
+        finally:
+            self._trade_refresh_lock.release()
+        return self._trade_map
+
+    def with_trade_groups(self, path: str, loader: Callable[[], Dict[str, str]]):
+        """(frame with a 'Trade Group' column, records, {trade group: frame}) — rebuilt on file or map change."""
+        snap = self.snapshot(path)
+        reg_to_trade = self.trade_group_map(loader)
+        cached = self._trade_views.get(snap.path)
+        if cached and cached[0] is snap and cached[1] is reg_to_trade:
+            return cached[2]
+
+        df = snap.frame.copy()
+        if "Registration Doc" in df.columns:
+            regs = df["Registration Doc"].map(_normalise_reg)
+            df["Trade Group"] = regs.map(reg_to_trade).fillna("Not Assigned")
+        else:
+            df["Trade Group"] = "Not Assigned"
+        view = (df, df.to_dict("records"), _index_frame(df, "Trade Group"))
+        self._trade_views[snap.path] = (snap, reg_to_trade, view)
+        return view
+
+    def stats(self) -> dict:
+        return {
+            "files": {
+                os.path.basename(p): {
+                    "loaded_at": s.loaded_at,
+                    "views": sorted(s._views),
+                }
+                for p, s in self._snapshots.items()
+            },
+            "reloads": self.reloads,
+            "trade_groups": len(self._trade_map),
+            "trade_map_age_s": round(time.time() - self._trade_map_at, 1) if self._trade_map_at else None,
+        }
+
+
+_repository: Optional[LeaseRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_lease_repository() -> LeaseRepository:
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = LeaseRepository()
+    return _repository
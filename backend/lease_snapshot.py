@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+lease_snapshot.py — columnar snapshot of the cleaned HSBC lease table.
+
+Parsing HSBC_Leases.xlsx (openpyxl + read_and_clean_hsbc_leases) dominates a
+cold container's first lease request. The cleaned DataFrame is saved next to
+the workbook as
+
+    HSBC_Leases.xlsx.snapshot.parquet   (pyarrow, in requirements.txt; memory-mapped on read)
+    HSBC_Leases.xlsx.snapshot.npz       (fallback without pyarrow — one numpy array per column)
+    HSBC_Leases.xlsx.snapshot.json      (source SHA-256, format, row count)
+
+load_cleaned_leases() hashes the workbook and loads the snapshot when the
+hash matches; any mismatch or read error falls back to the xlsx parse and
+rewrites the snapshot. Build one ahead of time (the Dockerfile does) with:
+
+    python lease_snapshot.py [--strict] [path/to/HSBC_Leases.xlsx]
+
+--strict exits non-zero unless a parquet snapshot was written, so an image
+build can't silently ship without one.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 1
+
+
+def source_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _meta_path(path: str) -> str:
+    return path + ".snapshot.json"
+
+
+def _data_path(path: str, fmt: str) -> str:
+    return f"{path}.snapshot.{fmt}"
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _atomic_write(target: str, write):
+    tmp = f"{target}.tmp{os.getpid()}"
+    try:
+        write(tmp)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ── npz encoding: numeric / datetime columns stay native, the rest are object arrays ──
+
+def _save_npz(df: pd.DataFrame, target: str) -> list:
+    arrays, columns = {}, []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series) and getattr(series.dt, "tz", None) is None:
+            kind, values = "datetime", series.to_numpy(dtype="datetime64[ns]").view("int64")
+        elif pd.api.types.is_numeric_dtype(series):
+            kind, values = "numeric", series.to_numpy()
+        else:
+            kind, values = "object", series.to_numpy(dtype=object)
+        arrays[f"c{i}"] = values
+        columns.append({"name": col, "kind": kind})
+
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+    _atomic_write(target, write)
+    return columns
+
+
+def _load_npz(target: str, columns: list) -> pd.DataFrame:
+    with np.load(target, allow_pickle=True) as data:
+        out = {}
+        for i, col in enumerate(columns):
+            values = data[f"c{i}"]
+            if col["kind"] == "datetime":
+                values = values.view("datetime64[ns]")
+            out[col["name"]] = values
+    return pd.DataFrame(out, columns=[c["name"] for c in columns])
+
+
+# ── public API ───────────────────────────────────────────────────────────────
+
+def save_snapshot(df: pd.DataFrame, source_path: str, digest: str = None) -> str:
+    """Write df as the snapshot for source_path; returns the format used."""
+    digest = digest or source_hash(source_path)
+    meta = {"version": SNAPSHOT_VERSION, "source_sha256": digest,
+            "rows": len(df), "built_at": time.time()}
+
+    fmt = None
+    if _parquet_available():
+        try:
+            _atomic_write(_data_path(source_path, "parquet"), lambda tmp: df.to_parquet(tmp, index=False))
+            fmt = "parquet"
+        except Exception as e:
+            # Mixed-type object columns can't always be expressed in Arrow
+            print(f"[LEASES] Parquet snapshot failed ({e}), using npz")
+    if fmt is None:
+        meta["columns"] = _save_npz(df, _data_path(source_path, "npz"))
+        fmt = "npz"
+
+    meta["format"] = fmt
+
+    def write_meta(tmp):
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+    _atomic_write(_meta_path(source_path), write_meta)
+    return fmt
+
+
+def load_snapshot(source_path: str, digest: str = None):
+    """The snapshot DataFrame if it matches source_path's current content, else None."""
+    try:
+        with open(_meta_path(source_path)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return None
+    if meta.get("source_sha256") != (digest or source_hash(source_path)):
+        print(f"[LEASES] Snapshot for {os.path.basename(source_path)} is stale (source changed)")
+        return None
+
+    try:
+        if meta["format"] == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_table(_data_path(source_path, "parquet"), memory_map=True).to_pandas()
+        return _load_npz(_data_path(source_path, "npz"), meta["columns"])
+    except Exception as e:
+        print(f"[LEASES] Could not read snapshot, re-parsing workbook: {e}")
+        return None
+
+
+def load_cleaned_leases(source_path: str) -> pd.DataFrame:
+    """read_and_clean_hsbc_leases(source_path), served from the snapshot when it is current."""
+    started = time.time()
+    digest = source_hash(source_path)
+
+    df = load_snapshot(source_path, digest)
+    if df is not None:
+        print(f"[LEASES] Loaded {len(df)} leases from snapshot in {time.time() - started:.3f}s")
+        return df
+
+    from excel_handler import read_and_clean_hsbc_leases
+    df = read_and_clean_hsbc_leases(source_path, verbose=False)
+    print(f"[LEASES] Parsed {os.path.basename(source_path)} in {time.time() - started:.3f}s")
+
+    try:
+        fmt = save_snapshot(df, source_path, digest)
+        print(f"[LEASES] Wrote {fmt} snapshot next to {os.path.basename(source_path)}")
+    except Exception as e:
+        # Read-only filesystem etc. — the parsed frame is still good
+        print(f"[LEASES] Could not write snapshot: {e}")
+    return df
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    args = sys.argv[1:]
+    strict = "--strict" in args
+    args = [a for a in args if a != "--strict"]
+    if args:
+        workbook = args[0]
+    else:
+        from lease_data_helper import _default_lease_path
+        workbook = _default_lease_path()
+    if not workbook or not os.path.isfile(workbook):
+        print(f"❌ Lease workbook not found: {workbook}")
+        sys.exit(1)
+
+    from excel_handler import read_and_clean_hsbc_leases
+    frame = read_and_clean_hsbc_leases(workbook, verbose=False)
+    fmt = save_snapshot(frame, workbook)
+    if strict and fmt != "parquet":
+        print(f"❌ Wrote a {fmt} snapshot, not parquet — is pyarrow installed?")
+        sys.exit(1)
+    print(f"✅ {len(frame)} leases → {fmt} snapshot for {workbook}")
@@ -4,38 +4,30 @@ Combines HSBC Lease data with Service & Maintenance costs
 """
 
 import os
-import openpyxl
 import csv
 from pathlib import Path
 from typing import List, Dict
 
+from lease_repository import get_lease_repository
+
+def _leases_by_registration(snapshot) -> Dict[str, dict]:
+    leases = {}
+    for row in snapshot.raw_rows:
+        if row.get('Registration Doc '):
+            reg = str(row.get('Registration Doc ', '')).strip().upper()
+            leases[reg] = dict(row, _trade_group=None)  # Will be enriched later
+    return leases
+
+
 def load_lease_data():
-    """Load HSBC lease data from Excel"""
+    """Load HSBC lease data from Excel (parsed once per workbook version, shared — don't modify)"""
     excel_file = os.path.join(os.path.dirname(__file__), '..', 'HSBC_Leases.xlsx')
     
     if not os.path.exists(excel_file):
         return []
     
     try:
-        wb = openpyxl.load_workbook(excel_file, data_only=True)
-        ws = wb.active
-        
-        # Headers in row 2
-        headers = [ws.cell(2, i).value for i in range(1, ws.max_column + 1) if ws.cell(2, i).value]
-        
-        leases = {}
-        for row_idx in range(3, ws.max_row + 1):
-            row_data = {}
-            for col_idx, header in enumerate(headers, 1):
-                cell_value = ws.cell(row_idx, col_idx).value
-                row_data[header] = cell_value
-            
-            if row_data.get('Registration Doc '):
-                reg = str(row_data.get('Registration Doc ', '')).strip().upper()
-                row_data['_trade_group'] = None  # Will be enriched later
-                leases[reg] = row_data
-        
-        return leases
+        return get_lease_repository().snapshot(excel_file).derive("insights_by_registration", _leases_by_registration)
     except Exception as e:
         print(f"❌ Error loading lease data: {e}")
         return {}
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+optidrive_history.py — local time series of Webfleet OptiDrive scores.
+
+Every scheduled showOptiDriveIndicator pull (see routes/webfleet.py) is
+written here as one row per driver, window and day:
+
+    optidrive_scores(email, window_days, day, score, captured_at)
+
+A later pull on the same day overwrites that day's row, so the table stays at
+roughly drivers × windows × OPTIDRIVE_HISTORY_DAYS rows. Trends and rolling
+averages are read from this table instead of asking Webfleet for extra
+date ranges.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+_dir = os.path.dirname(os.path.abspath(__file__))
+
+OPTIDRIVE_HISTORY_PATH = os.getenv("OPTIDRIVE_HISTORY_PATH", os.path.join(_dir, "optidrive_history.db"))
+OPTIDRIVE_HISTORY_DAYS = int(os.getenv("OPTIDRIVE_HISTORY_DAYS", "400"))
+
+
+class ScoreHistoryStore:
+    """SQLite-backed per-driver score history, one row per driver/window/day."""
+
+    def __init__(self, path: str = OPTIDRIVE_HISTORY_PATH, retention_days: int = OPTIDRIVE_HISTORY_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._create_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS optidrive_scores (
+                    email       TEXT NOT NULL,
+                    window_days INTEGER NOT NULL,
+                    day         TEXT NOT NULL,
+                    score       REAL NOT NULL,
+                    captured_at REAL NOT NULL,
+                    PRIMARY KEY (email, window_days, day)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_optidrive_window_day ON optidrive_scores (window_days, day)")
+
+    # ── writes ───────────────────────────────────────────────────────────────
+
+    def record(self, window_days: int, scores: Dict[str, float], day: date = None) -> int:
+        """Store today's {email: score} for a window and prune rows past retention."""
+        if not scores:
+            return 0
+        day = (day or date.today()).isoformat()
+        now = time.time()
+        rows = [(email, window_days, day, float(score), now) for email, score in scores.items() if email]
+        cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.executemany("""
+                INSERT INTO optidrive_scores (email, window_days, day, score, captured_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (email, window_days, day)
+                DO UPDATE SET score = excluded.score, captured_at = excluded.captured_at
+            """, rows)
+            conn.execute("DELETE FROM optidrive_scores WHERE day < ?", (cutoff,))
+        return len(rows)
+
+    # ── reads ────────────────────────────────────────────────────────────────
+
+    def series(self, email: str, window_days: int = 7, days: int = 90) -> List[dict]:
+        """[{day, score}] for one driver, oldest first."""
+        since = (date.today() - timedelta(days=days)).isoformat()
+        rows = self._conn().execute("""
+            SELECT day, score FROM optidrive_scores
+            WHERE email = ? AND window_days = ? AND day >= ?
+            ORDER BY day
+        """, (email.strip().lower(), window_days, since)).fetchall()
+        return [{"day": r["day"], "score": r["score"]} for r in rows]
+
+    def rolling_average(self, email: str, window_days: int = 7, days: int = 30) -> Optional[float]:
+        since = (date.today() - timedelta(days=days)).isoformat()
+        row = self._conn().execute("""
+            SELECT AVG(score) avg FROM optidrive_scores
+            WHERE email = ? AND window_days = ? AND day >= ?
+        """, (email.strip().lower(), window_days, since)).fetchone()
+        return round(row["avg"], 2) if row and row["avg"] is not None else None
+
+    def trends(self, window_days: int = 7, days: int = 30) -> Dict[str, dict]:
+        """{email: {first, latest, change, average, samples}} over the last `days` for every driver."""
+        since = (date.today() - timedelta(days=days)).isoformat()
+        rows = self._conn().execute("""
+            SELECT email, day, score FROM optidrive_scores
+            WHERE window_days = ? AND day >= ?
+            ORDER BY email, day
+        """, (window_days, since)).fetchall()
+
+        out: Dict[str, dict] = {}
+        for r in rows:
+            t = out.get(r["email"])
+            if t is None:
+                t = out[r["email"]] = {"first": r["score"], "total": 0.0, "samples": 0}
+            t["latest"] = r["score"]
+            t["total"] += r["score"]
+            t["samples"] += 1
+        for t in out.values():
+            t["change"] = round(t["latest"] - t["first"], 2)
+            t["average"] = round(t.pop("total") / t["samples"], 2)
+        return out
+
+    def status(self) -> dict:
+        conn = self._conn()
+        windows = {
+            r["window_days"]: {"rows": r["n"], "drivers": r["drivers"], "first_day": r["first_day"], "last_day": r["last_day"]}
+            for r in conn.execute("""
+                SELECT window_days, COUNT(*) n, COUNT(DISTINCT email) drivers, MIN(day) first_day, MAX(day) last_day
+                FROM optidrive_scores GROUP BY window_days
+            """)
+        }
+        return {"path": self.path, "retention_days": self.retention_days, "windows": windows}
+
+
+_store: Optional[ScoreHistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_score_history() -> ScoreHistoryStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ScoreHistoryStore()
+    return _store
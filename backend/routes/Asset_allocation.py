@@ -1,6 +1,6 @@
 import traceback
-from fastapi import APIRouter, HTTPException, Query
-from salesforce_service import SalesforceService
+from fastapi import APIRouter, Depends, HTTPException, Query
+from salesforce_service import SalesforceService, get_salesforce_service
 
 router = APIRouter(prefix="/api/allocation", tags=["allocation"])
 
@@ -16,6 +16,7 @@ def _safe_float(val, default=0.0) -> float:
 def get_asset_allocation(
     limit: int = Query(default=2000, ge=1, le=50000),
     offset: int = Query(default=0, ge=0),
+    sf: SalesforceService = Depends(get_salesforce_service),
 ):
     """
     Asset Allocation — user re-assignments from AssetHistory
@@ -23,19 +24,6 @@ def get_asset_allocation(
     Fetches up to 2000 records by default (no more 200 cap).
     """
     try:
-        try:
-            sf = SalesforceService()
-        except Exception as sf_err:
-            print(f"❌ Salesforce connection failed: {sf_err}")
-            # Return empty allocations on connection failure
-            return {
-                "success":     True,
-                "total":       0,
-                "returned":    0,
-                "offset":      offset,
-                "allocations": [],
-            }
-
         # Get total count first
         total_count = 0
         try:
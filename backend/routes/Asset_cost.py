@@ -1,8 +1,8 @@
 import traceback
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
-from salesforce_service import SalesforceService
+from salesforce_service import SalesforceService, get_salesforce_service
 
 
 router = APIRouter(prefix="/api/dashboard", tags=["asset-cost"])
@@ -41,10 +41,9 @@ def _extract_aggregate(row: dict) -> float:
 # GET /api/dashboard/asset-cost-summary
 # ─────────────────────────────────────────────────────────────────────────────
 @router.get("/asset-cost-summary")
-def get_asset_cost_summary():
+def get_asset_cost_summary(sf: SalesforceService = Depends(get_salesforce_service)):
     """Total spend across all assets that have a Price."""
     try:
-        sf = SalesforceService()
 
         rows = sf.execute_soql(
             "SELECT SUM(Price) totalPurchaseSpend FROM Asset WHERE Price != NULL"
@@ -71,10 +70,9 @@ def get_asset_cost_summary():
 
 
 @router.get("/asset-costs")
-def get_asset_costs():
+def get_asset_costs(sf: SalesforceService = Depends(get_salesforce_service)):
     """Every asset with a Price, sorted descending."""
     try:
-        sf = SalesforceService()
 
         rows = sf.execute_soql(
             """
@@ -124,10 +122,9 @@ def get_asset_costs():
 
 
 @router.get("/asset-cost-by-type")
-def get_asset_cost_by_type():
+def get_asset_cost_by_type(sf: SalesforceService = Depends(get_salesforce_service)):
     """Total spend per asset type."""
     try:
-        sf = SalesforceService()
         data = []
 
         # Strategy 1: SOQL GROUP BY.
@@ -246,12 +243,12 @@ def get_asset_cost_by_type():
 
 
 def get_total_cost():
-    return get_asset_cost_summary()
+    return get_asset_cost_summary(get_salesforce_service())
 
 
 def get_cost_per_asset():
-    return get_asset_costs()
+    return get_asset_costs(get_salesforce_service())
 
 
 def get_cost_per_type():
-    return get_asset_cost_by_type()
+    return get_asset_cost_by_type(get_salesforce_service())
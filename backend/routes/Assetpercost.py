@@ -1,6 +1,6 @@
 import traceback
-from fastapi import APIRouter, HTTPException
-from salesforce_service import SalesforceService
+from fastapi import APIRouter, Depends, HTTPException
+from salesforce_service import SalesforceService, get_salesforce_service
 
 router = APIRouter(prefix="/api/asset-cost", tags=["asset-cost"])
 
@@ -13,10 +13,9 @@ def _safe_float(val, default=0.0) -> float:
 
 
 @router.get("/total")
-def get_total_cost():
+def get_total_cost(sf: SalesforceService = Depends(get_salesforce_service)):
     """SUM(Price) FROM Asset WHERE Price != NULL"""
     try:
-        sf = SalesforceService()
         rows = sf.execute_soql(
             "SELECT SUM(Price) totalPurchaseSpend FROM Asset WHERE Price != NULL"
         )
@@ -29,10 +28,9 @@ def get_total_cost():
 
 
 @router.get("/per-asset")
-def get_cost_per_asset():
+def get_cost_per_asset(sf: SalesforceService = Depends(get_salesforce_service)):
     """Name, Price FROM Asset WHERE Price != NULL ORDER BY Price DESC"""
     try:
-        sf = SalesforceService()
         rows = sf.execute_soql("""
             SELECT Name, Price
             FROM Asset
@@ -53,10 +51,9 @@ def get_cost_per_asset():
 
 
 @router.get("/per-type")
-def get_cost_per_type():
+def get_cost_per_type(sf: SalesforceService = Depends(get_salesforce_service)):
     """SUM(Price) GROUP BY Asset_Type__r.Name"""
     try:
-        sf = SalesforceService()
         rows = sf.execute_soql("""
             SELECT Asset_Type__r.Name typeName, SUM(Price) totalSpend
             FROM Asset
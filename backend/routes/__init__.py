@@ -8,8 +8,10 @@ Both sources are kept; nothing Salesforce-related is removed.
 """
 
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import httpx
+import json
 import os
 import sys
 import traceback
@@ -28,6 +30,7 @@ from .firebase_service import (
     get_latest_vcr_by_van,
     get_vcr_by_id,
     get_vcrs_for_van,
+    iter_vcrs_from_firebase,
 )
 
 # ─── Trade Mapping ────────────────────────────────────────────────────────────
@@ -243,14 +246,13 @@ def firebase_vcr_dashboard():
         today = datetime.utcnow()
         cutoff_days = 14
 
-        all_vcrs = get_all_vcrs_from_firebase(days=200)
-        print(f"[FB_DASHBOARD] Total VCRs from Firebase: {len(all_vcrs)}")
-
-        # Index latest VCR per engineer and per van
+        # Index latest VCR per engineer and per van, one Firestore page at a time
         latest_by_engineer: dict[str, dict] = {}
         latest_by_van:      dict[str, dict] = {}
+        scanned = 0
 
-        for vcr in all_vcrs:
+        for vcr in iter_vcrs_from_firebase(days=200):
+            scanned += 1
             eng = (vcr.get("engineer_name") or "").strip()
             van = (vcr.get("van_number") or "").strip()
 
@@ -259,6 +261,8 @@ def firebase_vcr_dashboard():
             if van and van not in latest_by_van:
                 latest_by_van[van] = vcr
 
+        print(f"[FB_DASHBOARD] Total VCRs from Firebase: {scanned}")
+
         submitted_list:     list = []
         not_submitted_list: list = []
 
@@ -347,22 +351,45 @@ def firebase_latest_vcr_for_engineer(engineer_name: str):
 
 
 @router.get("/firebase/all")
-def firebase_all_vcrs(days: int = 30):
+def firebase_all_vcrs(days: int = 30, limit: int | None = None):
     """
-    Return all raw VCR records from Firebase for the last `days` days.
+    Return all raw VCR records from Firebase for the last `days` days
+    (at most `limit`, newest first).
     Useful for the asset management view / table.
+
+    Records are streamed out as Firestore pages arrive instead of being
+    collected first; `count` and `complete` come last in the JSON body. If
+    Firestore fails mid-stream the body still closes, with
+    `"complete": false` and the `error`, so a truncated list is never
+    mistaken for the full one.
     """
     try:
-        records = get_all_vcrs_from_firebase(days=days)
-        return {
-            "count":   len(records),
-            "days":    days,
-            "records": records,
-            "source":  "firebase",
-        }
+        records = iter_vcrs_from_firebase(days=days, limit=limit)
+        first = next(records, None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    def _body():
+        yield f'{{"days": {days}, "source": "firebase", "records": ['
+        count = 0
+        error = None
+        if first is not None:
+            yield json.dumps(first, default=str)
+            count = 1
+            try:
+                for record in records:
+                    yield "," + json.dumps(record, default=str)
+                    count += 1
+            except Exception as e:
+                print(f"[FB_ALL] Stream aborted after {count} records: {e}")
+                error = str(e)
+        tail = {"count": count, "complete": error is None}
+        if error is not None:
+            tail["error"] = error
+        yield "], " + json.dumps(tail)[1:]
+
+    return StreamingResponse(_body(), media_type="application/json")
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # EXISTING SALESFORCE ENDPOINTS (100% unchanged below this line)
@@ -818,20 +845,20 @@ def debug_firebase_vcrs():
 
 @router.get("/image/{version_id}")
 async def proxy_image(version_id: str):
-    if sf_service.mock_mode or not sf_service.sf:
-        raise HTTPException(status_code=503, detail="Salesforce not connected")
-
-    access_token = sf_service.sf.session_id
-    instance_url = f"https://{sf_service.sf.sf_instance}"
-    rest_url     = f"{instance_url}/services/data/v60.0/sobjects/ContentVersion/{version_id}/VersionData"
-
     try:
-        client   = await get_http_client()
-        response = await client.get(
-            rest_url,
-            headers={"Authorization": f"Bearer {access_token}"},
-            timeout=30.0,
-        )
+        client = await get_http_client()
+        for attempt in range(2):
+            # A 401 means the shared session expired: log in again once and retry
+            access_token, instance_url = await run_in_threadpool(sf_service.session_credentials, attempt > 0)
+            if not access_token:
+                raise HTTPException(status_code=503, detail="Salesforce not connected")
+            response = await client.get(
+                f"{instance_url}/services/data/v60.0/sobjects/ContentVersion/{version_id}/VersionData",
+                headers={"Authorization": f"Bearer {access_token}"},
+                timeout=30.0,
+            )
+            if response.status_code != 401:
+                break
         if response.status_code == 401:
             raise HTTPException(status_code=401, detail="Salesforce token expired")
         if response.status_code == 404:
@@ -926,11 +953,10 @@ async def ai_analyse_vcr_images(form_id: str):
         if not image_records:
             raise HTTPException(status_code=404, detail="No image versions found")
 
-        if sf_service.mock_mode or not sf_service.sf:
+        access_token, instance_url = await run_in_threadpool(sf_service.session_credentials)
+        if not access_token:
             raise HTTPException(status_code=503, detail="Salesforce not connected")
 
-        access_token  = sf_service.sf.session_id
-        instance_url  = f"https://{sf_service.sf.sf_instance}"
         http_client   = await get_http_client()
         mime_map      = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png",
                          "gif": "image/gif", "webp": "image/webp", "heic": "image/heic"}
@@ -941,11 +967,17 @@ async def ai_analyse_vcr_images(form_id: str):
             image_title  = img.get("Title", "Unknown")
             content_type = mime_map.get(img.get("FileExtension", "jpg").lower(), "image/jpeg")
             try:
-                response = await http_client.get(
-                    f"{instance_url}/services/data/v60.0/sobjects/ContentVersion/{version_id}/VersionData",
-                    headers={"Authorization": f"Bearer {access_token}"},
-                    timeout=30.0,
-                )
+                for attempt in range(2):
+                    response = await http_client.get(
+                        f"{instance_url}/services/data/v60.0/sobjects/ContentVersion/{version_id}/VersionData",
+                        headers={"Authorization": f"Bearer {access_token}"},
+                        timeout=30.0,
+                    )
+                    if response.status_code != 401 or attempt:
+                        break
+                    access_token, instance_url = await run_in_threadpool(sf_service.session_credentials, True)
+                    if not access_token:
+                        break
                 if response.status_code != 200 or len(response.content) == 0:
                     continue
                 images_for_ai.append({
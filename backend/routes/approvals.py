@@ -110,6 +110,7 @@ def director_approve(record_id: str, approval: ApprovalAction):
                     Director_Comments__c = '{approval.comment or ""}'
                 WHERE Id = '{record_id}'
             """)
+            sf_service.invalidate_cache("Approval_Request__c")
             
             return {
                 "status": "success",
@@ -125,6 +126,7 @@ def director_approve(record_id: str, approval: ApprovalAction):
                     Director_Rejection_Date__c = NOW()
                 WHERE Id = '{record_id}'
             """)
+            sf_service.invalidate_cache("Approval_Request__c")
             
             return {
                 "status": "rejected",
@@ -213,6 +215,7 @@ def finance_approve(record_id: str, approval: ApprovalAction):
                     Finance_Comments__c = '{approval.comment or ""}'
                 WHERE Id = '{record_id}'
             """)
+            sf_service.invalidate_cache("Approval_Request__c")
             
             return {
                 "status": "success",
@@ -227,6 +230,7 @@ def finance_approve(record_id: str, approval: ApprovalAction):
                     Finance_Rejection_Date__c = NOW()
                 WHERE Id = '{record_id}'
             """)
+            sf_service.invalidate_cache("Approval_Request__c")
             
             return {
                 "status": "rejected",
@@ -307,6 +311,7 @@ def manager_approve(record_id: str, approval: ApprovalAction):
                     Manager_Comments__c = '{approval.comment or ""}'
                 WHERE Id = '{record_id}'
             """)
+            sf_service.invalidate_cache("Approval_Request__c")
             
             return {
                 "status": "success",
@@ -321,6 +326,7 @@ def manager_approve(record_id: str, approval: ApprovalAction):
                     Manager_Rejection_Date__c = NOW()
                 WHERE Id = '{record_id}'
             """)
+            sf_service.invalidate_cache("Approval_Request__c")
             
             return {
                 "status": "rejected",
@@ -1,12 +1,16 @@
 import traceback
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from salesforce_service import SalesforceService
+from salesforce_service import SalesforceService, get_salesforce_service
+from single_flight import coalesce
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+# Asset types change rarely — cache the Id → Name lookups
+TYPE_MAP_CACHE_TTL = 600
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # UTILITY HELPERS
@@ -34,7 +38,7 @@ def _get_type_id_to_name_map(sf) -> dict:
     id_to_name: dict = {}
     for obj in ["Asset_Type__c", "AssetType__c", "Asset_Types__c"]:
         try:
-            rows = sf.execute_soql(f"SELECT Id, Name FROM {obj} LIMIT 2000")
+            rows = sf.execute_soql(f"SELECT Id, Name FROM {obj} LIMIT 2000", cache_ttl=TYPE_MAP_CACHE_TTL)
             if rows:
                 for r in rows:
                     if r.get("Id") and r.get("Name"):
@@ -53,7 +57,7 @@ def _get_type_id_to_name_map(sf) -> dict:
                 SELECT Asset_Type__c, Asset_Type__r.Name
                 FROM Asset WHERE Asset_Type__c != NULL
                 LIMIT 2000 OFFSET {offset}
-            """)
+            """, cache_ttl=TYPE_MAP_CACHE_TTL)
             if not rows:
                 break
             for r in rows:
@@ -130,18 +134,8 @@ def _discover_available_field(sf) -> tuple:
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.get("/summary")
-def get_summary():
-    try:
-        sf = SalesforceService()
-    except Exception as e:
-        print(f"[ERROR] Salesforce connection failed: {e}")
-        return {
-            "total_assets": 0, "available_assets": 0,
-            "distinct_types": 0, "asset_types": [],
-            "total_cost": 0, "avg_cost_per_asset": 0,
-            "cost_by_type": [], "cost_per_asset": [], "allocations": [],
-        }
-
+@coalesce("dashboard.asset-summary")
+def get_summary(sf: SalesforceService = Depends(get_salesforce_service)):
     def safe(fn, fallback=None):
         try: return fn()
         except Exception as exc:
@@ -219,12 +213,7 @@ def get_summary():
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.get("/asset-lookup")
-def get_asset_lookup(limit: int = 500, offset: int = 0):
-    try:
-        sf = SalesforceService()
-    except Exception as e:
-        return {"success": True, "total": 0, "returned": 0, "offset": offset, "assets": []}
-
+def get_asset_lookup(limit: int = 500, offset: int = 0, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
         type_id_to_name = _get_type_id_to_name_map(sf)
         price_field     = _discover_price_field(sf)
@@ -270,9 +259,8 @@ def get_asset_lookup(limit: int = 500, offset: int = 0):
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.get("/asset-cost-summary")
-def get_asset_cost_summary():
+def get_asset_cost_summary(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf          = SalesforceService()
         price_field = _discover_price_field(sf)
         result      = sf.execute_soql(f"""
             SELECT SUM({price_field}) totalSpend, COUNT(Id) assetCount
@@ -306,9 +294,8 @@ def get_asset_cost_summary():
 
 
 @router.get("/asset-costs")
-def get_asset_costs():
+def get_asset_costs(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf              = SalesforceService()
         type_id_to_name = _get_type_id_to_name_map(sf)
         price_field     = _discover_price_field(sf)
 
@@ -348,9 +335,8 @@ def get_asset_costs():
 
 
 @router.get("/asset-cost-by-type")
-def get_asset_cost_by_type():
+def get_asset_cost_by_type(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf              = SalesforceService()
         type_id_to_name = _get_type_id_to_name_map(sf)
         price_field     = _discover_price_field(sf)
 
@@ -405,9 +391,8 @@ def get_asset_cost_by_type():
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.get("/get-assets")
-def get_all_assets():
+def get_all_assets(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
         type_id_to_name = _get_type_id_to_name_map(sf)
         price_field     = _discover_price_field(sf)
         assets = _fetch_all_assets_paginated(sf, f"Id, Name, SerialNumber, Asset_Type__c, {price_field}, PurchaseDate, Status, Description, CreatedDate")
@@ -428,9 +413,8 @@ def get_all_assets():
 
 
 @router.get("/get-asset-types")
-def get_asset_types():
+def get_asset_types(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
         id_map = _get_type_id_to_name_map(sf)
         return {"success": True, "asset_types": [{"id": k, "name": v} for k, v in id_map.items()]}
     except Exception as e:
@@ -438,8 +422,8 @@ def get_asset_types():
 
 
 @router.get("/asset-summary")
-def get_asset_summary():
-    data = get_summary()
+def get_asset_summary(sf: SalesforceService = Depends(get_salesforce_service)):
+    data = get_summary(sf=sf)
     return {
         "total": data["total_assets"], "fetched": data["total_assets"],
         "total_value": data["total_cost"],
@@ -448,9 +432,8 @@ def get_asset_summary():
 
 
 @router.get("/recent-assets")
-def get_recent_assets():
+def get_recent_assets(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf     = SalesforceService()
         assets = sf.execute_soql("SELECT Id, Name, Status, SerialNumber, InstallDate, PurchaseDate, User__c, Is_Available__c FROM Asset ORDER BY CreatedDate DESC LIMIT 10")
         return {"success": True, "total": len(assets), "assets": [{"id": a.get("Id"), "name": a.get("Name"), "status": a.get("Status") or "Unknown", "serial_number": a.get("SerialNumber"), "install_date": a.get("InstallDate"), "purchase_date": a.get("PurchaseDate"), "user": a.get("User__c"), "is_available": bool(a.get("Is_Available__c"))} for a in assets]}
     except Exception as e:
@@ -458,9 +441,8 @@ def get_recent_assets():
 
 
 @router.get("/debug-discover")
-def debug_discover():
+def debug_discover(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
         total = _safe_count(sf, "SELECT COUNT() FROM Asset")
         _, avail = _discover_available_field(sf)
         price_field = _discover_price_field(sf)
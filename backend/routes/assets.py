@@ -8,7 +8,7 @@ assets.py — FIXES:
 3. Fallback engineer list from allocation history if ServiceResource query fails.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 import sys
@@ -17,7 +17,7 @@ import json
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from salesforce_service import SalesforceService
+from salesforce_service import SalesforceService, get_salesforce_service
 
 try:
     from groq import Groq
@@ -174,21 +174,20 @@ Format: clear structured text with bullet points. Be specific and data-driven. T
 # ─── Engineers endpoint ────────────────────────────────────────────────────────
 
 @router.get("/engineers")
-def get_available_engineers():
+def get_available_engineers(sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Returns all engineers with their most recent contact number (read from
     allocation history — contact_number is NEVER written back to Salesforce).
     """
     try:
-        sf = SalesforceService()
         engineers = []
         engineer_ids = []
 
         # ── Path 1: ServiceResource object ──
         try:
-            result = sf.sf.query_all(
+            result = sf.call(lambda client: client.query_all(
                 "SELECT Id, Name, Email FROM ServiceResource WHERE IsActive = true ORDER BY Name ASC"
-            )
+            ))
             records = result.get("records", [])
             print(f"🔍 ServiceResource returned {len(records)} records")
             for r in records:
@@ -206,13 +205,13 @@ def get_available_engineers():
         if not engineers:
             print("🔄 Falling back to allocation-history engineer list...")
             try:
-                fb = sf.sf.query_all(
+                fb = sf.call(lambda client: client.query_all(
                     """SELECT Service_Resource__c, Service_Resource__r.Name, Contact_Number__c
                        FROM Vehicle_Allocation__c
                        WHERE Service_Resource__c != null
                        ORDER BY Start_date__c DESC
                        LIMIT 50000"""
-                )
+                ))
                 seen: set = set()
                 contact_map: dict = {}
                 for row in fb.get("records", []):
@@ -250,14 +249,14 @@ def get_available_engineers():
                 chunk = engineer_ids[i:i + chunk_size]
                 ids_str = "', '".join(chunk)
                 try:
-                    c = sf.sf.query_all(
+                    c = sf.call(lambda client: client.query_all(
                         f"""SELECT Service_Resource__c, Contact_Number__c
                             FROM Vehicle_Allocation__c
                             WHERE Service_Resource__c IN ('{ids_str}')
                               AND Contact_Number__c != null
                             ORDER BY Start_date__c DESC
                             LIMIT 50000"""
-                    )
+                    ))
                     for row in c.get("records", []):
                         sr_id = row.get("Service_Resource__c")
                         phone = (row.get("Contact_Number__c") or "").strip()
@@ -283,14 +282,14 @@ class DeleteAllocationRequest(BaseModel):
     allocation_id: str
 
 @router.post("/allocation/delete")
-def delete_vehicle_allocation(data: DeleteAllocationRequest):
+def delete_vehicle_allocation(data: DeleteAllocationRequest, sf: SalesforceService = Depends(get_salesforce_service)):
     """Delete a Vehicle_Allocation__c record from Salesforce."""
     try:
-        sf = SalesforceService()
         if sf.mock_mode or not sf.sf:
             raise HTTPException(status_code=503, detail="Salesforce not connected")
         print(f"🗑️  Deleting allocation {data.allocation_id}")
-        sf.sf.Vehicle_Allocation__c.delete(data.allocation_id)
+        sf.call(lambda client: client.Vehicle_Allocation__c.delete(data.allocation_id))
+        sf.invalidate_cache("Vehicle_Allocation__c")
         return {"success": True, "message": "Allocation deleted successfully", "allocation_id": data.allocation_id}
     except HTTPException:
         raise
@@ -303,7 +302,7 @@ def delete_vehicle_allocation(data: DeleteAllocationRequest):
 # ─── Allocation UPDATE — Contact_Number__c REMOVED ────────────────────────────
 
 @router.put("/allocation/update")
-def update_vehicle_allocation(data: UpdateAllocationRequest):
+def update_vehicle_allocation(data: UpdateAllocationRequest, sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Update Service_Resource__c, Start_date__c, End_date__c on an allocation.
 
@@ -313,7 +312,6 @@ def update_vehicle_allocation(data: UpdateAllocationRequest):
     read-only in the frontend — it is never written back.
     """
     try:
-        sf = SalesforceService()
         if sf.mock_mode or not sf.sf:
             raise HTTPException(status_code=503, detail="Salesforce not connected")
 
@@ -336,7 +334,8 @@ def update_vehicle_allocation(data: UpdateAllocationRequest):
             raise HTTPException(status_code=400, detail="No fields provided to update")
 
         print(f"Updating allocation {data.allocation_id} with: {update_data}")
-        sf.sf.Vehicle_Allocation__c.update(data.allocation_id, update_data)
+        sf.call(lambda client: client.Vehicle_Allocation__c.update(data.allocation_id, update_data))
+        sf.invalidate_cache("Vehicle_Allocation__c")
 
         return {
             "success": True,
@@ -355,30 +354,29 @@ def update_vehicle_allocation(data: UpdateAllocationRequest):
 # ─── Allocation CREATE — Contact_Number__c REMOVED ────────────────────────────
 
 @router.post("/allocation/create")
-def create_vehicle_allocation(data: CreateAllocationRequest):
+def create_vehicle_allocation(data: CreateAllocationRequest, sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Create a new Vehicle_Allocation__c and close the previous active one.
 
     *** Contact_Number__c is intentionally NOT sent to Salesforce ***
     """
     try:
-        sf = SalesforceService()
         if sf.mock_mode or not sf.sf:
             raise HTTPException(status_code=503, detail="Salesforce not connected")
 
         # Close active allocation if one exists
-        active_result = sf.sf.query_all(
+        active_result = sf.call(lambda client: client.query_all(
             f"""SELECT Id FROM Vehicle_Allocation__c
                 WHERE Vehicle__c = '{data.vehicle_id}'
                   AND End_date__c = null
                 LIMIT 1"""
-        )
+        ))
         active_records = active_result.get("records", [])
         if active_records:
             active_id = active_records[0]["Id"]
             today = datetime.now().strftime("%Y-%m-%d")
             print(f"📋 Closing previous allocation {active_id} with end date: {today}")
-            sf.sf.Vehicle_Allocation__c.update(active_id, {"End_date__c": today})
+            sf.call(lambda client: client.Vehicle_Allocation__c.update(active_id, {"End_date__c": today}))
 
         # Create new allocation — NO Contact_Number__c
         allocation_data = {
@@ -390,7 +388,8 @@ def create_vehicle_allocation(data: CreateAllocationRequest):
         }
 
         print(f"✨ Creating new allocation: {allocation_data}")
-        result = sf.sf.Vehicle_Allocation__c.create(allocation_data)
+        result = sf.call(lambda client: client.Vehicle_Allocation__c.create(allocation_data))
+        sf.invalidate_cache("Vehicle_Allocation__c")
 
         return {
             "success": True,
@@ -410,12 +409,11 @@ def create_vehicle_allocation(data: CreateAllocationRequest):
 # ─── Asset CRUD ───────────────────────────────────────────────────────────────
 
 @router.post("/create")
-def create_asset(asset: VehicleAsset):
+def create_asset(asset: VehicleAsset, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-        existing = sf.sf.query_all(
+        existing = sf.call(lambda client: client.query_all(
             f"SELECT Id, Status__c FROM Vehicle__c WHERE Van_Number__c = '{asset.van_number}' LIMIT 1"
-        )
+        ))
         existing_records = existing.get("records", [])
         vehicle_data = {
             "Van_Number__c": asset.van_number,
@@ -424,12 +422,13 @@ def create_asset(asset: VehicleAsset):
         }
         if existing_records:
             vehicle_id = existing_records[0].get("Id")
-            sf.sf.Vehicle__c.update(vehicle_id, vehicle_data)
+            sf.call(lambda client: client.Vehicle__c.update(vehicle_id, vehicle_data))
         else:
             vehicle_data["Name"] = asset.vehicle_name or f"Vehicle {asset.van_number}"
             vehicle_data["Status__c"] = "Spare"
-            result = sf.sf.Vehicle__c.create(vehicle_data)
+            result = sf.call(lambda client: client.Vehicle__c.create(vehicle_data))
             vehicle_id = result["id"]
+        sf.invalidate_cache("Vehicle__c")
         return {"status": "success", "message": "Asset created successfully", "vehicle_id": vehicle_id}
     except Exception as e:
         import traceback; traceback.print_exc()
@@ -437,14 +436,13 @@ def create_asset(asset: VehicleAsset):
 
 
 @router.get("/all")
-def get_all_assets():
+def get_all_assets(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-        result = sf.sf.query_all(
+        result = sf.call(lambda client: client.query_all(
             """SELECT Id, Name, Van_Number__c, Reg_No__c, Tracking_Number__c,
                       Vehicle_Type__c, Description__c, Status__c, CreatedDate
                FROM Vehicle__c ORDER BY CreatedDate DESC"""
-        )
+        ))
         assets = [
             {
                 "id": r.get("Id"), "name": r.get("Name"),
@@ -465,10 +463,9 @@ def get_all_assets():
 
 
 @router.get("/by-id/{asset_id}")
-def get_asset_by_id(asset_id: str):
+def get_asset_by_id(asset_id: str, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-        result = sf.sf.query_all(
+        result = sf.call(lambda client: client.query_all(
             f"""SELECT Id, Name, Van_Number__c, Reg_No__c, Tracking_Number__c,
                        Vehicle_Type__c, Description__c, Status__c, CreatedDate,
                        Trade_Group__c, Make_Model__c, Transmission__c,
@@ -476,7 +473,7 @@ def get_asset_by_id(asset_id: str):
                        Next_Road_Tax__c, Last_Service_Date__c, Next_Service_Date__c,
                        Vehicle_Ownership__c
                 FROM Vehicle__c WHERE Id = '{asset_id}' LIMIT 1"""
-        )
+        ))
         records = result.get("records", [])
         if not records:
             raise HTTPException(status_code=404, detail=f"Asset not found: {asset_id}")
@@ -493,10 +490,9 @@ def get_asset_by_id(asset_id: str):
 
 
 @router.get("/by-van/{van_number}")
-def get_asset_by_van(van_number: str):
+def get_asset_by_van(van_number: str, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-        result = sf.sf.query_all(
+        result = sf.call(lambda client: client.query_all(
             f"""SELECT Id, Name, Van_Number__c, Reg_No__c, Tracking_Number__c,
                        Vehicle_Type__c, Description__c, Status__c, CreatedDate,
                        Trade_Group__c, Make_Model__c, Transmission__c,
@@ -504,7 +500,7 @@ def get_asset_by_van(van_number: str):
                        Next_Road_Tax__c, Last_Service_Date__c, Next_Service_Date__c,
                        Vehicle_Ownership__c
                 FROM Vehicle__c WHERE Van_Number__c = '{van_number}' LIMIT 1"""
-        )
+        ))
         records = result.get("records", [])
         if not records:
             raise HTTPException(status_code=404, detail=f"Asset not found for van {van_number}")
@@ -527,13 +523,13 @@ def _get_allocation_history(sf, vehicle_id: str):
     history = []
     current_driver = None
     try:
-        result = sf.sf.query_all(
+        result = sf.call(lambda client: client.query_all(
             f"""SELECT Id, Start_date__c, End_date__c,
                        Service_Resource__r.Name, Service_Resource__c, Contact_Number__c
                 FROM Vehicle_Allocation__c
                 WHERE Vehicle__c = '{vehicle_id}'
                 ORDER BY Start_date__c DESC"""
-        )
+        ))
         for record in result.get("records", []):
             sr = record.get("Service_Resource__r", {})
             name = sr.get("Name", "N/A") if isinstance(sr, dict) else "N/A"
@@ -3,8 +3,8 @@ from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List, Union
 import os
-from datetime import datetime, timedelta
 import secrets, requests, hmac, hashlib, time, base64
+import sys
 import jwt as pyjwt
 from dotenv import load_dotenv
 from urllib.parse import urlencode
@@ -16,13 +16,16 @@ _ROOT_DIR    = os.path.dirname(_BACKEND_DIR)
 load_dotenv(os.path.join(_BACKEND_DIR, ".env"), override=True)
 load_dotenv(os.path.join(_ROOT_DIR,    ".env"), override=True)
 
+sys.path.insert(0, _BACKEND_DIR)
+from session_store import get_session_store
+
 
 def _env(name: str, default: str = "") -> str:
     return os.getenv(name, default).strip()
 
 
 router   = APIRouter(prefix="/api/auth", tags=["authentication"])
-sessions: Dict[str, Dict[str, Any]] = {}
+sessions = get_session_store()
 
 MICROSOFT_CLIENT_ID     = _env("MICROSOFT_CLIENT_ID")
 MICROSOFT_CLIENT_SECRET = _env("MICROSOFT_CLIENT_SECRET")
@@ -42,7 +45,7 @@ print(f"[auth] EMBED_JWT_SECRET        : {'✅ loaded' if EMBED_SECRET
 print(f"[auth] FRONTEND_URL            : {FRONTEND_URL}")
 print(f"[auth] MICROSOFT_REDIRECT_URI  : {MICROSOFT_REDIRECT_URI}")
 print(f"[auth] CLOUD_RUN_INSTANCE      : {os.getenv('K_REVISION', 'local')}")
-print(f"[auth] SESSION STORE           : in-memory (single instance mode)")
+print(f"[auth] SESSION STORE           : {sessions.name}")
 print("=" * 60)
 
 # =============================================================================
@@ -263,29 +266,27 @@ def _verify_embed_token(token: str, email: str) -> bool:
 
 
 # =============================================================================
-#  SESSION HELPERS  (in-memory — works perfectly with max-instances=1)
+#  SESSION HELPERS  (backend chosen by SESSION_STORE — see session_store.py)
 # =============================================================================
 
 def create_session(user_data: Dict[str, Any]) -> str:
     session_id = secrets.token_urlsafe(32)
-    sessions[session_id] = {
-        "user":       user_data,
-        "created_at": datetime.now(),
-        "expires_at": datetime.now() + timedelta(hours=24),
-    }
-    print(f"✅ [SESSION] Created for '{user_data.get('name')}' | id={session_id[:12]}... | total={len(sessions)}")
+    sessions.put(session_id, user_data)
+    print(f"✅ [SESSION] Created for '{user_data.get('name')}' | id={session_id[:12]}... | store={sessions.name}")
     return session_id
 
 
-def get_session_user(session_id: str) -> Optional[Dict[str, Any]]:
-    print(f"🔍 [SESSION] Looking up id={session_id[:12]}... | total in memory={len(sessions)}")
+def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    print(f"🔍 [SESSION] Looking up id={session_id[:12]}... | store={sessions.name}")
     session = sessions.get(session_id)
     if not session:
-        print(f"❌ [SESSION] Not found | id={session_id[:12]}...")
-        return None
-    if datetime.now() > session["expires_at"]:
-        print(f"⏰ [SESSION] Expired | id={session_id[:12]}...")
-        del sessions[session_id]
+        print(f"❌ [SESSION] Not found or expired | id={session_id[:12]}...")
+    return session
+
+
+def get_session_user(session_id: str) -> Optional[Dict[str, Any]]:
+    session = get_session(session_id)
+    if not session:
         return None
     user = session["user"]
     print(f"✅ [SESSION] Found: '{user.get('name')}' | trade={user.get('trade')}")
@@ -293,8 +294,7 @@ def get_session_user(session_id: str) -> Optional[Dict[str, Any]]:
 
 
 def clear_session(session_id: str) -> bool:
-    if session_id in sessions:
-        del sessions[session_id]
+    if sessions.delete(session_id):
         print(f"✅ [SESSION] Cleared | id={session_id[:12]}...")
         return True
     print(f"⚠️  [SESSION] Clear — not found | id={session_id[:12]}...")
@@ -538,23 +538,23 @@ async def logout(session_id: str) -> Dict[str, bool]:
 @router.get("/verify/{session_id}")
 async def verify_session(session_id: str) -> Dict[str, Any]:
     print(f"🔍 [VERIFY] {session_id[:12]}...")
-    user = get_session_user(session_id)
-    if not user:
+    session = get_session(session_id)
+    if not session:
         print(f"❌ [VERIFY] Invalid — 401")
         raise HTTPException(status_code=401, detail="Invalid or expired session")
-    session    = sessions.get(session_id)
-    expires_at = session.get("expires_at") if session else None
+    user       = session["user"]
+    expires_at = session["expires_at"]
     print(f"✅ [VERIFY] Valid for '{user.get('name')}'")
-    return {"valid": True, "user": user, "expires_at": expires_at.isoformat() if expires_at else None}
+    return {"valid": True, "user": user, "expires_at": expires_at.isoformat()}
 
 
 @router.get("/health")
 async def health_check():
     return {
         "status":                     "ok",
-        "session_store":              "in-memory",
+        "session_store":              sessions.stats(),
         "cloud_run_instance":         os.getenv("K_REVISION", "local"),
-        "active_sessions":            len(sessions),
+        "active_sessions":            sessions.count(),
         "microsoft_oauth_configured": bool(MICROSOFT_CLIENT_ID and MICROSOFT_CLIENT_SECRET),
         "embed_login_configured":     bool(EMBED_SECRET),
         "tenant_id":                  MICROSOFT_TENANT_ID,
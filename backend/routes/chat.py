@@ -8,14 +8,19 @@ Data sources:
 Flow:
   User message → detect intent → fetch relevant Salesforce data + Webfleet cache
                → build rich prompt → Groq LLM → natural language answer
+  (/api/chat returns the answer in one piece; /api/chat/stream sends it as SSE)
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
+import json
 import logging
 import os
 import sys
+import threading
+import time
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -55,14 +60,16 @@ def initialize_groq_service(driver_cache: Optional[List[Dict[str, Any]]] = None)
     global _groq_client, _webfleet_cache
     _webfleet_cache = driver_cache or []
     logger.info(f"[CHAT] Webfleet cache: {len(_webfleet_cache)} drivers")
+    refresh_context_blocks(["drivers"])
+    start_context_refresher()
 
     api_key = os.environ.get("GROQ_API_KEY")
     if not api_key:
         logger.error("[CHAT] GROQ_API_KEY not set!")
         return
     try:
-        from groq import Groq
-        _groq_client = Groq(api_key=api_key)
+        from groq import AsyncGroq
+        _groq_client = AsyncGroq(api_key=api_key)
         logger.info(f"[CHAT] Groq client ready | model={DEFAULT_GROQ_MODEL}")
     except ImportError:
         logger.error("[CHAT] pip install groq")
@@ -88,21 +95,26 @@ INTENT_KEYWORDS = {
 }
 
 def detect_intents(message: str) -> List[str]:
+    """Matching intents, most keyword hits first (prompt sections follow this order)."""
     msg = message.lower()
-    intents = [intent for intent, kws in INTENT_KEYWORDS.items() if any(k in msg for k in kws)]
+    hits = {intent: sum(k in msg for k in kws) for intent, kws in INTENT_KEYWORDS.items()}
+    intents = sorted((i for i, n in hits.items() if n), key=lambda i: -hits[i])
     if not intents:
         intents = ["vehicles", "drivers"]
-    return list(set(intents))
+    return intents
 
 # ─── SALESFORCE FETCHERS ──────────────────────────────────────────────────────
 
+# Chat context is read-only; identical questions within a minute share results
+CONTEXT_CACHE_TTL = 60
+
 def _get_sf():
-    from salesforce_service import SalesforceService
-    return SalesforceService()
+    from salesforce_service import get_salesforce_service
+    return get_salesforce_service()
 
 def fetch_vehicle_summary(sf) -> Dict:
     try:
-        rows = sf.execute_soql("SELECT Status__c FROM Vehicle__c") or []
+        rows = sf.execute_soql("SELECT Status__c FROM Vehicle__c", cache_ttl=CONTEXT_CACHE_TTL) or []
         totals: Dict[str, int] = {}
         for r in rows:
             s = r.get("Status__c", "Unknown")
@@ -122,7 +134,7 @@ def fetch_vehicles_list(sf, limit: int = 80) -> List[Dict]:
             WHERE Status__c NOT IN ('Sold','Written Off')
             ORDER BY Van_Number__c ASC
             LIMIT {limit}
-        """) or []
+        """, cache_ttl=CONTEXT_CACHE_TTL) or []
     except Exception as e:
         logger.warning(f"fetch_vehicles_list: {e}")
         return []
@@ -138,7 +150,7 @@ def fetch_service_due(sf, days: int = 30) -> List[Dict]:
             AND   Leaver__c = false
             ORDER BY Next_Service_Date__c ASC
             LIMIT 50
-        """) or []
+        """, cache_ttl=CONTEXT_CACHE_TTL) or []
     except Exception as e:
         logger.warning(f"fetch_service_due: {e}")
         return []
@@ -153,7 +165,7 @@ def fetch_mot_due(sf, days: int = 30) -> List[Dict]:
             AND   Next_MOT_Date__c <= NEXT_N_DAYS:{days}
             ORDER BY Next_MOT_Date__c ASC
             LIMIT 50
-        """) or []
+        """, cache_ttl=CONTEXT_CACHE_TTL) or []
     except Exception as e:
         logger.warning(f"fetch_mot_due: {e}")
         return []
@@ -169,7 +181,7 @@ def fetch_tax_due(sf, days: int = 30) -> List[Dict]:
             AND   Leaver__c = false
             ORDER BY Next_Road_Tax__c ASC
             LIMIT 50
-        """) or []
+        """, cache_ttl=CONTEXT_CACHE_TTL) or []
     except Exception as e:
         logger.warning(f"fetch_tax_due: {e}")
         return []
@@ -182,7 +194,7 @@ def fetch_cost_summary(sf) -> Dict:
             GROUP BY Type__c
             ORDER BY SUM(Payment_value__c) DESC
             LIMIT 20
-        """) or []
+        """, cache_ttl=CONTEXT_CACHE_TTL) or []
         breakdown = {r.get("Type__c", "Other"): round(float(r.get("total") or 0), 2) for r in rows}
         return {"grand_total": round(sum(breakdown.values()), 2), "by_type": breakdown}
     except Exception as e:
@@ -213,8 +225,8 @@ def format_webfleet_data() -> str:
     with_score = len(scores)
     avg        = round(sum(scores) / with_score, 2) if scores else 0
 
-    sorted_desc = sorted(_webfleet_cache, key=lambda x: float(x.get("driving_score") or x.get("score") or 0), reverse=True)
     sorted_asc  = sorted(_webfleet_cache, key=lambda x: float(x.get("driving_score") or x.get("score") or 0))
+    sorted_desc = sorted_asc[::-1]
 
     top5    = ", ".join(f"{d.get('name','?')} ({float(d.get('driving_score') or d.get('score') or 0):.1f})" for d in sorted_desc[:5])
     bottom5 = ", ".join(f"{d.get('name','?')} ({float(d.get('driving_score') or d.get('score') or 0):.1f})" for d in sorted_asc[:5])
@@ -233,77 +245,290 @@ Full driver list:
 ────────────────────────────────────────────────────────────────────
 """
 
-# ─── CONTEXT BUILDER ──────────────────────────────────────────────────────────
+# ─── CONTEXT BLOCKS ───────────────────────────────────────────────────────────
+#
+# Each section of the LIVE DATA prompt is rendered ahead of time by a background
+# refresher and kept as text with a version number (bumped when the text
+# changes). build_context() only concatenates the blocks the intents need, so a
+# chat request goes straight to Groq.
+
+CHAT_CONTEXT_REFRESH_S = int(os.environ.get("CHAT_CONTEXT_REFRESH_S", "300"))
+
+_RULE = "────────────────────────────────────────────────────────────────────"
+
+
+def render_fleet_summary(sf) -> str:
+    summary = fetch_vehicle_summary(sf)
+    if not summary:
+        return ""
+    status_lines = "\n".join(f"  {k}: {v}" for k, v in sorted(summary.get("by_status", {}).items(), key=lambda x: -x[1]))
+    return f"""
+── FLEET SUMMARY ───────────────────────────────────────────────────
+Total active vehicles (excl. Sold/Written Off): {summary.get('total_current')}
+By status:
+{status_lines}
+{_RULE}
+"""
+
+
+def render_vehicle_list(sf) -> str:
+    vehicles = fetch_vehicles_list(sf)
+    if not vehicles:
+        return ""
+    vlines = "\n".join(
+        f"  Van {v.get('Van_Number__c','?')} | {v.get('Reg_No__c','?')} | "
+        f"{v.get('Status__c','?')} | {v.get('Vehicle_Type__c','?')} | {v.get('Trade_Group__c','?')}"
+        for v in vehicles
+    )
+    return f"── VEHICLE LIST ────────────────────────────────────────────────────\n{vlines}\n{_RULE}\n"
+
+
+def render_service_due(sf) -> str:
+    due = fetch_service_due(sf)
+    dlines = "\n".join(
+        f"  Van {v.get('Van_Number__c','?')} | Due: {v.get('Next_Service_Date__c','?')} | Last: {v.get('Last_Service_Date__c','?')} | {v.get('Trade_Group__c','?')}"
+        for v in due
+    ) if due else "  None due in next 30 days"
+    return f"── SERVICE DUE (next 30 days) — {len(due)} vehicles ────────────────\n{dlines}\n{_RULE}\n"
+
+
+def render_mot_due(sf) -> str:
+    mot = fetch_mot_due(sf)
+    mlines = "\n".join(
+        f"  Van {v.get('Van_Number__c','?')} | MOT Due: {v.get('Next_MOT_Date__c','?')} | Status: {v.get('Status__c','?')}"
+        for v in mot
+    ) if mot else "  None due in next 30 days"
+    return f"── MOT DUE (next 30 days) — {len(mot)} vehicles ─────────────────────\n{mlines}\n{_RULE}\n"
+
+
+def render_tax_due(sf) -> str:
+    tax = fetch_tax_due(sf)
+    tlines = "\n".join(
+        f"  Van {v.get('Van_Number__c','?')} | Tax Due: {v.get('Next_Road_Tax__c','?')} | {v.get('Trade_Group__c','?')}"
+        for v in tax
+    ) if tax else "  None due in next 30 days"
+    return f"── ROAD TAX DUE (next 30 days) — {len(tax)} vehicles ────────────────\n{tlines}\n{_RULE}\n"
+
+
+def render_costs(sf) -> str:
+    costs = fetch_cost_summary(sf)
+    if not costs:
+        return ""
+    clines = "\n".join(f"  {k}: £{v:,.2f}" for k, v in sorted(costs.get("by_type", {}).items(), key=lambda x: -x[1]))
+    return f"── FLEET COSTS ─────────────────────────────────────────────────────\nTotal: £{costs.get('grand_total', 0):,.2f}\n{clines}\n{_RULE}\n"
+
+
+def render_overview(sf) -> str:
+    summary = fetch_vehicle_summary(sf)
+    return f"Fleet overview: {summary}" if summary else ""
+
+
+# Block name → renderer (None = no Salesforce needed). Dict order is prompt order.
+CONTEXT_BLOCKS = {
+    "fleet_summary": render_fleet_summary,
+    "vehicle_list":  render_vehicle_list,
+    "service_due":   render_service_due,
+    "mot_due":       render_mot_due,
+    "tax_due":       render_tax_due,
+    "costs":         render_costs,
+    "drivers":       None,
+}
+
+INTENT_BLOCKS = {
+    "vehicles":    ["fleet_summary", "vehicle_list"],
+    "allocation":  ["fleet_summary", "vehicle_list"],
+    "maintenance": ["service_due"],
+    "mot":         ["mot_due"],
+    "tax":         ["tax_due"],
+    "costs":       ["costs"],
+    "drivers":     ["drivers"],
+}
+
+_blocks: Dict[str, Dict[str, Any]] = {}
+_blocks_lock = threading.Lock()
+_refresh_wake = threading.Event()
+_refresher_started = False
+
+
+def _render_block(name: str, sf) -> str:
+    renderer = CONTEXT_BLOCKS.get(name, render_overview if name == "overview" else None)
+    if renderer is None:
+        return format_webfleet_data()
+    return renderer(sf) if sf else ""
 
-def build_context(intents: List[str]) -> str:
-    sections = []
 
+def refresh_context_blocks(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Re-render blocks (all by default); unchanged text keeps its version."""
     try:
         sf = _get_sf()
     except Exception as e:
         logger.warning(f"Salesforce unavailable: {e}")
         sf = None
 
-    if sf and ("vehicles" in intents or "allocation" in intents):
-        summary = fetch_vehicle_summary(sf)
-        if summary:
-            status_lines = "\n".join(f"  {k}: {v}" for k, v in sorted(summary.get("by_status", {}).items(), key=lambda x: -x[1]))
-            sections.append(f"""
-── FLEET SUMMARY ───────────────────────────────────────────────────
-Total active vehicles (excl. Sold/Written Off): {summary.get('total_current')}
-By status:
-{status_lines}
-────────────────────────────────────────────────────────────────────
-""")
-        vehicles = fetch_vehicles_list(sf)
-        if vehicles:
-            vlines = "\n".join(
-                f"  Van {v.get('Van_Number__c','?')} | {v.get('Reg_No__c','?')} | "
-                f"{v.get('Status__c','?')} | {v.get('Vehicle_Type__c','?')} | {v.get('Trade_Group__c','?')}"
-                for v in vehicles
-            )
-            sections.append(f"── VEHICLE LIST ────────────────────────────────────────────────────\n{vlines}\n────────────────────────────────────────────────────────────────────\n")
-
-    if sf and "maintenance" in intents:
-        due = fetch_service_due(sf)
-        dlines = "\n".join(
-            f"  Van {v.get('Van_Number__c','?')} | Due: {v.get('Next_Service_Date__c','?')} | Last: {v.get('Last_Service_Date__c','?')} | {v.get('Trade_Group__c','?')}"
-            for v in due
-        ) if due else "  None due in next 30 days"
-        sections.append(f"── SERVICE DUE (next 30 days) — {len(due)} vehicles ────────────────\n{dlines}\n────────────────────────────────────────────────────────────────────\n")
-
-    if sf and "mot" in intents:
-        mot = fetch_mot_due(sf)
-        mlines = "\n".join(
-            f"  Van {v.get('Van_Number__c','?')} | MOT Due: {v.get('Next_MOT_Date__c','?')} | Status: {v.get('Status__c','?')}"
-            for v in mot
-        ) if mot else "  None due in next 30 days"
-        sections.append(f"── MOT DUE (next 30 days) — {len(mot)} vehicles ─────────────────────\n{mlines}\n────────────────────────────────────────────────────────────────────\n")
-
-    if sf and "tax" in intents:
-        tax = fetch_tax_due(sf)
-        tlines = "\n".join(
-            f"  Van {v.get('Van_Number__c','?')} | Tax Due: {v.get('Next_Road_Tax__c','?')} | {v.get('Trade_Group__c','?')}"
-            for v in tax
-        ) if tax else "  None due in next 30 days"
-        sections.append(f"── ROAD TAX DUE (next 30 days) — {len(tax)} vehicles ────────────────\n{tlines}\n────────────────────────────────────────────────────────────────────\n")
-
-    if sf and "costs" in intents:
-        costs = fetch_cost_summary(sf)
-        if costs:
-            clines = "\n".join(f"  {k}: £{v:,.2f}" for k, v in sorted(costs.get("by_type", {}).items(), key=lambda x: -x[1]))
-            sections.append(f"── FLEET COSTS ─────────────────────────────────────────────────────\nTotal: £{costs.get('grand_total', 0):,.2f}\n{clines}\n────────────────────────────────────────────────────────────────────\n")
-
-    if "drivers" in intents:
-        sections.append(format_webfleet_data())
+    for name in names or [*CONTEXT_BLOCKS, "overview"]:
+        started = time.time()
+        try:
+            text = _render_block(name, sf)
+        except Exception as e:
+            logger.warning(f"[CHAT] context block {name} failed: {e}")
+            continue
+        with _blocks_lock:
+            block = _blocks.get(name)
+            if block is None or block["text"] != text:
+                version = block["version"] + 1 if block else 1
+                block = _blocks[name] = {"text": text, "version": version}
+            block["built_at"] = datetime.now().isoformat()
+            block["build_s"] = round(time.time() - started, 3)
+    return context_status()
+
+
+def _context_refresher():
+    while True:
+        refresh_context_blocks()
+        _refresh_wake.wait(CHAT_CONTEXT_REFRESH_S)
+        _refresh_wake.clear()
+
+
+def start_context_refresher():
+    global _refresher_started
+    with _blocks_lock:
+        if _refresher_started:
+            return
+        _refresher_started = True
+    threading.Thread(target=_context_refresher, daemon=True, name="chat-context").start()
+    logger.info(f"[CHAT] Context blocks refresh every {CHAT_CONTEXT_REFRESH_S}s")
+
+
+def context_status() -> Dict[str, Any]:
+    with _blocks_lock:
+        return {name: {k: v for k, v in b.items() if k != "text"} | {"chars": len(b["text"])}
+                for name, b in _blocks.items()}
+
+
+def _block_text(name: str) -> str:
+    block = _blocks.get(name)
+    if block is None:
+        # Cold start (refresher hasn't got here yet): render this one inline
+        refresh_context_blocks([name])
+        block = _blocks.get(name)
+    return block["text"] if block else ""
+
+
+# ─── TOKEN BUDGET ─────────────────────────────────────────────────────────────
+#
+# Prompt size is bounded: history gets up to CHAT_HISTORY_TOKENS (at most a
+# quarter of the prompt; older turns are folded into a short recap), the LIVE
+# DATA context gets whatever is left of CHAT_PROMPT_TOKENS. Token counts are estimated locally (~4 chars/token).
+
+CHAT_PROMPT_TOKENS  = int(os.environ.get("CHAT_PROMPT_TOKENS", "6000"))
+CHAT_HISTORY_TOKENS = int(os.environ.get("CHAT_HISTORY_TOKENS", "1500"))
+CHAT_HISTORY_TURNS  = 8
+CHAT_TURN_TOKENS    = 400     # a single older turn is clipped to this
+CHAT_MESSAGE_TOKENS = CHAT_PROMPT_TOKENS // 4   # ... and the new user message to this
+RECAP_TOKENS        = 200
+
+
+def estimate_tokens(text: str) -> int:
+    return max(len(text) // 4, len(text.split())) + 1 if text else 0
+
+
+def _clip(text: str, tokens: int) -> str:
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[:max(0, tokens * 4 - 3)].rstrip() + "…"
+
+
+def truncate_table(text: str, tokens: int) -> str:
+    """Keep a section's header/footer lines and as many '  ' rows as fit; '' if even the frame doesn't."""
+    lines = text.split("\n")
+    is_row = [line.startswith("  ") for line in lines]
+    used = sum(estimate_tokens(line) for line, row in zip(lines, is_row) if not row) + 10
+    if used > tokens:
+        return ""
+    out, dropped, marker_at = [], 0, None
+    for line, row in zip(lines, is_row):
+        if row:
+            cost = estimate_tokens(line)
+            if dropped or used + cost > tokens:
+                dropped += 1
+                if marker_at is None:
+                    marker_at = len(out)
+                continue
+            used += cost
+        out.append(line)
+    if dropped:
+        out.insert(marker_at, f"  ... ({dropped} more rows not shown)")
+    return "\n".join(out)
+
+
+def compact_history(history: List[Message], tokens: int = CHAT_HISTORY_TOKENS) -> List[Dict[str, str]]:
+    """
+    Recent turns verbatim (newest first until the budget runs out, at most
+    CHAT_HISTORY_TURNS); older turns become a one-message recap of what the
+    user asked, and anything beyond the recap budget is dropped.
+    """
+    turns = [m for m in history if m.role in ("user", "assistant")]
+    kept: List[Dict[str, str]] = []
+    used = 0
+    cut = len(turns)
+    verbatim = tokens - RECAP_TOKENS if len(turns) > CHAT_HISTORY_TURNS else tokens
+    for i in range(len(turns) - 1, -1, -1):
+        if len(kept) >= CHAT_HISTORY_TURNS:
+            break
+        content = turns[i].content if not kept else _clip(turns[i].content, CHAT_TURN_TOKENS)
+        cost = estimate_tokens(content)
+        if used + cost > verbatim:
+            break
+        kept.insert(0, {"role": turns[i].role, "content": content})
+        used += cost
+        cut = i
+
+    older = [m for m in turns[:cut] if m.role == "user"]
+    if older:
+        recap, budget = [], min(RECAP_TOKENS, max(0, tokens - used))
+        for m in reversed(older):
+            line = f"- {_clip(m.content.strip(), 40)}"
+            budget -= estimate_tokens(line)
+            if budget < 0:
+                break
+            recap.insert(0, line)
+        if recap:
+            kept.insert(0, {"role": "system", "content": "Earlier in this conversation the user asked:\n" + "\n".join(recap)})
+    return kept
+
+
+# ─── CONTEXT BUILDER ──────────────────────────────────────────────────────────
+
+def build_context(intents: List[str], token_budget: Optional[int] = None) -> str:
+    """
+    Context blocks for the intents, most relevant intent first. With a token
+    budget, blocks are added in that order and the first one that doesn't fit
+    has its table rows truncated; anything after it is dropped.
+    """
+    start_context_refresher()
+    names: List[str] = []
+    for intent in intents:
+        for name in INTENT_BLOCKS.get(intent, ()):
+            if name not in names:
+                names.append(name)
+    sections = [text for text in (_block_text(name) for name in names) if text]
 
     # Fallback — general overview
     if not sections:
-        if sf:
-            summary = fetch_vehicle_summary(sf)
-            if summary:
-                sections.append(f"Fleet overview: {summary}")
-        sections.append(format_webfleet_data())
+        sections = [text for text in (_block_text("overview"), _block_text("drivers")) if text]
+
+    if token_budget is not None:
+        fitted, remaining = [], token_budget
+        for text in sections:
+            cost = estimate_tokens(text)
+            if cost > remaining:
+                text = truncate_table(text, remaining)
+                if text:
+                    fitted.append(text)
+                break
+            fitted.append(text)
+            remaining -= cost
+        sections = fitted
 
     return "\n".join(sections)
 
@@ -327,44 +552,73 @@ LIVE DATA (Salesforce + Webfleet):
 
 # ─── GROQ CALL ────────────────────────────────────────────────────────────────
 
-async def _call_groq(message: str, history: List[Message], context: str) -> str:
-    import asyncio
-    prompt = BASE_SYSTEM.format(today=datetime.now().strftime("%A %d %B %Y"), context=context)
-    messages = [{"role": "system", "content": prompt}]
-    for msg in history[-8:]:
-        if msg.role in ("user", "assistant"):
-            messages.append({"role": msg.role, "content": msg.content})
-    if not history or history[-1].content.strip() != message.strip():
-        messages.append({"role": "user", "content": message})
-
-    def _sync():
-        return _groq_client.chat.completions.create(
-            model=DEFAULT_GROQ_MODEL,
-            messages=messages,
-            temperature=0.3,
-            max_tokens=1500,
-            top_p=0.9,
-        )
-
-    result = await asyncio.get_event_loop().run_in_executor(None, _sync)
+def build_prompt(message: str, history: List[Message], intents: List[str]) -> List[Dict[str, str]]:
+    """System prompt + compacted history + question, within CHAT_PROMPT_TOKENS."""
+    if history and history[-1].content.strip() == message.strip():
+        history = history[:-1]
+    past = compact_history(history, min(CHAT_HISTORY_TOKENS, CHAT_PROMPT_TOKENS // 4))
+    message = _clip(message, CHAT_MESSAGE_TOKENS)
+    today = datetime.now().strftime("%A %d %B %Y")
+    fixed = estimate_tokens(BASE_SYSTEM.format(today=today, context="")) + estimate_tokens(message) \
+        + sum(estimate_tokens(m["content"]) for m in past)
+    context = build_context(intents, token_budget=max(0, CHAT_PROMPT_TOKENS - fixed))
+
+    messages = [{"role": "system", "content": BASE_SYSTEM.format(today=today, context=context)}]
+    messages.extend(past)
+    messages.append({"role": "user", "content": message})
+    logger.info(f"[CHAT] prompt ≈{sum(estimate_tokens(m['content']) for m in messages)} tokens "
+                f"({len(past)} history messages)")
+    return messages
+
+
+async def _call_groq(messages: List[Dict[str, str]]) -> str:
+    result = await _groq_client.chat.completions.create(
+        model=DEFAULT_GROQ_MODEL,
+        messages=messages,
+        temperature=0.3,
+        max_tokens=1500,
+        top_p=0.9,
+    )
     return result.choices[0].message.content.strip()
 
+
+async def _stream_groq(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Yield answer text as Groq generates it."""
+    stream = await _groq_client.chat.completions.create(
+        model=DEFAULT_GROQ_MODEL,
+        messages=messages,
+        temperature=0.3,
+        max_tokens=1500,
+        top_p=0.9,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+
 # ─── ENDPOINT ─────────────────────────────────────────────────────────────────
 
+def _prepare_chat(request: ChatRequest) -> List[Dict[str, str]]:
+    msg = request.message.strip()
+    if not msg:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    if _groq_client is None:
+        raise HTTPException(status_code=503, detail="AI service unavailable. Check GROQ_API_KEY.")
+
+    intents = detect_intents(msg)
+    logger.info(f"[CHAT] intents={intents} | msg={msg[:60]}")
+    return build_prompt(msg, request.history or [], intents)
+
+
 @router.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     try:
-        msg = request.message.strip()
-        if not msg:
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-        if _groq_client is None:
-            raise HTTPException(status_code=503, detail="AI service unavailable. Check GROQ_API_KEY.")
-
-        intents = detect_intents(msg)
-        logger.info(f"[CHAT] intents={intents} | msg={msg[:60]}")
-
-        context  = build_context(intents)
-        response = await _call_groq(msg, request.history or [], context)
+        messages = _prepare_chat(request)
+        response = await _call_groq(messages)
 
         return ChatResponse(response=response, confidence=0.92)
 
@@ -374,6 +628,32 @@ async def chat_endpoint(request: ChatRequest):
         logger.error(f"[CHAT ERROR] {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Same as /chat, streamed as Server-Sent Events:
+      data: {"token": "..."}                       — repeated as text arrives
+      event: done   data: {"response", "timestamp"} — full answer at the end
+      event: error  data: {"detail"}               — generation failed mid-stream
+    """
+    messages = _prepare_chat(request)
+
+    async def _events():
+        parts: List[str] = []
+        try:
+            async for token in _stream_groq(messages):
+                parts.append(token)
+                yield _sse({"token": token})
+            yield _sse({"response": "".join(parts).strip(), "confidence": 0.92,
+                        "timestamp": datetime.now().isoformat()}, event="done")
+        except Exception as e:
+            logger.error(f"[CHAT STREAM ERROR] {e}", exc_info=True)
+            yield _sse({"detail": str(e)}, event="error")
+
+    return StreamingResponse(_events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # ─── HEALTH ───────────────────────────────────────────────────────────────────
 
 @router.get("/chat/health")
@@ -382,5 +662,6 @@ async def chat_health():
         "status": "healthy",
         "groq_ready": _groq_client is not None,
         "webfleet_drivers_cached": len(_webfleet_cache),
+        "context_blocks": context_status(),
         "timestamp": datetime.now().isoformat()
     }
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 import sys
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 import openpyxl
 from pathlib import Path
@@ -8,14 +10,22 @@ import pandas as pd
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from salesforce_service import SalesforceService
+from salesforce_service import SalesforceService, get_salesforce_service
+from soql_aggregates import query_in_chunks, COST_GROUP_CHUNK
+from cost_matrix import CostMatrix
+from lease_repository import get_lease_repository
+from single_flight import coalesce
 
 try:
     from lease_data_helper import get_lease_data_with_trade_groups
+    # Aliased: the /api/leases/trade-groups route below is also named get_trade_groups
+    from lease_data_helper import get_trade_groups as load_reg_trade_map
 except Exception as e:
     print(f"[WARNING] lease_data_helper not available: {e}")
     def get_lease_data_with_trade_groups(*a, **k):
         return pd.DataFrame()
+    def load_reg_trade_map():
+        return {}
 
 try:
     from operational_insights import get_operational_insights, get_top_10_expensive_vans, get_cost_summary
@@ -41,7 +51,8 @@ def get_excel_path() -> str | None:
     """
     Download HSBC_Leases.xlsx from GitHub repo at runtime.
     Cached after first download so it only fetches once per container lifetime.
-    No Dockerfile changes needed.
+    The Docker image bakes the workbook into /app (found by the local check
+    below), so the download only runs for images built without it.
     """
     global _cached_excel_path
 
@@ -81,6 +92,10 @@ get_csv_path = get_excel_path
 EXCEL_FILE = ""  # don't call at import time — download on first request
 
 
+def _lease_rows(snapshot):
+    return [r for r in snapshot.raw_rows if r.get('Identifier ') or r.get('Registration Doc ')]
+
+
 def load_lease_data():
     """Load lease data from HSBC_Leases.xlsx (in repo root → /app/HSBC_Leases.xlsx in GCP)"""
     path = get_excel_path()
@@ -88,18 +103,8 @@ def load_lease_data():
         print("❌ HSBC_Leases.xlsx not found")
         return []
     try:
-        wb = openpyxl.load_workbook(path, data_only=True)
-        ws = wb.active
-        headers = [ws.cell(2, i).value for i in range(1, ws.max_column + 1) if ws.cell(2, i).value]
-        leases = []
-        for row_idx in range(3, ws.max_row + 1):
-            row_data = {}
-            for col_idx, header in enumerate(headers, 1):
-                row_data[header] = ws.cell(row_idx, col_idx).value
-            if row_data.get('Identifier ') or row_data.get('Registration Doc '):
-                leases.append(row_data)
-        print(f"✅ Loaded {len(leases)} leases from Excel")
-        return leases
+        # Parsed once per workbook version; the rows are shared, don't modify them
+        return get_lease_repository().snapshot(path).derive("cost_lease_rows", _lease_rows)
     except Exception as e:
         print(f"❌ Error loading Excel: {e}")
         return []
@@ -122,10 +127,8 @@ def get_trade_groups():
 
 # ─── SERVICE COST BY VAN ──────────────────────────────────────────────────────
 @router.get("/service/{van_number}")
-def get_service_cost(van_number: str):
+def get_service_cost(van_number: str, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-
         print(f"\n🔧 FETCHING SERVICE & MAINTENANCE COSTS FOR VAN: {van_number}")
         print("="*80)
 
@@ -154,7 +157,7 @@ def get_service_cost(van_number: str):
             GROUP BY Vehicle__c, Type__c
         """
 
-        cost_records = sf.sf.query_all(cost_query).get('records', [])
+        cost_records = sf.call(lambda client: client.query_all(cost_query)).get('records', [])
 
         cost_by_type = {}
         total_cost = 0
@@ -208,10 +211,8 @@ def get_service_cost(van_number: str):
 
 # ─── VEHICLE COST BY ID ───────────────────────────────────────────────────────
 @router.get("/vehicle/{vehicle_id}")
-def get_vehicle_cost(vehicle_id: str):
+def get_vehicle_cost(vehicle_id: str, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-
         print(f"💰 Fetching cost data for vehicle: {vehicle_id}")
 
         vehicle_query = f"""
@@ -236,7 +237,7 @@ def get_vehicle_cost(vehicle_id: str):
             ORDER BY CreatedDate DESC
         """
 
-        costs = sf.sf.query_all(cost_query).get('records', [])
+        costs = sf.call(lambda client: client.query_all(cost_query)).get('records', [])
 
         cost_by_type = {}
         total_cost = 0
@@ -305,10 +306,8 @@ def get_vehicle_cost(vehicle_id: str):
 
 # ─── ALL VEHICLES COSTS ───────────────────────────────────────────────────────
 @router.get("/all-vehicles")
-def get_all_vehicles_costs():
+def get_all_vehicles_costs(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-
         print("\n" + "="*80)
         print("💰 FETCHING ALL VEHICLE COSTS")
         print("="*80)
@@ -319,61 +318,42 @@ def get_all_vehicles_costs():
             ORDER BY Van_Number__c ASC
         """
 
-        vehicles = sf.sf.query_all(vehicle_query).get('records', [])
+        vehicles = sf.query_soql(vehicle_query)
         print(f"✅ Found {len(vehicles)} vehicles")
 
-        cost_query = """
-            SELECT Vehicle__c, Type__c, Payment_value__c, CreatedDate
-            FROM Vehicle_Service_Payment__c
-            ORDER BY Vehicle__c, Type__c
-        """
-
-        cost_records = sf.sf.query_all(cost_query).get('records', [])
+        vehicle_ids = [v.get('Id') for v in vehicles]
 
-        vehicle_costs = {}
-        for cost in cost_records:
-            vehicle_id = cost.get('Vehicle__c')
-            cost_type = cost.get('Type__c', 'Other')
-            amount = float(cost.get('Payment_value__c', 0) or 0)
-
-            if vehicle_id not in vehicle_costs:
-                vehicle_costs[vehicle_id] = {'total': 0, 'by_type': {}}
+        # Salesforce sums the payments; chunking by vehicle keeps each
+        # aggregate under the 2,000 group limit.
+        cost_records = query_in_chunks(sf, """
+            SELECT Vehicle__c, Type__c, SUM(Payment_value__c) Total_Amount
+            FROM Vehicle_Service_Payment__c
+            WHERE Vehicle__c IN ({ids})
+            GROUP BY Vehicle__c, Type__c
+        """, [vid for vid in vehicle_ids if vid], chunk_size=COST_GROUP_CHUNK)
+        print(f"✅ {len(cost_records)} vehicle/type cost groups")
 
-            vehicle_costs[vehicle_id]['total'] += amount
-            if cost_type not in vehicle_costs[vehicle_id]['by_type']:
-                vehicle_costs[vehicle_id]['by_type'][cost_type] = 0
-            vehicle_costs[vehicle_id]['by_type'][cost_type] += amount
+        matrix = CostMatrix.from_grouped_rows(vehicle_ids, cost_records, "Total_Amount")
+        totals = matrix.vehicle_totals()
+        monthly = matrix.monthly_averages()
+        total_fleet_cost = float(totals.sum())
 
         vehicles_list = []
-        total_fleet_cost = 0
-        fleet_cost_by_type = {}
-
-        for vehicle in vehicles:
-            vehicle_id = vehicle.get('Id')
-            vehicle_cost_info = vehicle_costs.get(vehicle_id, {'total': 0, 'by_type': {}})
-            total_cost = vehicle_cost_info['total']
-            cost_breakdown = vehicle_cost_info['by_type']
-
-            total_fleet_cost += total_cost
-
-            for cost_type, amount in cost_breakdown.items():
-                if cost_type not in fleet_cost_by_type:
-                    fleet_cost_by_type[cost_type] = 0
-                fleet_cost_by_type[cost_type] += amount
-
+        for i in matrix.ranking():
+            vehicle = vehicles[i]
+            total_cost = float(totals[i])
             vehicles_list.append({
-                "vehicle_id": vehicle_id,
+                "vehicle_id": vehicle.get('Id'),
                 "name": vehicle.get('Name'),
                 "van_number": vehicle.get('Van_Number__c'),
                 "registration": vehicle.get('Reg_No__c'),
                 "vehicle_type": vehicle.get('Vehicle_Type__c'),
                 "status": vehicle.get('Status__c'),
                 "total_cost": round(total_cost, 2),
-                "cost_breakdown": {k: round(v, 2) for k, v in cost_breakdown.items()},
-                "monthly_average": round(total_cost / 12, 2) if total_cost > 0 else 0
+                "cost_breakdown": {k: round(v, 2) for k, v in matrix.breakdown(i).items()},
+                "monthly_average": round(float(monthly[i]), 2) if total_cost > 0 else 0
             })
 
-        vehicles_list.sort(key=lambda x: x['total_cost'], reverse=True)
         avg_vehicle_cost = round(total_fleet_cost / len(vehicles), 2) if vehicles else 0
 
         return {
@@ -382,9 +362,9 @@ def get_all_vehicles_costs():
                 "total_fleet_cost": round(total_fleet_cost, 2),
                 "average_vehicle_cost": avg_vehicle_cost,
                 "vehicle_count": len(vehicles),
-                "vehicles_with_costs": len(vehicle_costs)
+                "vehicles_with_costs": matrix.vehicles_with_costs()
             },
-            "cost_breakdown_by_type": {k: round(v, 2) for k, v in fleet_cost_by_type.items()},
+            "cost_breakdown_by_type": {k: round(v, 2) for k, v in matrix.type_totals().items()},
             "vehicles": vehicles_list,
             "top_cost_vehicles": vehicles_list[:10]
         }
@@ -398,10 +378,8 @@ def get_all_vehicles_costs():
 
 # ─── SERVICE & MAINTENANCE INSIGHTS ──────────────────────────────────────────
 @router.get("/service-maintenance/insights")
-def get_service_maintenance_insights(trade_filter: str = None):
+def get_service_maintenance_insights(trade_filter: str = None, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
-
         print("\n" + "="*80)
         print("💰 FETCHING SERVICE & MAINTENANCE COST INSIGHTS")
         if trade_filter:
@@ -421,7 +399,7 @@ def get_service_maintenance_insights(trade_filter: str = None):
             ORDER BY Van_Number__c ASC
         """
 
-        vehicles = sf.sf.query_all(vehicle_query).get('records', [])
+        vehicles = sf.call(lambda client: client.query_all(vehicle_query)).get('records', [])
 
         cost_query = """
             SELECT Vehicle__c, Type__c, SUM(Payment_value__c) Total_Amount
@@ -430,7 +408,7 @@ def get_service_maintenance_insights(trade_filter: str = None):
             ORDER BY Vehicle__c, Type__c
         """
 
-        cost_records = sf.sf.query_all(cost_query).get('records', [])
+        cost_records = sf.call(lambda client: client.query_all(cost_query)).get('records', [])
 
         vehicle_costs_map = {}
         for cost in cost_records:
@@ -580,15 +558,8 @@ def get_leases_with_trade_group(trade_filter: str = None):
         if not leases:
             return {"success": False, "total": 0, "leases": []}
 
-        sf = SalesforceService()
-        vehicle_query = """
-            SELECT Reg_No__c, Trade_Group__c
-            FROM Vehicle__c
-            WHERE Reg_No__c != NULL
-        """
-
-        vehicles = sf.sf.query_all(vehicle_query).get('records', [])
-        reg_to_trade = {v.get('Reg_No__c'): v.get('Trade_Group__c', 'Not Assigned') for v in vehicles}
+        # Shared reg → trade group map, refreshed every LEASE_TRADE_GROUP_TTL
+        reg_to_trade = get_lease_repository().trade_group_map(load_reg_trade_map)
 
         lease_list = []
         total_capital_cost = 0
@@ -677,25 +648,60 @@ def get_lease_by_registration(registration: str):
 
 
 # ─── LEASES: CSV-ALL (main Excel endpoint used by frontend) ───────────────────
+CSV_CURRENCY_COLS = [
+    'Net Capital', 'VAT on Acquisition', 'RFL', 'Capital Cost',
+    'Arrangement Fee', 'Finance Interest', 'Initial Payment',
+    'Monthly Installment', 'Final Payment', 'Total Repayment',
+]
+
+
+def _fmt_currency(val):
+    try:
+        if pd.isna(val):
+            return ''
+        f = float(val)
+        return '' if f == 0 else f'£{f:,.2f}'
+    except Exception:
+        v = str(val).strip() if val is not None else ''
+        return v if v and v not in ('0', '0.0', '-') else ''
+
+
+def _csv_lease_rows(snapshot):
+    """Display-formatted rows for /leases/csv-all, built once per workbook version."""
+    df = snapshot.frame.copy()
+
+    if 'Identifier' in df.columns:
+        df['Identifier'] = df['Identifier'].ffill()
+
+    rows = []
+    for _, row_data in df.iterrows():
+        r = {}
+        for col in df.columns:
+            val = row_data[col]
+            if col in CSV_CURRENCY_COLS:
+                r[col] = _fmt_currency(val)
+            elif hasattr(val, 'strftime'):
+                try:
+                    r[col] = val.strftime('%d/%m/%Y')
+                except Exception:
+                    r[col] = ''
+            else:
+                try:
+                    r[col] = '' if pd.isna(val) else (str(val) if not isinstance(val, str) else val)
+                except Exception:
+                    r[col] = str(val) if val is not None else ''
+
+        if not r.get('Type') and not r.get('Make and Model'):
+            continue
+
+        r['_identifier'] = r.get('Identifier', '')
+        rows.append(r)
+    return rows
+
+
 @router.get("/leases/csv-all")
 def get_all_csv_leases():
     # ✅ FIXED: removed hardcoded Windows path, now uses get_excel_path()
-    CURRENCY_COLS = [
-        'Net Capital', 'VAT on Acquisition', 'RFL', 'Capital Cost',
-        'Arrangement Fee', 'Finance Interest', 'Initial Payment',
-        'Monthly Installment', 'Final Payment', 'Total Repayment',
-    ]
-
-    def fmt_currency(val):
-        try:
-            if pd.isna(val):
-                return ''
-            f = float(val)
-            return '' if f == 0 else f'£{f:,.2f}'
-        except Exception:
-            v = str(val).strip() if val is not None else ''
-            return v if v and v not in ('0', '0.0', '-') else ''
-
     try:
         excel_file = get_excel_path()
 
@@ -707,41 +713,9 @@ def get_all_csv_leases():
                 "error": "HSBC_Leases.xlsx not found. It should be in the repo root (copied to /app/ in GCP)."
             }
 
-        try:
-            from excel_handler import read_and_clean_hsbc_leases
-            df = read_and_clean_hsbc_leases(excel_file, verbose=False)
-        except ImportError:
-            # Fallback: read Excel directly with pandas
-            df = pd.read_excel(excel_file)
-
-        if 'Identifier' in df.columns:
-            df['Identifier'] = df['Identifier'].ffill()
-
-        rows = []
-        for _, row_data in df.iterrows():
-            r = {}
-            for col in df.columns:
-                val = row_data[col]
-                if col in CURRENCY_COLS:
-                    r[col] = fmt_currency(val)
-                elif hasattr(val, 'strftime'):
-                    try:
-                        r[col] = val.strftime('%d/%m/%Y')
-                    except Exception:
-                        r[col] = ''
-                else:
-                    try:
-                        r[col] = '' if pd.isna(val) else (str(val) if not isinstance(val, str) else val)
-                    except Exception:
-                        r[col] = str(val) if val is not None else ''
-
-            if not r.get('Type') and not r.get('Make and Model'):
-                continue
-
-            r['_identifier'] = r.get('Identifier', '')
-            rows.append(r)
+        rows = get_lease_repository().snapshot(excel_file).derive("csv_rows", _csv_lease_rows)
 
-        print(f"✅ Excel leases loaded: {len(rows)} rows from {excel_file}")
+        print(f"✅ Excel leases served: {len(rows)} rows from {excel_file}")
         return {"success": True, "total": len(rows), "rows": rows}
 
     except Exception as e:
@@ -817,170 +791,223 @@ def get_cost_breakdown(trade_group: str = None):
 
 
 # ─── VEHICLE FINANCIAL OVERVIEW ───────────────────────────────────────────────
+# The joined fleet frame is rebuilt at most this often; each trade-group view
+# of it is computed once per build.
+FINANCIAL_OVERVIEW_TTL = 120
+
+_overview_lock = threading.Lock()
+_overview_fleet = {"frame": None, "built_at": 0.0, "lease_df": None}
+_overview_results = {}
+
+
+def _round(series, digits):
+    # Python's round(), not numpy's scaled rounding — keeps cents identical to the old loop
+    return series.map(lambda v: round(v, digits))
+
+
+def _normalise_registration(series):
+    return series.where(series.notna(), '').astype(str).str.strip().str.upper()
+
+
+def _lease_join_frame(lease_df):
+    """One row per registration (last one wins, as the old dict build did)."""
+    if lease_df is None or not isinstance(lease_df, pd.DataFrame) or len(lease_df) == 0 \
+            or 'Registration Doc' not in lease_df.columns:
+        return pd.DataFrame(columns=['reg_key', 'identifier', 'capital_cost', 'net_capital', 'repayment', 'asset_type'])
+
+    def money(col):
+        if col not in lease_df.columns:
+            return 0.0
+        return pd.to_numeric(lease_df[col], errors='coerce').fillna(0).astype(float)
+
+    leases = pd.DataFrame({
+        'reg_key': _normalise_registration(lease_df['Registration Doc']),
+        'identifier': lease_df['Identifier'] if 'Identifier' in lease_df.columns else None,
+        'capital_cost': money('Capital Cost'),
+        'net_capital': money('Net Capital'),
+        'repayment': money('Total Repayment'),
+        'asset_type': lease_df['Asset Type'] if 'Asset Type' in lease_df.columns else 'Unknown',
+    })
+    leases = leases[leases['reg_key'] != '']
+    return leases.drop_duplicates('reg_key', keep='last')
+
+
+def _cost_join_frame(cost_records):
+    """Per-vehicle service / maintenance / total plus the by-type breakdown dict."""
+    costs = pd.DataFrame({
+        'vehicle_id': [r.get('Vehicle__c') for r in cost_records],
+        'cost_type': [r.get('Type__c') or 'Other' for r in cost_records],
+        'amount': [float(r.get('Total_By_Type', 0) or 0) for r in cost_records],
+    })
+    if costs.empty:
+        return pd.DataFrame(columns=['service_cost', 'maintenance_cost', 'total_ops_cost', 'cost_breakdown'])
+
+    is_maint = costs['cost_type'] == 'Maintenance'
+    costs['maintenance_cost'] = costs['amount'].where(is_maint, 0.0)
+    costs['service_cost'] = costs['amount'].where(~is_maint, 0.0)
+    per_vehicle = costs.groupby('vehicle_id', sort=False).agg(
+        service_cost=('service_cost', 'sum'),
+        maintenance_cost=('maintenance_cost', 'sum'),
+        total_ops_cost=('amount', 'sum'),
+    )
+    breakdown = {}
+    for vid, cost_type, amount in zip(costs['vehicle_id'], costs['cost_type'], costs['amount']):
+        breakdown.setdefault(vid, {})[cost_type] = round(amount, 2)
+    per_vehicle['cost_breakdown'] = per_vehicle.index.map(breakdown)
+    return per_vehicle
+
+
+def _build_fleet_financials(sf, lease_df):
+    """Active vehicles ⋈ lease register (on registration) ⋈ cost aggregates (on Id)."""
+    print("\n🚗 Fetching vehicles from Salesforce...")
+    vehicle_query = """
+        SELECT Id, Name, Van_Number__c, Reg_No__c, Vehicle_Type__c, Trade_Group__c, Status__c
+        FROM Vehicle__c
+        WHERE Status__c = 'Active'
+        ORDER BY Van_Number__c ASC
+    """
+    vehicles = sf.execute_soql(vehicle_query)
+    print(f"✅ Found {len(vehicles)} active vehicles")
+
+    print("\n💰 Fetching service & maintenance costs...")
+    cost_records = query_in_chunks(sf, """
+        SELECT Vehicle__c, Type__c, SUM(Payment_value__c) Total_By_Type
+        FROM Vehicle_Service_Payment__c
+        WHERE Vehicle__c IN ({ids})
+        GROUP BY Vehicle__c, Type__c
+    """, [v['Id'] for v in vehicles if v.get('Id')], chunk_size=COST_GROUP_CHUNK)
+
+    fleet = pd.DataFrame({
+        'vehicle_id': [v.get('Id') for v in vehicles],
+        'van_number': [v.get('Van_Number__c') or 'UNASSIGNED' for v in vehicles],
+        'registration': [(v.get('Reg_No__c') or '').upper() for v in vehicles],
+        'vehicle_name': [v.get('Name', f"Van {v.get('Van_Number__c') or 'UNASSIGNED'}") for v in vehicles],
+        'trade_group': [v.get('Trade_Group__c') or 'Not Assigned' for v in vehicles],
+    }, dtype=object)
+    fleet['reg_key'] = fleet['registration'].str.strip()
+
+    leases = _lease_join_frame(lease_df)
+    print(f"✅ Joined against {len(leases)} lease records")
+
+    fleet = fleet.merge(leases, on='reg_key', how='left')
+    fleet = fleet.merge(_cost_join_frame(cost_records), left_on='vehicle_id', right_index=True, how='left')
+
+    for col in ('capital_cost', 'net_capital', 'repayment', 'service_cost', 'maintenance_cost', 'total_ops_cost'):
+        fleet[col] = pd.to_numeric(fleet[col], errors='coerce').fillna(0.0)
+    fleet['identifier'] = fleet['identifier'].fillna('N/A')
+    fleet['asset_type'] = fleet['asset_type'].fillna('Unknown')
+    fleet['cost_breakdown'] = [b if isinstance(b, dict) else {} for b in fleet['cost_breakdown']]
+    fleet['registration'] = fleet['registration'].replace('', 'N/A')
+    fleet['total_cost'] = fleet['capital_cost'] + fleet['total_ops_cost']
+
+    total = fleet['total_cost'].where(fleet['total_cost'] > 0)
+    for part, col in (('capital', 'capital_cost'), ('service', 'service_cost'), ('maintenance', 'maintenance_cost')):
+        fleet[f'pct_{part}'] = _round(fleet[col] / total * 100, 1).fillna(0)
+
+    return fleet[(fleet['total_cost'] > 0) | (fleet['capital_cost'] > 0)].reset_index(drop=True)
+
+
+def _fleet_financials(sf):
+    """Cached joined fleet frame; rebuilt after FINANCIAL_OVERVIEW_TTL or a lease file change."""
+    print("\n📋 Loading lease data...")
+    lease_df = get_lease_data_with_trade_groups(as_dict=False)
+
+    with _overview_lock:
+        fresh = time.time() - _overview_fleet["built_at"] < FINANCIAL_OVERVIEW_TTL
+        if _overview_fleet["frame"] is not None and fresh and _overview_fleet["lease_df"] is lease_df:
+            return _overview_fleet["frame"], False
+
+    frame = _build_fleet_financials(sf, lease_df)
+    with _overview_lock:
+        _overview_fleet.update(frame=frame, built_at=time.time(), lease_df=lease_df)
+        _overview_results.clear()
+    return frame, True
+
+
+def _financial_overview(fleet, trade_group):
+    # Fleet totals cover every vehicle with costs, whatever the filter
+    total_fleet_capital = float(fleet['capital_cost'].sum())
+    total_fleet_operations = float(fleet['total_ops_cost'].sum())
+
+    view = fleet
+    if trade_group:
+        view = fleet[fleet['trade_group'].str.lower() == trade_group.lower()]
+    view = view.assign(total_cost_rounded=_round(view['total_cost'], 2)) \
+               .sort_values('total_cost_rounded', ascending=False, kind='stable')
+
+    money_cols = {
+        'capital_cost': 'capital_cost', 'net_capital': 'net_capital', 'repayment': 'lease_repayment',
+        'service_cost': 'service_cost', 'maintenance_cost': 'maintenance_cost',
+        'total_ops_cost': 'total_operations_cost', 'total_cost': 'total_cost',
+    }
+    flat = view[['van_number', 'registration', 'vehicle_name', 'trade_group', 'identifier', 'asset_type']] \
+        .join(view[list(money_cols)].apply(_round, digits=2).rename(columns=money_cols))
+    vehicles_financial = [
+        dict(rec, cost_breakdown=breakdown,
+             cost_percentage={'capital': capital, 'service': service, 'maintenance': maintenance})
+        for rec, breakdown, capital, service, maintenance in zip(
+            flat.to_dict('records'), view['cost_breakdown'],
+            view['pct_capital'].tolist(), view['pct_service'].tolist(), view['pct_maintenance'].tolist())
+    ]
+
+    total_fleet_cost = total_fleet_capital + total_fleet_operations
+    total_service = float(flat['service_cost'].sum())
+    total_maintenance = float(flat['maintenance_cost'].sum())
+
+    summary = {
+        'total_vehicles_with_costs': len(vehicles_financial),
+        'total_fleet_capital_cost': round(total_fleet_capital, 2),
+        'total_fleet_operations_cost': round(total_fleet_operations, 2),
+        'total_fleet_service_cost': round(total_service, 2),
+        'total_fleet_maintenance_cost': round(total_maintenance, 2),
+        'total_fleet_cost': round(total_fleet_cost, 2),
+        'average_capital_per_vehicle': round(total_fleet_capital / len(vehicles_financial), 2) if vehicles_financial else 0,
+        'average_operations_per_vehicle': round(total_fleet_operations / len(vehicles_financial), 2) if vehicles_financial else 0,
+        'fleet_cost_percentage': {
+            'capital': round((total_fleet_capital / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0,
+            'operations': round((total_fleet_operations / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0,
+            'service': round((total_service / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0,
+            'maintenance': round((total_maintenance / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0
+        }
+    }
+
+    return {
+        "success": True,
+        "summary": summary,
+        "vehicles": vehicles_financial,
+        "insights": {
+            "total_records": len(vehicles_financial),
+            "highest_cost_van": vehicles_financial[0] if vehicles_financial else None,
+            "cost_structure": "Capital (Lease) + Operations (Service + Maintenance)",
+        }
+    }
+
+
 @router.get("/vehicle-financial-overview")
-def get_vehicle_financial_overview(trade_group: str = None):
+@coalesce("cost.vehicle-financial-overview", key=lambda kw: (kw.get("trade_group") or "").lower())
+def get_vehicle_financial_overview(trade_group: str = None, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
         print("\n" + "="*80)
         print("📊 GENERATING COMPREHENSIVE VEHICLE FINANCIAL OVERVIEW")
         print("="*80)
 
-        sf = SalesforceService()
-
-        print("\n📋 Loading lease data...")
-        lease_df = get_lease_data_with_trade_groups(as_dict=False)
-        lease_dict = {}
-
-        if lease_df is not None and isinstance(lease_df, pd.DataFrame) and len(lease_df) > 0:
-            for _, row in lease_df.iterrows():
-                reg_key = str(row.get('Registration Doc', '')).strip().upper() if pd.notna(row.get('Registration Doc')) else None
-                if reg_key:
-                    lease_dict[reg_key] = {
-                        'identifier': row.get('Identifier'),
-                        'capital_cost': float(row.get('Capital Cost', 0)) if pd.notna(row.get('Capital Cost')) else 0,
-                        'net_capital': float(row.get('Net Capital', 0)) if pd.notna(row.get('Net Capital')) else 0,
-                        'repayment': float(row.get('Total Repayment', 0)) if pd.notna(row.get('Total Repayment')) else 0,
-                        'asset_type': row.get('Asset Type', 'Unknown')
-                    }
-            print(f"✅ Loaded {len(lease_dict)} lease records")
-        else:
-            print("⚠️  No lease data available")
-
-        print("\n🚗 Fetching vehicles from Salesforce...")
-        vehicle_query = """
-            SELECT Id, Name, Van_Number__c, Reg_No__c, Vehicle_Type__c, Trade_Group__c, Status__c
-            FROM Vehicle__c
-            WHERE Status__c = 'Active'
-            ORDER BY Van_Number__c ASC
-        """
+        fleet, rebuilt = _fleet_financials(sf)
+        key = (trade_group or '').lower()
 
-        vehicles = sf.execute_soql(vehicle_query)
-        print(f"✅ Found {len(vehicles)} active vehicles")
-
-        print("\n💰 Fetching service & maintenance costs...")
-        cost_query = """
-            SELECT Vehicle__c, Type__c, SUM(Payment_value__c) Total_By_Type
-            FROM Vehicle_Service_Payment__c
-            GROUP BY Vehicle__c, Type__c
-        """
-
-        cost_records = sf.sf.query_all(cost_query).get('records', [])
-
-        vehicle_costs_map = {}
-        for record in cost_records:
-            vehicle_id = record.get('Vehicle__c')
-            cost_type = record.get('Type__c', 'Other')
-            amount = float(record.get('Total_By_Type', 0) or 0)
-
-            if vehicle_id not in vehicle_costs_map:
-                vehicle_costs_map[vehicle_id] = {'service_cost': 0, 'maintenance_cost': 0, 'total_ops_cost': 0, 'cost_breakdown': {}}
-
-            vehicle_costs_map[vehicle_id]['cost_breakdown'][cost_type] = round(amount, 2)
-            vehicle_costs_map[vehicle_id]['total_ops_cost'] += amount
-
-            if cost_type == 'Maintenance':
-                vehicle_costs_map[vehicle_id]['maintenance_cost'] += amount
-            else:
-                vehicle_costs_map[vehicle_id]['service_cost'] += amount
-
-        vehicles_financial = []
-        total_fleet_capital = 0
-        total_fleet_operations = 0
-
-        for vehicle in vehicles:
-            vehicle_id = vehicle.get('Id')
-            van_number = vehicle.get('Van_Number__c') or 'UNASSIGNED'
-            reg_number = (vehicle.get('Reg_No__c') or '').upper()
-            veh_trade_group = vehicle.get('Trade_Group__c') or 'Not Assigned'
-            vehicle_name = vehicle.get('Name', f'Van {van_number}')
-
-            capital_cost = net_capital = repayment = 0
-            asset_type = 'Unknown'
-            identifier = None
-
-            if reg_number and reg_number in lease_dict:
-                lease_info = lease_dict[reg_number]
-                capital_cost = lease_info['capital_cost']
-                net_capital = lease_info['net_capital']
-                repayment = lease_info['repayment']
-                asset_type = lease_info['asset_type']
-                identifier = lease_info['identifier']
-
-            service_cost = maintenance_cost = total_ops_cost = 0
-            cost_breakdown = {}
-
-            if vehicle_id in vehicle_costs_map:
-                costs = vehicle_costs_map[vehicle_id]
-                service_cost = costs['service_cost']
-                maintenance_cost = costs['maintenance_cost']
-                total_ops_cost = costs['total_ops_cost']
-                cost_breakdown = costs['cost_breakdown']
-
-            total_cost = capital_cost + total_ops_cost
-
-            vehicle_financial = {
-                'van_number': van_number,
-                'registration': reg_number or 'N/A',
-                'vehicle_name': vehicle_name,
-                'trade_group': veh_trade_group,
-                'identifier': identifier or 'N/A',
-                'asset_type': asset_type,
-                'capital_cost': round(capital_cost, 2),
-                'net_capital': round(net_capital, 2),
-                'lease_repayment': round(repayment, 2),
-                'service_cost': round(service_cost, 2),
-                'maintenance_cost': round(maintenance_cost, 2),
-                'total_operations_cost': round(total_ops_cost, 2),
-                'total_cost': round(total_cost, 2),
-                'cost_breakdown': {k: round(v, 2) for k, v in cost_breakdown.items()},
-                'cost_percentage': {
-                    'capital': round((capital_cost / total_cost * 100), 1) if total_cost > 0 else 0,
-                    'service': round((service_cost / total_cost * 100), 1) if total_cost > 0 else 0,
-                    'maintenance': round((maintenance_cost / total_cost * 100), 1) if total_cost > 0 else 0
-                }
-            }
-
-            if total_cost > 0 or capital_cost > 0:
-                vehicles_financial.append(vehicle_financial)
-                total_fleet_capital += capital_cost
-                total_fleet_operations += total_ops_cost
-
-        if trade_group:
-            vehicles_financial = [v for v in vehicles_financial if v['trade_group'].lower() == trade_group.lower()]
-
-        vehicles_financial.sort(key=lambda x: x['total_cost'], reverse=True)
-
-        total_fleet_cost = total_fleet_capital + total_fleet_operations
-
-        summary = {
-            'total_vehicles_with_costs': len(vehicles_financial),
-            'total_fleet_capital_cost': round(total_fleet_capital, 2),
-            'total_fleet_operations_cost': round(total_fleet_operations, 2),
-            'total_fleet_service_cost': round(sum(v['service_cost'] for v in vehicles_financial), 2),
-            'total_fleet_maintenance_cost': round(sum(v['maintenance_cost'] for v in vehicles_financial), 2),
-            'total_fleet_cost': round(total_fleet_cost, 2),
-            'average_capital_per_vehicle': round(total_fleet_capital / len(vehicles_financial), 2) if vehicles_financial else 0,
-            'average_operations_per_vehicle': round(total_fleet_operations / len(vehicles_financial), 2) if vehicles_financial else 0,
-            'fleet_cost_percentage': {
-                'capital': round((total_fleet_capital / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0,
-                'operations': round((total_fleet_operations / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0,
-                'service': round((sum(v['service_cost'] for v in vehicles_financial) / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0,
-                'maintenance': round((sum(v['maintenance_cost'] for v in vehicles_financial) / total_fleet_cost * 100), 1) if total_fleet_cost > 0 else 0
-            }
-        }
+        with _overview_lock:
+            result = None if rebuilt else _overview_results.get(key)
+        if result is None:
+            result = _financial_overview(fleet, trade_group)
+            with _overview_lock:
+                if _overview_fleet["frame"] is fleet:
+                    _overview_results[key] = result
+        else:
+            print(f"⚡ Served cached overview for trade group '{trade_group or 'ALL'}'")
 
-        return {
-            "success": True,
-            "summary": summary,
-            "vehicles": vehicles_financial,
-            "insights": {
-                "total_records": len(vehicles_financial),
-                "highest_cost_van": vehicles_financial[0] if vehicles_financial else None,
-                "cost_structure": "Capital (Lease) + Operations (Service + Maintenance)",
-            }
-        }
+        return result
 
     except Exception as e:
         print(f"❌ Error generating financial overview: {e}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error generating overview: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generating overview: {str(e)}")
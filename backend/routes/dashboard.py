@@ -1,28 +1,31 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from salesforce_service import SalesforceService
+from salesforce_service import SalesforceService, get_salesforce_service
+from soql_aggregates import run_parallel, group_count, bucket_due_dates, query_in_chunks, DUE_DATES_SOQL, COST_GROUP_CHUNK
 from webfleet_api import WebfleetService
+from single_flight import coalesce
+from sf_replica import get_replica_store, replica_enabled, replica_ready
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+# Summary tiles are polled constantly and tolerate a minute of staleness
+SUMMARY_CACHE_TTL = 60
+
 
 def get_mot_due_count(sf):
     """Helper function to get MOT due count"""
     print("🔄 [get_mot_due_count] Starting MOT query...")
     try:
         query = """
-            SELECT Id, Name
+            SELECT COUNT()
             FROM Vehicle__c
             WHERE Next_MOT_Date__c != NULL AND Next_MOT_Date__c <= NEXT_N_DAYS:30
         """
         print(f"🔍 [get_mot_due_count] Executing: {query.strip()}")
-        vehicles = sf.execute_soql(query)
-        count = len(vehicles) if vehicles else 0
+        count = sf.execute_soql_count(query, cache_ttl=SUMMARY_CACHE_TTL)
         print(f"[OK] [get_mot_due_count] Found {count} vehicles with Next_MOT_Date__c <= NEXT_N_DAYS:30")
-        if count > 0 and vehicles:
-            print(f"   Sample: {vehicles[0]}")
         return count
     except Exception as e:
         print(f"[WARN] [get_mot_due_count] Query failed: {e}")
@@ -36,15 +39,14 @@ def get_service_due_count(sf):
     print("🔄 [get_service_due_count] Starting Service query...")
     try:
         query = """
-            SELECT Id, Name
+            SELECT COUNT()
             FROM Vehicle__c
             WHERE Next_Service_Date__c >= TODAY
             AND Next_Service_Date__c <= NEXT_N_DAYS:30
             AND Leaver__c = false
         """
         print(f"🔍 [get_service_due_count] Executing: {query.strip()}")
-        vehicles = sf.execute_soql(query)
-        count = len(vehicles) if vehicles else 0
+        count = sf.execute_soql_count(query, cache_ttl=SUMMARY_CACHE_TTL)
         print(f"[OK] [get_service_due_count] Found {count} vehicles with service due in 30 days")
         return count
     except Exception as e:
@@ -59,18 +61,15 @@ def get_tax_due_count(sf):
     print("🔄 [get_tax_due_count] Starting Tax query...")
     try:
         query = """
-            SELECT Id, Name
+            SELECT COUNT()
             FROM Vehicle__c
             WHERE Next_Road_Tax__c >= TODAY
             AND Next_Road_Tax__c <= NEXT_N_DAYS:30
             AND Leaver__c = false
         """
         print(f"🔍 [get_tax_due_count] Executing: {query.strip()}")
-        vehicles = sf.execute_soql(query)
-        count = len(vehicles) if vehicles else 0
+        count = sf.execute_soql_count(query, cache_ttl=SUMMARY_CACHE_TTL)
         print(f"[OK] [get_tax_due_count] Found {count} vehicles with road tax due <= 30 days")
-        if count > 0 and vehicles:
-            print(f"   Sample: {vehicles[0]}")
         return count
     except Exception as e:
         print(f"[WARN] [get_tax_due_count] Tax field not available: {e}")
@@ -78,12 +77,11 @@ def get_tax_due_count(sf):
 
 
 @router.get("/debug-statuses")
-def debug_statuses():
+def debug_statuses(sf: SalesforceService = Depends(get_salesforce_service)):
     """
     DEBUG: Show all actual status values in Salesforce database
     """
     try:
-        sf = SalesforceService()
         
         # Get all vehicles with their status values
         query = "SELECT Status__c FROM Vehicle__c"
@@ -109,13 +107,38 @@ def debug_statuses():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/debug-cache")
+def debug_cache():
+    """
+    DEBUG: Shared Salesforce session, SOQL result cache and request coalescing counters
+    """
+    from salesforce_session import get_session_manager
+    from soql_cache import get_query_cache
+    from single_flight import get_single_flight
+    return {
+        "session": get_session_manager().status(),
+        "soql_cache": get_query_cache().stats(),
+        "single_flight": get_single_flight().stats(),
+    }
+
+
+@router.get("/debug-replica")
+def debug_replica():
+    """
+    DEBUG: Local Salesforce read-replica row counts, watermarks and sync age
+    """
+    return {
+        "enabled": replica_enabled(),
+        "objects": get_replica_store().status(),
+    }
+
+
 @router.get("/debug-mot-data")
-def debug_mot_data():
+def debug_mot_data(sf: SalesforceService = Depends(get_salesforce_service)):
     """
     DEBUG: Show sample vehicles with MOT data to understand the query issue
     """
     try:
-        sf = SalesforceService()
         
         # Get a sample of vehicles with various fields to understand the data
         query = """
@@ -160,12 +183,11 @@ def debug_mot_data():
 
 
 @router.get("/debug-fields")
-def debug_fields():
+def debug_fields(sf: SalesforceService = Depends(get_salesforce_service)):
     """
     DEBUG: Show all available fields on Vehicle__c object by fetching a sample record
     """
     try:
-        sf = SalesforceService()
         
         # Try to fetch a sample vehicle with all common date fields we know about
         query = """
@@ -220,18 +242,24 @@ def debug_fields():
 
 
 @router.get("/vehicle-summary")
-def get_vehicle_summary():
+@coalesce("dashboard.vehicle-summary")
+def get_vehicle_summary(sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Get vehicle summary counts by status from Salesforce.
     """
     try:
-        sf = SalesforceService()
+        # Two independent round trips, run side by side:
+        #   1. Status__c counts aggregated server-side (GROUP BY)
+        #   2. Only the vehicles due for service/MOT/tax, bucketed below
+        results = run_parallel({
+            "statuses": lambda: group_count(sf, "Vehicle__c", "Status__c", cache_ttl=SUMMARY_CACHE_TTL),
+            "due":      lambda: sf.query_soql(DUE_DATES_SOQL, cache_ttl=SUMMARY_CACHE_TTL),
+        })
+        by_status = results["statuses"]
+        if isinstance(by_status, Exception):
+            raise by_status
 
-        # Fetch ALL vehicles — only Status__c needed for counting
-        all_vehicles_query = "SELECT Id, Status__c FROM Vehicle__c"
-        vehicles = sf.execute_soql(all_vehicles_query) or []
-
-        print(f"📊 Total vehicles fetched (raw): {len(vehicles)}")
+        print(f"📊 Status groups fetched: {len(by_status)} ({sum(by_status.values())} vehicles)")
 
         # Initialize status counts (due_service computed by date below)
         status_counts = {
@@ -272,21 +300,19 @@ def get_vehicle_summary():
         status_values_found = {}
         unmapped_statuses = {}
 
-        for vehicle in vehicles:
-            sf_status = vehicle.get("Status__c")
-
+        for sf_status, count in by_status.items():
             if sf_status:
-                status_values_found[sf_status] = status_values_found.get(sf_status, 0) + 1
+                status_values_found[sf_status] = status_values_found.get(sf_status, 0) + count
 
                 # Current Vehicles = everything except Sold / Written Off
                 if sf_status not in EXCLUDED_STATUSES:
-                    total += 1
+                    total += count
 
                 response_key = status_mapping.get(sf_status)
                 if response_key:
-                    status_counts[response_key] += 1
+                    status_counts[response_key] += count
                 elif sf_status not in EXCLUDED_STATUSES:
-                    unmapped_statuses[sf_status] = unmapped_statuses.get(sf_status, 0) + 1
+                    unmapped_statuses[sf_status] = unmapped_statuses.get(sf_status, 0) + count
 
         print(f"[OK] Status values found in Salesforce:")
         for status, count in sorted(status_values_found.items()):
@@ -297,15 +323,21 @@ def get_vehicle_summary():
         if unmapped_statuses:
             print(f"[WARN] Unmapped statuses: {unmapped_statuses}")
 
-        # Get date-based counts (independent of Status__c)
-        print("📊 Getting Service due count...")
-        due_service = get_service_due_count(sf)
-
-        print("📊 Getting MOT due count...")
-        mot_due = get_mot_due_count(sf)
-
-        print("📊 Getting Tax due count...")
-        tax_due = get_tax_due_count(sf)
+        # Date-based counts (independent of Status__c)
+        due_rows = results["due"]
+        if isinstance(due_rows, Exception):
+            # e.g. a due-date field missing in this org — fall back to per-field COUNT()s
+            print(f"[WARN] Combined due-date query failed, using per-field counts: {due_rows}")
+            due_counts = run_parallel({
+                "due_service": lambda: get_service_due_count(sf),
+                "mot_due":     lambda: get_mot_due_count(sf),
+                "tax_due":     lambda: get_tax_due_count(sf),
+            })
+        else:
+            due_counts = bucket_due_dates(due_rows)
+        due_service = due_counts["due_service"]
+        mot_due     = due_counts["mot_due"]
+        tax_due     = due_counts["tax_due"]
 
         print(f"📊 SUMMARY RESULT: total={total}, Service={due_service}, MOT={mot_due}, Tax={tax_due}")
 
@@ -325,13 +357,11 @@ def get_vehicle_summary():
 
 
 @router.get("/vehicles-by-status/{status}")
-def get_vehicles_by_status(status: str):
+def get_vehicles_by_status(status: str, sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Get all vehicles with a specific status
     """
     try:
-        sf = SalesforceService()
-
         key = status.lower()
 
         # ── Current Vehicles: exclude Sold and Written Off ──────────────────
@@ -458,12 +488,11 @@ def get_vehicles_by_status(status: str):
 
 
 @router.get("/vehicles-service-due")
-def get_vehicles_service_due(days: int = 30):
+def get_vehicles_service_due(days: int = 30, sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Get vehicles with service due within the next `days` days (default 30).
     """
     try:
-        sf = SalesforceService()
         query = f"""
             SELECT Id, Name, Van_Number__c, Reg_No__c, Trade_Group__c,
                    Last_Service_Date__c, Next_Service_Date__c,
@@ -485,12 +514,11 @@ def get_vehicles_service_due(days: int = 30):
 
 
 @router.get("/vehicles-mot-due")
-def get_vehicles_mot_due(days: int = 30):
+def get_vehicles_mot_due(days: int = 30, sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Get vehicles with MOT due within the next `days` days (default 30).
     """
     try:
-        sf = SalesforceService()
         # Use SOQL date literal NEXT_N_DAYS: to filter
         query = f"""
             SELECT Id, Name, Reg_No__c, Van_Number__c, Status__c,
@@ -526,12 +554,11 @@ def get_vehicles_mot_due(days: int = 30):
 
 
 @router.get("/vehicles-tax-due")
-def get_vehicles_tax_due(days: int = 30):
+def get_vehicles_tax_due(days: int = 30, sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Get vehicles with road tax due within the next `days` days (default 30).
     """
     try:
-        sf = SalesforceService()
         query = f"""
             SELECT Id, Name, Van_Number__c, Reg_No__c, Trade_Group__c,
                    Last_Road_Tax__c, Next_Road_Tax__c, Next_Road_Tax_Editable__c,
@@ -552,14 +579,28 @@ def get_vehicles_tax_due(days: int = 30):
         return {"count": 0, "vehicles": []}
 
 
+# Same keywords the per-category LIKE '%...%' filters used (case-insensitive);
+# a type can land in more than one category, exactly as before.
+COST_CATEGORY_KEYWORDS = {
+    "maintenance": ("service", "maint", "repair"),
+    "fuel": ("fuel", "petrol", "diesel"),
+    "insurance": ("insurance",),
+}
+
+
+def categorise_cost_type(cost_type):
+    """Categories a Vehicle_Cost__c.Type__c value counts towards."""
+    text = (cost_type or "").lower()
+    return [cat for cat, words in COST_CATEGORY_KEYWORDS.items() if any(w in text for w in words)]
+
+
 @router.get("/cost-analysis")
-def get_cost_analysis():
+def get_cost_analysis(sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Get comprehensive cost analysis for all vehicles
     Returns: ranked vehicles by total cost, spending breakdown, and insights
     """
     try:
-        sf = SalesforceService()
         
         print("💰 Fetching cost analysis data...")
         
@@ -583,52 +624,35 @@ def get_cost_analysis():
             }
         
         vehicle_ids = [v.get('Id') for v in vehicles if v.get('Id')]
-        ids_escaped = ", ".join([f"'{vid}'" for vid in vehicle_ids])
-        
-        # Get total cost per vehicle (all types)
-        total_cost_query = f"""
-            SELECT Vehicle__c, SUM(Payment_value__c) total_cost
-            FROM Vehicle_Cost__c
-            WHERE Vehicle__c IN ({ids_escaped})
-            GROUP BY Vehicle__c
-        """
-        
-        total_costs = sf.execute_soql(total_cost_query)
-        cost_map = {r.get('Vehicle__c'): float(r.get('total_cost', 0)) for r in total_costs}
-        
-        # Get maintenance costs
-        maint_query = f"""
-            SELECT Vehicle__c, SUM(Payment_value__c) maintenance_cost
-            FROM Vehicle_Cost__c
-            WHERE Vehicle__c IN ({ids_escaped}) AND (Type__c LIKE '%Service%' OR Type__c LIKE '%Maint%' OR Type__c LIKE '%Repair%')
-            GROUP BY Vehicle__c
-        """
-        
-        maint_costs = sf.execute_soql(maint_query)
-        maint_map = {r.get('Vehicle__c'): float(r.get('maintenance_cost', 0)) for r in maint_costs}
-        
-        # Get fuel costs (if tracked)
-        fuel_query = f"""
-            SELECT Vehicle__c, SUM(Payment_value__c) fuel_cost
-            FROM Vehicle_Cost__c
-            WHERE Vehicle__c IN ({ids_escaped}) AND (Type__c LIKE '%Fuel%' OR Type__c LIKE '%Petrol%' OR Type__c LIKE '%Diesel%')
-            GROUP BY Vehicle__c
-        """
-        
-        fuel_costs = sf.execute_soql(fuel_query)
-        fuel_map = {r.get('Vehicle__c'): float(r.get('fuel_cost', 0)) for r in fuel_costs}
-        
-        # Get insurance costs
-        insurance_query = f"""
-            SELECT Vehicle__c, SUM(Payment_value__c) insurance_cost
-            FROM Vehicle_Cost__c
-            WHERE Vehicle__c IN ({ids_escaped}) AND Type__c LIKE '%Insurance%'
-            GROUP BY Vehicle__c
-        """
-        
-        insurance_costs = sf.execute_soql(insurance_query)
-        insurance_map = {r.get('Vehicle__c'): float(r.get('insurance_cost', 0)) for r in insurance_costs}
-        
+
+        if replica_ready("Vehicle_Cost__c"):
+            # Same grouping from the local replica — no Salesforce round trips
+            wanted = set(vehicle_ids)
+            cost_rows = [r for r in get_replica_store().group_sum("Vehicle_Cost__c", ("Vehicle__c", "Type__c"),
+                                                                   "Payment_value__c")
+                         if r.get('Vehicle__c') in wanted]
+            print("📊 Cost groups read from the Salesforce replica")
+        else:
+            # One pass grouped by vehicle and type, chunked so each chunk stays
+            # under the 2,000-group aggregate limit; chunks run side by side on
+            # the shared pool.
+            cost_rows = query_in_chunks(sf, """
+                SELECT Vehicle__c, Type__c, SUM(Payment_value__c) total
+                FROM Vehicle_Cost__c
+                WHERE Vehicle__c IN ({ids})
+                GROUP BY Vehicle__c, Type__c
+            """, vehicle_ids, chunk_size=COST_GROUP_CHUNK)
+
+        cost_map, maint_map, fuel_map, insurance_map = {}, {}, {}, {}
+        for r in cost_rows:
+            vid = r.get('Vehicle__c')
+            amount = float(r.get('total') or 0)
+            cost_map[vid] = cost_map.get(vid, 0) + amount
+            for category in categorise_cost_type(r.get('Type__c')):
+                bucket = {"maintenance": maint_map, "fuel": fuel_map, "insurance": insurance_map}[category]
+                bucket[vid] = bucket.get(vid, 0) + amount
+        print(f"📊 {len(cost_rows)} vehicle/type cost groups")
+
         # Build vehicle cost details
         vehicles_by_cost = []
         total_fleet_cost = 0
@@ -749,7 +773,7 @@ def get_cost_analysis():
 
 
 @router.get("/drivers/excel")
-def get_drivers_from_excel():
+def get_drivers_from_excel(sf: SalesforceService = Depends(get_salesforce_service)):
     """
     REFACTORED: Returns Webfleet engineers with OptiDrive scores
     Replaces the old CSV-based implementation
@@ -758,7 +782,6 @@ def get_drivers_from_excel():
         print("\n" + "="*80)
         print("📊 GET /api/dashboard/drivers/excel - Fetching engineers from Salesforce...")
         print("="*80)
-        sf = SalesforceService()
         
         # Get all ACTIVE engineers from Salesforce with comprehensive filters
         engineers_query = """
@@ -811,7 +834,7 @@ def get_drivers_from_excel():
         """
         
         try:
-            vehicle_result = sf.sf.query(vehicle_query)
+            vehicle_result = sf.call(lambda client: client.query(vehicle_query))
             all_vehicles = vehicle_result.get('records', [])
             # Build Vehicle ID → van_number mapping
             vehicle_to_van = {}
@@ -841,7 +864,7 @@ def get_drivers_from_excel():
         """
         
         try:
-            allocation_result = sf.sf.query(allocation_query)
+            allocation_result = sf.call(lambda client: client.query(allocation_query))
             all_allocations = allocation_result.get('records', [])
             # Build Service_Resource ID -> van_number mapping
             service_resource_to_van = {}
@@ -977,13 +1000,12 @@ def get_drivers_from_excel():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/cost/vehicle/{vehicle_id}")
-def get_vehicle_cost(vehicle_id: str):
+def get_vehicle_cost(vehicle_id: str, sf: SalesforceService = Depends(get_salesforce_service)):
     """
     Get detailed cost data for a specific vehicle
     Accepts: Vehicle ID (Salesforce ID) or Van Number
     """
     try:
-        sf = SalesforceService()
         
         print(f"💰 Fetching cost data for vehicle: {vehicle_id}")
         
@@ -7,6 +7,8 @@ from datetime import datetime, timedelta
 from .firebase_client import get_bucket, get_db
 from google.cloud import firestore
 
+VCR_PAGE_SIZE = int(os.getenv("VCR_PAGE_SIZE", "300"))
+
 
 # ─── Helpers ──────────────────────────────────────────────────────────────────
 
@@ -122,33 +124,54 @@ def upload_photo(
 
 # ==================== VCR READ — DASHBOARD ====================================
 
-def get_all_vcrs_from_firebase(days: int = 200) -> list[dict]:
+def iter_vcrs_from_firebase(
+    days: int | None = None,
+    since: datetime | None = None,
+    page_size: int = VCR_PAGE_SIZE,
+    limit: int | None = None,
+):
     """
-    Return all VCR records created in the last `days` days, newest first.
-    Each record is a plain dict with an extra 'id' key.
+    Yield VCR records created in the last `days` days (or since `since`),
+    newest first, one Firestore page at a time.
+
+    The date window is a range filter on created_at (ISO strings sort
+    chronologically), so Firestore only reads documents inside it; pages are
+    chained with start_after cursors and iteration stops as soon as the
+    caller stops consuming, `limit` is reached or a short page comes back.
     """
     db = get_db()
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
-    docs = (
-        db.collection("vcr_reports")
-        .order_by("created_at", direction=firestore.Query.DESCENDING)
-        .stream()
-    )
-
-    results = []
-    for doc in docs:
-        data = doc.to_dict()
-        data["id"] = doc.id
-
-        # Filter by date (stored as ISO string)
-        created = _parse_dt(data.get("created_at"))
-        if created and created < cutoff:
-            continue
+    if since is None and days is not None:
+        since = datetime.utcnow() - timedelta(days=days)
+
+    query = db.collection("vcr_reports")
+    if since is not None:
+        query = query.where("created_at", ">=", since.isoformat())
+    query = query.order_by("created_at", direction=firestore.Query.DESCENDING)
+
+    yielded = 0
+    cursor = None
+    while True:
+        size = page_size if limit is None else min(page_size, limit - yielded)
+        if size <= 0:
+            return
+        page = query.start_after(cursor) if cursor is not None else query
+        docs = list(page.limit(size).stream())
+        for doc in docs:
+            data = doc.to_dict()
+            data["id"] = doc.id
+            yield data
+        yielded += len(docs)
+        if len(docs) < size:
+            return
+        cursor = docs[-1]
 
-        results.append(data)
 
-    return results
+def get_all_vcrs_from_firebase(days: int = 200) -> list[dict]:
+    """
+    Return all VCR records created in the last `days` days, newest first.
+    Each record is a plain dict with an extra 'id' key.
+    """
+    return list(iter_vcrs_from_firebase(days=days))
 
 
 def get_latest_vcr_for_engineer(engineer_name: str) -> dict | None:
@@ -88,8 +88,8 @@ async def get_lease_by_id(identifier: str):
         - data: List of matching lease records
     """
     try:
-        df = get_lease_by_identifier(identifier)
-        if len(df) == 0:
+        records = get_lease_by_identifier(identifier, as_dict=True)
+        if len(records) == 0:
             raise HTTPException(
                 status_code=404,
                 detail=f"No lease found with identifier: {identifier}"
@@ -97,8 +97,8 @@ async def get_lease_by_id(identifier: str):
         
         return {
             "success": True,
-            "count": len(df),
-            "data": df.to_dict('records')
+            "count": len(records),
+            "data": records
         }
     except HTTPException:
         raise
@@ -145,8 +145,8 @@ async def get_leases_by_trade(trade_group: str = Path(..., description="Trade gr
         - data: List of matching lease records
     """
     try:
-        df = get_leases_by_trade_group(trade_group)
-        if len(df) == 0:
+        records = get_leases_by_trade_group(trade_group, as_dict=True)
+        if len(records) == 0:
             raise HTTPException(
                 status_code=404,
                 detail=f"No leases found for trade group: {trade_group}"
@@ -154,8 +154,8 @@ async def get_leases_by_trade(trade_group: str = Path(..., description="Trade gr
         
         return {
             "success": True,
-            "count": len(df),
-            "data": df.to_dict('records')
+            "count": len(records),
+            "data": records
         }
     except HTTPException:
         raise
@@ -186,8 +186,8 @@ async def get_leases_by_asset_type(lease_type: str = Path(..., description="Moto
                 detail="lease_type must be 'Motor Vehicle' or 'Equipment'"
             )
         
-        df = get_leases_by_type(lease_type)
-        if len(df) == 0:
+        records = get_leases_by_type(lease_type, as_dict=True)
+        if len(records) == 0:
             raise HTTPException(
                 status_code=404,
                 detail=f"No leases found of type: {lease_type}"
@@ -195,8 +195,8 @@ async def get_leases_by_asset_type(lease_type: str = Path(..., description="Moto
         
         return {
             "success": True,
-            "count": len(df),
-            "data": df.to_dict('records')
+            "count": len(records),
+            "data": records
         }
     except HTTPException:
         raise
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """
 register_asset.py — Register / list Salesforce Asset records.
-Uses per-request SalesforceService (same pattern as assets.py / uploadvehicle.py).
+Uses the shared-session SalesforceService (same pattern as assets.py / uploadvehicle.py).
 Images are stored locally in backend/asset_images.json keyed by Salesforce Id.
 """
 
@@ -14,7 +14,7 @@ import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from salesforce_service import SalesforceService
+from salesforce_service import SalesforceService, get_salesforce_service
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -44,8 +44,8 @@ def _save_images(data: dict) -> None:
 # ── Per-request helpers ────────────────────────────────────────────────────────
 
 def _new_sf() -> SalesforceService:
-    """Create a fresh Salesforce connection for this request (like other routes)."""
-    return SalesforceService()
+    """Borrow the shared Salesforce session for this request (no per-request login)."""
+    return get_salesforce_service()
 
 
 # ── Purchase Type mapping and validation ───────────────────────────────────
@@ -162,7 +162,7 @@ async def get_purchase_types():
     if not sf.mock_mode and sf.sf:
         try:
             # Query Asset object field metadata
-            metadata = sf.sf.Asset.metadata()
+            metadata = sf.call(lambda client: client.Asset.metadata())
             if metadata:
                 # Find Purchase_Type__c field
                 for field in metadata.get("fields", []):
@@ -329,7 +329,7 @@ async def create_asset(request: Request):
             }
 
         # Create in Salesforce
-        result = sf.sf.Asset.create(payload)
+        result = sf.call(lambda client: client.Asset.create(payload))
         logger.info(f"[SALESFORCE] Raw result: {result}")
 
         if not result.get("success"):
@@ -337,6 +337,7 @@ async def create_asset(request: Request):
 
         sf_id = result.get("id")
         logger.info(f"[OK] Asset created in Salesforce: {sf_id}")
+        sf.invalidate_cache("Asset")
 
         # Store images locally
         images = data.get("images", [])
@@ -0,0 +1,267 @@
+"""
+vcr_index.py — in-process secondary index over Firestore `vcr_reports`.
+
+Photo lookups used to issue one `where(van_number == x)` query per candidate
+identifier (name, van number, reg, numeric suffix), each streaming every
+matching document, and then fall back to scanning 30 days of reports. The
+index keeps every report in memory keyed by:
+
+  - normalised van number      'van 397 ' → 'VAN 397'
+  - numeric suffix             'VEH-00397' → '397'
+
+and is kept fresh by a Firestore snapshot listener, which also delivers the
+photo URLs upload_photo() appends after a report is created. Where listeners
+are unavailable (VCR_INDEX_MODE=poll) a thread re-reads reports created
+since the watermark minus VCR_INDEX_POLL_OVERLAP_DAYS instead. A watchdog
+switches to polling if the listener never delivers its first snapshot
+within VCR_INDEX_LISTEN_TIMEOUT, or its stream closes later on.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from .firebase_client import get_db
+from .firebase_service import iter_vcrs_from_firebase
+
+VCR_INDEX_MODE              = os.getenv("VCR_INDEX_MODE", "listen")   # listen | poll
+VCR_INDEX_POLL_INTERVAL     = int(os.getenv("VCR_INDEX_POLL_INTERVAL", "60"))
+VCR_INDEX_POLL_OVERLAP_DAYS = int(os.getenv("VCR_INDEX_POLL_OVERLAP_DAYS", "2"))
+VCR_INDEX_READY_TIMEOUT     = float(os.getenv("VCR_INDEX_READY_TIMEOUT", "5"))
+VCR_INDEX_LISTEN_TIMEOUT    = float(os.getenv("VCR_INDEX_LISTEN_TIMEOUT", "60"))
+VCR_INDEX_WATCHDOG_INTERVAL = int(os.getenv("VCR_INDEX_WATCHDOG_INTERVAL", "30"))
+
+_SUFFIX_RE = re.compile(r"(\d+)$")
+
+
+def normalise_van(value) -> str:
+    return " ".join(str(value or "").split()).upper()
+
+
+def numeric_suffix(value) -> str:
+    """'VEH-00397' → '397', '00397' → '397'"""
+    m = _SUFFIX_RE.search(str(value or "").strip())
+    return str(int(m.group(1))) if m else ""
+
+
+def _created(doc: dict) -> str:
+    return str(doc.get("created_at") or "")
+
+
+class VcrIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._docs: Dict[str, dict] = {}
+        # key → ids, newest first
+        self._by_van: Dict[str, List[str]] = {}
+        self._by_suffix: Dict[str, List[str]] = {}
+        self.watermark = ""
+        self.mode = None
+        self.updates = 0
+        self.last_update = None
+        self._watch = None
+        self._startup_wait_done = False
+
+    # ── maintenance ──────────────────────────────────────────────────────────
+
+    def _keys(self, doc: dict):
+        van = normalise_van(doc.get("van_number"))
+        return (
+            (self._by_van, van),
+            (self._by_suffix, numeric_suffix(van)),
+        )
+
+    def _unlink(self, doc_id: str):
+        old = self._docs.pop(doc_id, None)
+        if old is None:
+            return
+        for table, key in self._keys(old):
+            ids = table.get(key)
+            if ids and doc_id in ids:
+                ids.remove(doc_id)
+                if not ids:
+                    del table[key]
+
+    def _link(self, doc_id: str, doc: dict):
+        self._docs[doc_id] = doc
+        created = _created(doc)
+        for table, key in self._keys(doc):
+            if not key:
+                continue
+            ids = table.setdefault(key, [])
+            # Insert keeping newest-first order (lists per key are short)
+            pos = 0
+            while pos < len(ids) and _created(self._docs[ids[pos]]) >= created:
+                pos += 1
+            ids.insert(pos, doc_id)
+        if created > self.watermark:
+            self.watermark = created
+
+    def apply(self, upserts: Iterable[dict] = (), removed: Iterable[str] = ()):
+        """Upsert docs (each with an 'id') and drop removed ids."""
+        with self._lock:
+            n = 0
+            for doc_id in removed:
+                self._unlink(doc_id)
+                n += 1
+            for doc in upserts:
+                self._unlink(doc["id"])
+                self._link(doc["id"], doc)
+                n += 1
+            if n:
+                self.updates += 1
+                self.last_update = datetime.utcnow()
+
+    # ── reads ────────────────────────────────────────────────────────────────
+
+    def ready(self, timeout: float = 0) -> bool:
+        """
+        Whether the index has loaded. A timeout is only honoured until the
+        first wait has finished (i.e. around startup): if the feed still
+        hasn't delivered by then, later callers get an immediate answer and
+        use Firestore directly rather than each stalling for `timeout`.
+        """
+        if self._ready.is_set():
+            return True
+        if not timeout or self._startup_wait_done:
+            return False
+        ready = self._ready.wait(timeout)
+        self._startup_wait_done = True
+        return ready
+
+    def latest_by_van(self, van_number: str) -> Optional[dict]:
+        with self._lock:
+            ids = self._by_van.get(normalise_van(van_number))
+            return dict(self._docs[ids[0]]) if ids else None
+
+    def find_with_photos(self, identifiers: Iterable[str], fallback_days: int = 30) -> Optional[dict]:
+        """
+        The photo lookup search_vcr_by_van used to do with Firestore queries:
+        the latest report per identifier (first one with photos wins), then any
+        report in the last `fallback_days` whose van number or numeric suffix
+        matches an identifier.
+        """
+        idents = [i for i in dict.fromkeys(identifiers) if i]
+        with self._lock:
+            for ident in idents:
+                ids = self._by_van.get(normalise_van(ident))
+                if ids and self._docs[ids[0]].get("photos"):
+                    return dict(self._docs[ids[0]])
+
+            cutoff = (datetime.utcnow() - timedelta(days=fallback_days)).isoformat()
+            candidates = set()
+            for ident in idents:
+                candidates.update(self._by_van.get(normalise_van(ident), ()))
+                suffix = numeric_suffix(ident)
+                if suffix:
+                    candidates.update(self._by_suffix.get(suffix, ()))
+            recent = [self._docs[i] for i in candidates
+                      if self._docs[i].get("photos") and _created(self._docs[i]) >= cutoff]
+            return dict(max(recent, key=_created)) if recent else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "ready": self._ready.is_set(),
+                "documents": len(self._docs),
+                "vans": len(self._by_van),
+                "watermark": self.watermark or None,
+                "updates": self.updates,
+                "last_update": self.last_update.isoformat() if self.last_update else None,
+            }
+
+    # ── feeds ────────────────────────────────────────────────────────────────
+
+    def _on_snapshot(self, _docs, changes, _read_time):
+        upserts, removed = [], []
+        for change in changes:
+            if change.type.name == "REMOVED":
+                removed.append(change.document.id)
+            else:
+                data = change.document.to_dict() or {}
+                data["id"] = change.document.id
+                upserts.append(data)
+        self.apply(upserts, removed)
+        if not self._ready.is_set():
+            print(f"[VCR_INDEX] Listening on vcr_reports — {len(self._docs)} reports indexed")
+            self._ready.set()
+
+    def _poll_once(self):
+        """Re-read reports created since the watermark (minus overlap, to catch late photo uploads)."""
+        since = None
+        if self.watermark:
+            since = datetime.fromisoformat(self.watermark) - timedelta(days=VCR_INDEX_POLL_OVERLAP_DAYS)
+        # Fetch every page before taking the index lock, so readers aren't
+        # blocked for the length of a (first, full) collection read
+        self.apply(list(iter_vcrs_from_firebase(since=since)))
+
+    def _poll_loop(self):
+        while True:
+            try:
+                self._poll_once()
+                if not self._ready.is_set():
+                    print(f"[VCR_INDEX] Polling vcr_reports — {len(self._docs)} reports indexed")
+                    self._ready.set()
+            except Exception as e:
+                print(f"[VCR_INDEX] Poll failed: {e}")
+            time.sleep(VCR_INDEX_POLL_INTERVAL)
+
+    def _listener_failed(self, started: float) -> Optional[str]:
+        if not self._ready.is_set():
+            if time.time() - started > VCR_INDEX_LISTEN_TIMEOUT:
+                return f"no snapshot within {VCR_INDEX_LISTEN_TIMEOUT:.0f}s"
+            return None
+        # on_snapshot() returns before the stream is up; a stream that later
+        # fails for good closes the Watch without telling the callback
+        if getattr(self._watch, "_closed", False):
+            return "snapshot stream closed"
+        return None
+
+    def _watchdog(self, started: float):
+        while True:
+            time.sleep(VCR_INDEX_WATCHDOG_INTERVAL)
+            reason = self._listener_failed(started)
+            if reason:
+                print(f"[VCR_INDEX] Snapshot listener failed ({reason}) — polling instead")
+                try:
+                    self._watch.unsubscribe()
+                except Exception:
+                    pass
+                self._start_polling()
+                return
+
+    def _start_polling(self):
+        self.mode = "poll"
+        threading.Thread(target=self._poll_loop, daemon=True, name="vcr-index-poll").start()
+
+    def start(self, mode: str = VCR_INDEX_MODE):
+        self.mode = mode
+        if mode == "listen":
+            try:
+                self._watch = get_db().collection("vcr_reports").on_snapshot(self._on_snapshot)
+                threading.Thread(target=self._watchdog, args=(time.time(),), daemon=True,
+                                 name="vcr-index-watchdog").start()
+                return
+            except Exception as e:
+                print(f"[VCR_INDEX] Snapshot listener unavailable ({e}) — polling instead")
+        self._start_polling()
+
+
+_index: Optional[VcrIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vcr_index() -> VcrIndex:
+    """Process-wide index, started on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = VcrIndex()
+                index.start()
+                _index = index
+    return _index
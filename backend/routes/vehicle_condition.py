@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import httpx
 import os
 import sys
 import traceback
 from datetime import datetime, timedelta, timezone
 import base64
+import threading
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from salesforce_service import SalesforceService
+from soql_aggregates import object_watermarks, run_parallel
 from groq_service import GroqService
+from driver_index import DriverIndex
+from single_flight import coalesce
+from image_cache import CHUNK_SIZE as IMAGE_CHUNK_SIZE, PIL_AVAILABLE, file_response, get_image_cache
 
 # Firebase helpers (photos stored in Firebase Storage)
 try:
@@ -18,6 +25,7 @@ try:
         get_latest_vcr_by_van,
         get_all_vcrs_from_firebase,
     )
+    from routes.vcr_index import VCR_INDEX_READY_TIMEOUT, get_vcr_index
     FIREBASE_AVAILABLE = True
 except Exception as _fb_import_err:
     print(f"[WARN] Firebase service unavailable: {_fb_import_err}")
@@ -215,6 +223,10 @@ groq_service = GroqService()
 
 _http_client: httpx.AsyncClient | None = None
 
+# VCR AI analysis: parallel photo downloads, downscaled to this width before upload
+VCR_AI_DOWNLOAD_CONCURRENCY = int(os.getenv("VCR_AI_DOWNLOAD_CONCURRENCY", "6"))
+VCR_AI_IMAGE_WIDTH          = int(os.getenv("VCR_AI_IMAGE_WIDTH", "1280"))
+
 
 async def get_http_client() -> httpx.AsyncClient:
     global _http_client
@@ -270,195 +282,308 @@ def debug_allocation(engineer_name: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# ─── Main Dashboard Endpoint ──────────────────────────────────────────────────
-
-@router.get("/compliance/dashboard/all-allocated")
-def get_compliance_dashboard_all_allocated():
-    try:
-        print("[VCR_DASHBOARD] ── Starting dashboard ──")
-        today = datetime.now(timezone.utc)
-
-        # ── Step 1: Active allocations ─────────────────────────────────────────
-        active_alloc_records = sf_service.execute_soql(ACTIVE_ALLOCATIONS_SOQL) or []
-        print(f"[VCR_DASHBOARD] Active allocation rows: {len(active_alloc_records)}")
-
-        alloc_by_engineer: dict = {}
-        for alloc in active_alloc_records:
-            eng = ((alloc.get("Service_Resource__r") or {}).get("Name") or "").strip()
-            vid = (alloc.get("Vehicle__c") or "").strip()
-            if not eng or not vid:
-                continue
-            if eng not in alloc_by_engineer:
-                alloc_by_engineer[eng] = {
-                    "vehicleId": vid,
-                    "vanName":   extract_van_name(alloc),
-                    "regNo":     (alloc.get("Vehicle__r") or {}).get("Reg_No__c") or "N/A",
-                    "active":    True,
-                }
-
-        print(f"[VCR_DASHBOARD] Engineers with ACTIVE allocation: {len(alloc_by_engineer)}")
-
-        # ── Step 2: All allocations fallback ──────────────────────────────────
-        all_alloc_records = sf_service.execute_soql(ALL_ALLOCATIONS_SOQL) or []
-        print(f"[VCR_DASHBOARD] All allocation rows (fallback): {len(all_alloc_records)}")
-
-        fallback_alloc: dict = {}
-        for alloc in all_alloc_records:
-            eng = ((alloc.get("Service_Resource__r") or {}).get("Name") or "").strip()
-            vid = (alloc.get("Vehicle__c") or "").strip()
-            if not eng or not vid:
-                continue
-            if eng not in fallback_alloc:
-                fallback_alloc[eng] = {
-                    "vehicleId": vid,
-                    "vanName":   extract_van_name(alloc),
-                    "regNo":     (alloc.get("Vehicle__r") or {}).get("Reg_No__c") or "N/A",
-                    "active":    False,
-                }
-
-        # ── Add manual allocations ─────────────────────────────────────────────
-        for manual_alloc in MANUAL_ALLOCATIONS:
-            eng = ((manual_alloc.get("Service_Resource__r") or {}).get("Name") or "").strip()
-            if eng and eng not in fallback_alloc:
-                vehicle = manual_alloc.get("Vehicle__r") or {}
-                fallback_alloc[eng] = {
-                    "vehicleId": f"manual-{eng}",
-                    "vanName":   vehicle.get("Van_Number__c", "N/A"),
-                    "regNo":     vehicle.get("Reg_No__c", "N/A"),
-                    "active":    False,
-                }
-
-        # ── Step 3: Engineer trades ────────────────────────────────────────────
-        # FIX: Now reads Trade_Group_Postcode__c and stores as locationGroup
-        trade_records = sf_service.execute_soql(ENGINEERS_SOQL) or []
-        trade_map: dict = {}
-        for r in trade_records:
-            name    = (r.get("Name") or "").strip()
-            raw     = r.get("Trade_Lookup__c", "")
-            # ── THE FIX: read location group from Salesforce ──────────────────
-            loc_grp = (r.get("Trade_Group_Postcode__c") or "").strip()
-            # e.g. "Electrical N", "Electrical S", "Drainage NW", "Plumbing E"
-            # ─────────────────────────────────────────────────────────────────
-            cat     = map_trade_to_category(raw)
-            if name and cat != 'EXCLUDED':
-                trade_map[name] = {
-                    "category":      cat,
-                    "raw":           raw,
-                    "locationGroup": loc_grp,   # ← NOW POPULATED
-                }
-
-        for override in MANUAL_ENGINEERS:
-            name = (override.get("Name") or "").strip()
-            if name:
-                raw     = override.get("Trade_Lookup__c", "")
-                loc_grp = (override.get("Trade_Group_Postcode__c") or "").strip()
-                trade_map[name] = {
-                    "category":      map_trade_to_category(raw),
-                    "raw":           raw,
-                    "locationGroup": loc_grp,
-                }
-
-        print(f"[VCR_DASHBOARD] Trade map: {len(trade_map)} engineers")
-
-        # ── Step 4: Build engineer list ────────────────────────────────────────
-        all_engineer_names: set = set(fallback_alloc.keys()) | set(alloc_by_engineer.keys())
-        # ── Include all engineers from trade_map (includes MANUAL_ENGINEERS) ────
-        all_engineer_names.update(trade_map.keys())
-
-        # ── Step 5: VCRs indexed by Vehicle__c ────────────────────────────────
-        vcr_records = sf_service.execute_soql("""
-            SELECT Id,
-                   Vehicle__c,
-                   Vehicle__r.Van_Number__c,
-                   Vehicle__r.Reg_No__c,
-                   Current_Engineer_Assigned_to_Vehicle__r.Name,
-                   CreatedDate,
-                   LastModifiedDate
-            FROM Vehicle_Condition_Form__c
-            WHERE CreatedDate = LAST_N_DAYS:200
-            ORDER BY Vehicle__c, CreatedDate DESC
-        """) or []
-
-        latest_vcr_by_vehicle: dict = {}
-        for vcr in vcr_records:
-            vid = (vcr.get("Vehicle__c") or "").strip()
-            if vid and vid not in latest_vcr_by_vehicle:
-                latest_vcr_by_vehicle[vid] = vcr
-
-        print(f"[VCR_DASHBOARD] VCRs indexed for {len(latest_vcr_by_vehicle)} vehicles")
-
-        # ── Step 6: Classify each engineer ────────────────────────────────────
-        submitted_list:     list = []
-        not_submitted_list: list = []
-
-        for eng_name in all_engineer_names:
-            trade_entry = trade_map.get(eng_name)
-            if not trade_entry:
-                base = eng_name.split('(')[0].split('+')[0].strip()
-                trade_entry = trade_map.get(base)
-            if not trade_entry:
-                lower = eng_name.lower()
-                for k, v in trade_map.items():
-                    if k.lower() == lower:
-                        trade_entry = v
-                        break
-            if not trade_entry:
-                continue
-            if trade_entry["category"] == 'EXCLUDED':
-                continue
+# ─── Materialised Compliance Table ────────────────────────────────────────────
+# One row per allocated engineer, rebuilt in full only when allocations /
+# engineers / vehicles change (MAX(SystemModstamp) + COUNT() watermarks), a
+# VCR is deleted, or the date rolls over. New VCRs are applied incrementally:
+# only VCRs created since the last seen CreatedDate are fetched, and only
+# their vehicles' engineers are reclassified. daysSince counts elapsed 24-hour
+# periods since the VCR (as the dashboard always has), so rows are also
+# reclassified in memory once the earliest of them ticks over. Trade /
+# locationGroup filters read prebuilt indexes.
+
+COMPLIANCE_WATERMARK_OBJECTS = ("Vehicle_Allocation__c", "ServiceResource", "Vehicle__c")
+COMPLIANCE_WATERMARK_TTL     = int(os.getenv("COMPLIANCE_WATERMARK_TTL", "30"))
+VCR_SUBMITTED_WITHIN_DAYS    = 14
+
+VCR_SOQL = """
+    SELECT Id,
+           Vehicle__c,
+           Vehicle__r.Van_Number__c,
+           Vehicle__r.Reg_No__c,
+           Current_Engineer_Assigned_to_Vehicle__r.Name,
+           CreatedDate,
+           LastModifiedDate
+    FROM Vehicle_Condition_Form__c
+    WHERE CreatedDate = LAST_N_DAYS:200{since}
+    ORDER BY Vehicle__c, CreatedDate DESC
+"""
 
-            mapped_trade  = trade_entry["category"]
-            raw_trade     = trade_entry["raw"]
-            # ── THE FIX: pull locationGroup and send it in every record ───────
-            location_grp  = trade_entry.get("locationGroup", "")
-            # e.g. "Electrical N" → frontend N button filters to this value
-            # ─────────────────────────────────────────────────────────────────
-
-            alloc_info = alloc_by_engineer.get(eng_name) or fallback_alloc.get(eng_name) or {}
-            vehicle_id = alloc_info.get("vehicleId", "")
-            van_name   = alloc_info.get("vanName",   "N/A")
-            reg_no     = alloc_info.get("regNo",     "N/A")
-
-            base_record = {
-                "engineerName":  eng_name,
-                "trade":         mapped_trade,
-                "rawTrade":      raw_trade,
-                "locationGroup": location_grp,  # ← ADDED: e.g. "Electrical N"
-                "vanName":       van_name,
-                "regNo":         reg_no,
-                "vehicleId":     vehicle_id or None,
+_compliance = {
+    'day':            None,   # UTC date the table was classified for
+    'watermark':      None,   # allocation / engineer / vehicle (modstamp, count)
+    'vcr_watermark':  None,   # newest VCR CreatedDate seen
+    'vcr_count':      None,   # VCR rows in Salesforce at that point
+    'engineers':      {},     # engineer name → base record (trade, van, vehicleId…)
+    'vcr_by_vehicle': {},     # Vehicle__c → latest VCR
+    'rows':           {},     # engineer name → classified record
+    'reclassify_at':  None,   # next time any row's daysSince ticks over
+    'by_trade':       {},
+    'by_location':    {},
+    'built_at':       None,
+    'full_builds':    0,
+    'vcr_updates':    0,
+}
+_compliance_lock = threading.Lock()
+
+
+def _allocations_by_engineer(records: list, active: bool) -> dict:
+    by_engineer: dict = {}
+    for alloc in records:
+        eng = ((alloc.get("Service_Resource__r") or {}).get("Name") or "").strip()
+        vid = (alloc.get("Vehicle__c") or "").strip()
+        if not eng or not vid:
+            continue
+        if eng not in by_engineer:
+            by_engineer[eng] = {
+                "vehicleId": vid,
+                "vanName":   extract_van_name(alloc),
+                "regNo":     (alloc.get("Vehicle__r") or {}).get("Reg_No__c") or "N/A",
+                "active":    active,
+            }
+    return by_engineer
+
+
+def _load_compliance_engineers() -> dict:
+    """Steps 1–4: allocations + trades → {engineer name: base record} for every classifiable engineer."""
+    results = run_parallel({
+        "active":  lambda: sf_service.query_soql(ACTIVE_ALLOCATIONS_SOQL),
+        "all":     lambda: sf_service.query_soql(ALL_ALLOCATIONS_SOQL),
+        "engineers": lambda: sf_service.query_soql(ENGINEERS_SOQL),
+    })
+    for name, value in results.items():
+        if isinstance(value, Exception):
+            raise value
+
+    # ── Step 1: Active allocations ─────────────────────────────────────────
+    alloc_by_engineer = _allocations_by_engineer(results["active"] or [], active=True)
+    print(f"[VCR_DASHBOARD] Engineers with ACTIVE allocation: {len(alloc_by_engineer)}")
+
+    # ── Step 2: All allocations fallback ──────────────────────────────────
+    fallback_alloc = _allocations_by_engineer(results["all"] or [], active=False)
+
+    # ── Add manual allocations ─────────────────────────────────────────────
+    for manual_alloc in MANUAL_ALLOCATIONS:
+        eng = ((manual_alloc.get("Service_Resource__r") or {}).get("Name") or "").strip()
+        if eng and eng not in fallback_alloc:
+            vehicle = manual_alloc.get("Vehicle__r") or {}
+            fallback_alloc[eng] = {
+                "vehicleId": f"manual-{eng}",
+                "vanName":   vehicle.get("Van_Number__c", "N/A"),
+                "regNo":     vehicle.get("Reg_No__c", "N/A"),
+                "active":    False,
             }
 
-            vcr = latest_vcr_by_vehicle.get(vehicle_id) if vehicle_id else None
-
-            if vcr:
-                vcr_date = parse_salesforce_datetime(vcr.get("CreatedDate"))
-                if vcr_date:
-                    days_since = (today - vcr_date).days
-                    record = {**base_record, "latestVcrDate": vcr_date.date().isoformat(), "daysSince": days_since}
-                    if days_since <= 14:
-                        submitted_list.append({**record, "status": "Submitted"})
-                        print(f"[VCR_DASHBOARD] ✓ {eng_name} | {van_name} | loc:{location_grp} | {days_since}d ago")
-                    else:
-                        not_submitted_list.append({**record, "status": "Overdue"})
-                        print(f"[VCR_DASHBOARD] ⚠ {eng_name} | {van_name} | loc:{location_grp} | {days_since}d OVERDUE")
-                else:
-                    not_submitted_list.append({**base_record, "latestVcrDate": None, "daysSince": None, "status": "Missing"})
-            else:
-                print(f"[VCR_DASHBOARD] ✗ {eng_name} | Van: {van_name} | loc:{location_grp} | vehicleId: {vehicle_id} → no VCR")
-                not_submitted_list.append({**base_record, "latestVcrDate": None, "daysSince": None, "status": "Missing"})
+    # ── Step 3: Engineer trades (with Trade_Group_Postcode__c as locationGroup) ──
+    trade_map: dict = {}
+    for r in (results["engineers"] or []) + MANUAL_ENGINEERS:
+        name    = (r.get("Name") or "").strip()
+        raw     = r.get("Trade_Lookup__c", "")
+        loc_grp = (r.get("Trade_Group_Postcode__c") or "").strip()
+        cat     = map_trade_to_category(raw)
+        if name and cat != 'EXCLUDED':
+            trade_map[name] = {"category": cat, "raw": raw, "locationGroup": loc_grp}
+
+    print(f"[VCR_DASHBOARD] Trade map: {len(trade_map)} engineers")
+
+    # Name variants ("Smith, John", "John Smith (SM6)", case) resolve
+    # through the identity index — built once per rebuild
+    trade_index = DriverIndex()
+    for name in trade_map:
+        trade_index.add(name=name, source="salesforce")
+
+    # ── Step 4: Build engineer list ────────────────────────────────────────
+    all_engineer_names = set(fallback_alloc) | set(alloc_by_engineer) | set(trade_map)
+
+    engineers: dict = {}
+    for eng_name in all_engineer_names:
+        trade_entry = trade_map.get(eng_name)
+        if not trade_entry:
+            base = eng_name.split('(')[0].split('+')[0].strip()
+            trade_entry = trade_map.get(base)
+        if not trade_entry:
+            identity = trade_index.lookup(name=eng_name, fuzzy=False)
+            if identity:
+                trade_entry = trade_map.get(identity["name"])
+        if not trade_entry:
+            continue
+
+        alloc_info = alloc_by_engineer.get(eng_name) or fallback_alloc.get(eng_name) or {}
+        engineers[eng_name] = {
+            "engineerName":  eng_name,
+            "trade":         trade_entry["category"],
+            "rawTrade":      trade_entry["raw"],
+            "locationGroup": trade_entry.get("locationGroup", ""),  # e.g. "Electrical N"
+            "vanName":       alloc_info.get("vanName", "N/A"),
+            "regNo":         alloc_info.get("regNo",   "N/A"),
+            "vehicleId":     alloc_info.get("vehicleId", "") or None,
+        }
+    return engineers
+
+
+def _load_vcrs(since: str = None) -> list:
+    clause = f"\n      AND CreatedDate >= {since[:19]}Z" if since else ""
+    return sf_service.query_soql(VCR_SOQL.format(since=clause)) or []
+
+
+def _merge_vcrs(vcr_by_vehicle: dict, vcrs: list) -> set:
+    """Keep the newest VCR per vehicle; returns the vehicle ids whose latest VCR changed."""
+    changed = set()
+    for vcr in vcrs:
+        vid = (vcr.get("Vehicle__c") or "").strip()
+        if not vid:
+            continue
+        current = vcr_by_vehicle.get(vid)
+        if current is None or (vcr.get("CreatedDate") or "") > (current.get("CreatedDate") or ""):
+            vcr_by_vehicle[vid] = vcr
+            changed.add(vid)
+    return changed
+
+
+def _classify(base_record: dict, vcr: dict, now: datetime) -> dict:
+    """Step 6 for one engineer: Submitted (≤14 days), Overdue or Missing."""
+    vcr_date = parse_salesforce_datetime(vcr.get("CreatedDate")) if vcr else None
+    if not vcr_date:
+        return {**base_record, "latestVcrDate": None, "daysSince": None, "status": "Missing"}
+    days_since = (now - vcr_date).days
+    status = "Submitted" if days_since <= VCR_SUBMITTED_WITHIN_DAYS else "Overdue"
+    return {**base_record, "latestVcrDate": vcr_date.date().isoformat(), "daysSince": days_since, "status": status}
+
+
+def _next_tick(vcr: dict, now: datetime):
+    """When daysSince next increments for this VCR (None if there is no VCR)."""
+    vcr_date = parse_salesforce_datetime(vcr.get("CreatedDate")) if vcr else None
+    if not vcr_date:
+        return None
+    return vcr_date + timedelta(days=(now - vcr_date).days + 1)
+
+
+def _classify_rows(now: datetime, names=None):
+    """(Re)classify `names` (all engineers when None) and reschedule (call with _compliance_lock held)."""
+    engineers, vcr_by_vehicle = _compliance['engineers'], _compliance['vcr_by_vehicle']
+    for name in (engineers if names is None else names):
+        base = engineers[name]
+        _compliance['rows'][name] = _classify(base, vcr_by_vehicle.get(base["vehicleId"]) if base["vehicleId"] else None, now)
+    ticks = [t for t in (_next_tick(vcr_by_vehicle.get(b["vehicleId"]), now)
+                         for b in engineers.values() if b["vehicleId"]) if t]
+    _compliance['reclassify_at'] = min(ticks) if ticks else None
+
+
+def _reindex_compliance():
+    by_trade, by_location = {}, {}
+    for name, row in _compliance['rows'].items():
+        by_trade.setdefault((row["trade"] or "").lower(), set()).add(name)
+        by_location.setdefault((row["locationGroup"] or "").lower(), set()).add(name)
+    _compliance['by_trade'] = by_trade
+    _compliance['by_location'] = by_location
+
+
+def _apply_ticks(now: datetime):
+    """Reclassify once a VCR has aged another 24h — daysSince (and maybe status) moved."""
+    if _compliance['reclassify_at'] and now >= _compliance['reclassify_at']:
+        _classify_rows(now)
+
+
+def _rebuild_compliance(now: datetime, watermarks, vcr_latest, vcr_count, reason: str):
+    """Full rebuild of the table (call with _compliance_lock held)."""
+    print(f"[VCR_DASHBOARD] ── Rebuilding compliance table ({reason}) ──")
+    started = time.time()
+    engineers = _load_compliance_engineers()
+    vcr_by_vehicle: dict = {}
+    _merge_vcrs(vcr_by_vehicle, _load_vcrs())
+    print(f"[VCR_DASHBOARD] VCRs indexed for {len(vcr_by_vehicle)} vehicles")
+
+    _compliance.update({
+        'day': now.date(),
+        'watermark': watermarks,
+        'vcr_watermark': vcr_latest,
+        'vcr_count': vcr_count,
+        'engineers': engineers,
+        'vcr_by_vehicle': vcr_by_vehicle,
+        'rows': {},
+        'built_at': datetime.now(timezone.utc),
+        'full_builds': _compliance['full_builds'] + 1,
+    })
+    _classify_rows(now)
+    _reindex_compliance()
+    print(f"[VCR_DASHBOARD] ── Table ready: {len(engineers)} engineers in {time.time() - started:.2f}s ──")
+
+
+def _refresh_compliance_table():
+    """Bring the table up to date: full rebuild, VCR-only update, or nothing."""
+    now = datetime.now(timezone.utc)
+    watermarks = object_watermarks(sf_service, COMPLIANCE_WATERMARK_OBJECTS, cache_ttl=COMPLIANCE_WATERMARK_TTL)
+    vcr_mark = object_watermarks(sf_service, ("Vehicle_Condition_Form__c",), field="CreatedDate",
+                                 cache_ttl=COMPLIANCE_WATERMARK_TTL)
+
+    with _compliance_lock:
+        built = _compliance['built_at'] is not None
+        if built and (watermarks is None or vcr_mark is None):
+            print("[VCR_DASHBOARD] Watermarks unavailable — serving existing table")
+            return _apply_ticks(now)
+        vcr_latest, vcr_count = vcr_mark[0] if vcr_mark else (None, None)
+
+        if not built:
+            return _rebuild_compliance(now, watermarks, vcr_latest, vcr_count, "initial build")
+        if _compliance['day'] != now.date():
+            return _rebuild_compliance(now, watermarks, vcr_latest, vcr_count, "new day")
+        if _compliance['watermark'] != watermarks:
+            return _rebuild_compliance(now, watermarks, vcr_latest, vcr_count, "allocations/engineers changed")
+        if vcr_latest == _compliance['vcr_watermark'] and vcr_count != _compliance['vcr_count']:
+            return _rebuild_compliance(now, watermarks, vcr_latest, vcr_count, "VCRs deleted")
+
+        if vcr_latest != _compliance['vcr_watermark']:
+            previous = _compliance['vcr_watermark']
+            new_vcrs = _load_vcrs(since=previous)
+            # `since` is inclusive; only strictly newer VCRs are new rows
+            fresh = sum(1 for v in new_vcrs if (v.get("CreatedDate") or "") > (previous or ""))
+            if _compliance['vcr_count'] is not None and _compliance['vcr_count'] + fresh != vcr_count:
+                return _rebuild_compliance(now, watermarks, vcr_latest, vcr_count, "VCRs deleted")
+            changed = _merge_vcrs(_compliance['vcr_by_vehicle'], new_vcrs)
+            touched = [name for name, base in _compliance['engineers'].items() if base["vehicleId"] in changed]
+            _classify_rows(now, touched)
+            _compliance['vcr_watermark'] = vcr_latest
+            _compliance['vcr_count'] = vcr_count
+            _compliance['vcr_updates'] += 1
+            print(f"[VCR_DASHBOARD] Applied {len(new_vcrs)} new VCR(s) → {len(touched)} engineer(s) reclassified")
+
+        _apply_ticks(now)
+
+
+def _compliance_view(trade: str = None, location_group: str = None) -> dict:
+    with _compliance_lock:
+        names = set(_compliance['rows'])
+        if trade:
+            names &= _compliance['by_trade'].get(trade.lower(), set())
+        if location_group:
+            names &= _compliance['by_location'].get(location_group.lower(), set())
+        rows = [_compliance['rows'][n] for n in sorted(names)]
+        day = _compliance['day']
+
+    submitted_list     = [r for r in rows if r["status"] == "Submitted"]
+    not_submitted_list = [r for r in rows if r["status"] != "Submitted"]
+    return {
+        "totalAllocated":    len(rows),
+        "submittedCount":    len(submitted_list),
+        "notSubmittedCount": len(not_submitted_list),
+        "submitted":         submitted_list,
+        "notSubmitted":      not_submitted_list,
+        "asOfDate":          (day or datetime.now(timezone.utc).date()).isoformat()
+    }
 
-        total = len(submitted_list) + len(not_submitted_list)
-        print(f"[VCR_DASHBOARD] ── Done: {len(submitted_list)} submitted, {len(not_submitted_list)} not submitted (total: {total}) ──")
 
-        return {
-            "totalAllocated":    total,
-            "submittedCount":    len(submitted_list),
-            "notSubmittedCount": len(not_submitted_list),
-            "submitted":         submitted_list,
-            "notSubmitted":      not_submitted_list,
-            "asOfDate":          today.date().isoformat()
-        }
+# ─── Main Dashboard Endpoint ──────────────────────────────────────────────────
+
+@router.get("/compliance/dashboard/all-allocated")
+@coalesce("vehicle-condition.compliance-all-allocated",
+          key=lambda kw: ((kw.get("trade") or "").lower(), (kw.get("locationGroup") or "").lower()))
+def get_compliance_dashboard_all_allocated(trade: str = None, locationGroup: str = None):
+    try:
+        _refresh_compliance_table()
+        result = _compliance_view(trade, locationGroup)
+        print(f"[VCR_DASHBOARD] {result['submittedCount']} submitted, {result['notSubmittedCount']} not submitted "
+              f"(total: {result['totalAllocated']}, trade={trade or 'ALL'}, locationGroup={locationGroup or 'ALL'})")
+        return result
 
     except Exception as e:
         print(f"[VCR_DASHBOARD] [ERROR] {e}")
@@ -466,6 +591,26 @@ def get_compliance_dashboard_all_allocated():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/compliance/dashboard/table-status")
+def get_compliance_table_status():
+    """Materialised compliance table: build day, watermarks and update counters."""
+    with _compliance_lock:
+        return {
+            "day":           _compliance['day'].isoformat() if _compliance['day'] else None,
+            "built_at":      _compliance['built_at'].isoformat() if _compliance['built_at'] else None,
+            "reclassify_at": _compliance['reclassify_at'].isoformat() if _compliance['reclassify_at'] else None,
+            "engineers":     len(_compliance['rows']),
+            "vehicles_with_vcr": len(_compliance['vcr_by_vehicle']),
+            "watermark":     _compliance['watermark'],
+            "vcr_watermark": _compliance['vcr_watermark'],
+            "vcr_count":     _compliance['vcr_count'],
+            "full_builds":   _compliance['full_builds'],
+            "vcr_updates":   _compliance['vcr_updates'],
+            "trades":        sorted(_compliance['by_trade']),
+            "location_groups": sorted(_compliance['by_location']),
+        }
+
+
 # ─── Engineers Endpoint ───────────────────────────────────────────────────────
 
 @router.get("/engineers")
@@ -687,6 +832,15 @@ def search_vcr_by_van(van_number_or_reg: str):
 
                 seen = set()
                 firebase_vcr = None
+
+                # In-process index (snapshot listener) — no Firestore round trips
+                vcr_index = get_vcr_index()
+                indexed = vcr_index.ready(VCR_INDEX_READY_TIMEOUT)
+                if indexed:
+                    seen = {i for i in identifiers if i}
+                    firebase_vcr = vcr_index.find_with_photos(identifiers, fallback_days=30)
+                    identifiers = []
+
                 for ident in identifiers:
                     if not ident or ident in seen:
                         continue
@@ -697,7 +851,7 @@ def search_vcr_by_van(van_number_or_reg: str):
                         break
 
                 # Last resort: scan all recent Firebase VCRs with loose matching
-                if not firebase_vcr:
+                if not firebase_vcr and not indexed:
                     all_vcrs = get_all_vcrs_from_firebase(days=30)
                     print(f"[Firebase] Scanning {len(all_vcrs)} recent VCRs, tried identifiers: {seen}")
                     for fb in all_vcrs:
@@ -761,35 +915,74 @@ def debug_firebase_vcrs():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/firebase/debug/index")
+def debug_firebase_index():
+    """State of the in-process vcr_reports index used for photo lookups."""
+    if not FIREBASE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Firebase not available")
+    return get_vcr_index().stats()
+
+
 # ─── Image Proxy ──────────────────────────────────────────────────────────────
 
-@router.get("/image/{version_id}")
-async def proxy_image(version_id: str):
-    if sf_service.mock_mode or not sf_service.sf:
-        raise HTTPException(status_code=503, detail="Salesforce not connected")
+def _version_downloader(version_id: str):
+    """download(dest) for ImageCache.original — streams VersionData to disk, returns its content type."""
+    async def _download(dest: str) -> str:
+        client = await get_http_client()
+        for attempt in range(2):
+            # A 401 means the shared session expired: log in again once and retry
+            access_token, instance_url = await run_in_threadpool(sf_service.session_credentials, attempt > 0)
+            if not access_token:
+                raise HTTPException(status_code=503, detail="Salesforce not connected")
+            rest_url = f"{instance_url}/services/data/v60.0/sobjects/ContentVersion/{version_id}/VersionData"
+            async with client.stream("GET", rest_url, headers={"Authorization": f"Bearer {access_token}"}, timeout=30.0) as response:
+                if response.status_code == 401 and attempt == 0:
+                    print(f"[WARNING] Salesforce session expired downloading {version_id} — logging in again")
+                    continue
+                return await _save_version(response, dest, version_id)
+    return _download
+
+
+async def _save_version(response, dest: str, version_id: str) -> str:
+    if response.status_code == 401:
+        raise HTTPException(status_code=401, detail="Salesforce token expired")
+    if response.status_code == 404:
+        raise HTTPException(status_code=404, detail=f"Image not found: {version_id}")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f"HTTP {response.status_code}")
+    content_type = response.headers.get("content-type", "image/jpeg")
+    if "text/html" in content_type or "text/plain" in content_type:
+        raise HTTPException(status_code=403, detail="Got HTML instead of image")
+
+    written = 0
+    with open(dest, "wb") as f:
+        async for chunk in response.aiter_bytes(IMAGE_CHUNK_SIZE):
+            f.write(chunk)
+            written += len(chunk)
+    if written == 0:
+        raise HTTPException(status_code=500, detail="Empty image")
+    return content_type
+
 
-    access_token = sf_service.sf.session_id
-    instance_url = f"https://{sf_service.sf.sf_instance}"
-    rest_url     = f"{instance_url}/services/data/v60.0/sobjects/ContentVersion/{version_id}/VersionData"
+@router.get("/image/{version_id}")
+async def proxy_image(version_id: str, request: Request, w: int | None = None):
+    """
+    Salesforce ContentVersion image, served from the on-disk image cache
+    (downloaded once per version). ?w=320 returns a resized JPEG thumbnail.
+    """
+    cache = get_image_cache()
 
     try:
-        client   = await get_http_client()
-        response = await client.get(rest_url, headers={"Authorization": f"Bearer {access_token}"}, timeout=30.0)
-        if response.status_code == 401:
-            raise HTTPException(status_code=401, detail="Salesforce token expired")
-        if response.status_code == 404:
-            raise HTTPException(status_code=404, detail=f"Image not found: {version_id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=f"HTTP {response.status_code}")
-        if len(response.content) == 0:
-            raise HTTPException(status_code=500, detail="Empty image")
-
-        content_type = response.headers.get("content-type", "image/jpeg")
-        if "text/html" in content_type or "text/plain" in content_type:
-            raise HTTPException(status_code=403, detail="Got HTML instead of image")
-
-        return Response(content=response.content, media_type=content_type,
-            headers={"Cache-Control": "public, max-age=86400", "Access-Control-Allow-Origin": "*", "Content-Length": str(len(response.content))})
+        f, meta = await cache.original(version_id, _version_downloader(version_id))
+        if w and PIL_AVAILABLE and meta["content_type"].startswith("image/"):
+            try:
+                thumb, meta = await cache.thumbnail(version_id, f, meta, w)
+                f.close()
+                f = thumb
+            except Exception as e:
+                print(f"[IMAGE_CACHE] Thumbnail failed for {version_id}: {e} — serving original")
+        # Versions are immutable, so browsers may keep them for a long time
+        return file_response(request, f, meta, cache_control="public, max-age=604800, immutable")
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Timeout")
     except HTTPException:
@@ -798,6 +991,17 @@ async def proxy_image(version_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/image-cache/status")
+def image_cache_status():
+    return get_image_cache().stats()
+
+
+def _read_file(f) -> bytes:
+    with f:
+        f.seek(0)
+        return f.read()
+
+
 # ─── Single Form with Images ──────────────────────────────────────────────────
 
 @router.get("/form/{form_id}")
@@ -861,30 +1065,42 @@ async def ai_analyse_vcr_images(form_id: str):
         if sf_service.mock_mode or not sf_service.sf:
             raise HTTPException(status_code=503, detail="Salesforce not connected")
 
-        access_token = sf_service.sf.session_id
-        instance_url = f"https://{sf_service.sf.sf_instance}"
-        http_client  = await get_http_client()
-        mime_map     = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp", "heic": "image/heic"}
-        images_for_ai = []
+        cache    = get_image_cache()
+        mime_map = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp", "heic": "image/heic"}
+        limit    = asyncio.Semaphore(VCR_AI_DOWNLOAD_CONCURRENCY)
 
-        for img in image_records:
+        async def _prepare(img: dict):
             version_id   = img["Id"]
             image_title  = img.get("Title", "Unknown")
-            content_type = mime_map.get(img.get("FileExtension", "jpg").lower(), "image/jpeg")
-            try:
-                response = await http_client.get(
-                    f"{instance_url}/services/data/v60.0/sobjects/ContentVersion/{version_id}/VersionData",
-                    headers={"Authorization": f"Bearer {access_token}"}, timeout=30.0)
-                if response.status_code != 200 or len(response.content) == 0:
-                    continue
-                images_for_ai.append({"title": image_title, "base64": base64.b64encode(response.content).decode("utf-8"), "content_type": content_type})
-            except Exception as e:
-                print(f"[VCR_AI] Failed to download {image_title}: {e}")
+            content_type = mime_map.get((img.get("FileExtension") or "jpg").lower(), "image/jpeg")
+            async with limit:
+                try:
+                    f, meta = await cache.original(version_id, _version_downloader(version_id))
+                    # Downscale before base64 — the vision model doesn't need full-resolution photos
+                    if PIL_AVAILABLE:
+                        try:
+                            thumb, meta = await cache.thumbnail(version_id, f, meta, VCR_AI_IMAGE_WIDTH)
+                            f.close()
+                            f = thumb
+                            content_type = meta["content_type"]
+                        except Exception as e:
+                            print(f"[VCR_AI] Could not downscale {image_title}: {e}")
+                    data = await run_in_threadpool(_read_file, f)
+                    # Content hash (cached ETag): identical photos share one analysis
+                    return {"title": image_title, "base64": base64.b64encode(data).decode("utf-8"),
+                            "content_type": content_type, "cache_key": meta["etag"]}
+                except Exception as e:
+                    print(f"[VCR_AI] Failed to download {image_title}: {e}")
+                    return None
+
+        prepared      = await asyncio.gather(*(_prepare(img) for img in image_records))
+        images_for_ai = [img for img in prepared if img]
 
         if not images_for_ai:
             raise HTTPException(status_code=500, detail="All image downloads failed")
 
-        reports        = groq_service.analyse_vehicle_images(images=images_for_ai, engineer_name=engineer_name, vehicle_name=vehicle_name, reg_no=reg_no)
+        reports        = await run_in_threadpool(groq_service.analyse_vehicle_images, images=images_for_ai,
+                                             engineer_name=engineer_name, vehicle_name=vehicle_name, reg_no=reg_no)
         conditions     = [r.get("overall_condition", "AMBER") for r in reports]
         overall_status = "RED" if "RED" in conditions else "AMBER" if "AMBER" in conditions else "GREEN"
 
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from salesforce_service import SalesforceService
+from salesforce_service import SalesforceService, get_salesforce_service
 
 router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
 
@@ -12,9 +12,8 @@ router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
 # VEHICLE LOOKUP
 # ==========================================
 @router.get("/lookup/{van_number}")
-def lookup_vehicle_by_van(van_number: str):
+def lookup_vehicle_by_van(van_number: str, sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
 
         print(f"🔍 Looking up vehicle with van number: {van_number}")
 
@@ -45,7 +44,7 @@ def lookup_vehicle_by_van(van_number: str):
             LIMIT 1
         """
 
-        result = sf.sf.query_all(vehicle_query)
+        result = sf.call(lambda client: client.query_all(vehicle_query))
         records = result.get("records", [])
 
         if not records:
@@ -112,7 +111,7 @@ def get_vehicle_allocation_history(sf: SalesforceService, vehicle_id: str):
             ORDER BY Start_date__c DESC
         """
 
-        result = sf.sf.query_all(allocation_query)
+        result = sf.call(lambda client: client.query_all(allocation_query))
         records = result.get("records", [])
 
         history = []
@@ -154,7 +153,7 @@ def get_assigned_driver(sf: SalesforceService, vehicle_id: str) -> str:
             LIMIT 1
         """
 
-        result = sf.sf.query_all(driver_query)
+        result = sf.call(lambda client: client.query_all(driver_query))
         records = result.get("records", [])
 
         if records:
@@ -171,9 +170,8 @@ def get_assigned_driver(sf: SalesforceService, vehicle_id: str) -> str:
 # SEARCH VEHICLES
 # ==========================================
 @router.get("/search")
-def search_vehicles(q: str = ""):
+def search_vehicles(q: str = "", sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
 
         vehicle_query = """
             SELECT 
@@ -189,7 +187,7 @@ def search_vehicles(q: str = ""):
             LIMIT 100
         """
 
-        result = sf.sf.query_all(vehicle_query)
+        result = sf.call(lambda client: client.query_all(vehicle_query))
         records = result.get("records", [])
 
         search_term = q.lower()
@@ -226,9 +224,8 @@ def search_vehicles(q: str = ""):
 # LIST ALL VEHICLES
 # ==========================================
 @router.get("/list")
-def list_all_vehicles():
+def list_all_vehicles(sf: SalesforceService = Depends(get_salesforce_service)):
     try:
-        sf = SalesforceService()
 
         vehicle_query = """
             SELECT 
@@ -245,7 +242,7 @@ def list_all_vehicles():
             ORDER BY Name ASC
         """
 
-        result = sf.sf.query_all(vehicle_query)
+        result = sf.call(lambda client: client.query_all(vehicle_query))
         records = result.get("records", [])
 
         vehicles = []
@@ -1,57 +1,163 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Response
 from datetime import datetime, timedelta
 import sys
 import os
 import asyncio
+import hashlib
+import json
+import random
+import time
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from driver_index import update_driver_index
+from optidrive_history import get_score_history
 from salesforce_service import SalesforceService
-from webfleet_api import WebfleetAPI
-from requests.auth import HTTPBasicAuth
-import requests
+from soql_aggregates import object_watermarks, org_today
+from webfleet_client import fetch_many
 
 router = APIRouter(prefix="/api/webfleet", tags=["webfleet"])
 
 # ─────────────────────────────────────────────────────────
 # SIMPLE IN-MEMORY CACHE (no APScheduler required)
+# 'scores' is the PRIMARY_WINDOW (7-day) map the leaderboard uses; the
+# longer windows live under 'windows'.
 # ─────────────────────────────────────────────────────────
 _cache = {
     'scores': {},
     'last_updated': None,
+    'version': 0,
+    'windows': {},
     'scheduler_started': False
 }
 _cache_lock = threading.Lock()
 
 
-def refresh_webfleet_cache():
+def _parse_schedule(spec):
+    """'7=21600,30=86400' → {7: 21600, 30: 86400} (window days → refresh seconds)"""
+    schedule = {}
+    for part in spec.split(','):
+        if '=' in part:
+            days, seconds = part.split('=', 1)
+            schedule[int(days)] = int(seconds)
+    return schedule
+
+
+PRIMARY_WINDOW = 7
+OPTIDRIVE_SCHEDULE = _parse_schedule(os.getenv("OPTIDRIVE_SCHEDULE", "7=21600,30=86400,90=86400"))
+OPTIDRIVE_SCHEDULE.setdefault(PRIMARY_WINDOW, 21600)
+OPTIDRIVE_JITTER = float(os.getenv("OPTIDRIVE_JITTER", "0.1"))   # ± fraction of each interval
+
+# window days → {'interval', 'next_run', 'last_run', 'last_duration_s', 'last_ok', 'runs'}
+_jobs = {
+    days: {'interval': interval, 'next_run': None, 'last_run': None,
+           'last_duration_s': None, 'last_ok': None, 'runs': 0}
+    for days, interval in sorted(OPTIDRIVE_SCHEDULE.items())
+}
+_scheduler_wake = threading.Event()
+
+
+def _jittered(interval):
+    return interval * (1 + random.uniform(-OPTIDRIVE_JITTER, OPTIDRIVE_JITTER))
+
+# ─────────────────────────────────────────────────────────
+# LEADERBOARD SNAPSHOT
+# The joined + ranked engineer list is rebuilt only when the score cache is
+# refreshed or one of the Salesforce objects it reads has changed
+# (MAX(SystemModstamp) and COUNT(Id) per object, so deletes count too, plus
+# the org date for the TODAY filter).
+# ─────────────────────────────────────────────────────────
+LEADERBOARD_WATERMARK_OBJECTS = ("ServiceResource", "Vehicle__c", "Vehicle_Allocation__c")
+LEADERBOARD_WATERMARK_TTL = int(os.getenv("LEADERBOARD_WATERMARK_TTL", "60"))
+
+_leaderboard = {
+    'key': None,          # (score cache version, Salesforce watermark)
+    'payload': None,
+    'etag': None,
+    'built_at': None,
+    'builds': 0
+}
+_leaderboard_lock = threading.Lock()
+
+
+def refresh_webfleet_cache(days=PRIMARY_WINDOW):
     """
-    Refresh the webfleet score cache
-    Called periodically or on-demand
+    Refresh the webfleet score cache for one OptiDrive window
+    Called by the scheduler or on-demand; every pull is also written to the
+    local score history
     """
     global _cache
+    started = time.time()
+    ok = False
     try:
-        print("\n[*] [CACHE REFRESH] Starting cache refresh...")
-        scores = get_all_webfleet_scores_BATCH()
+        print(f"\n[*] [CACHE REFRESH] Starting {days}-day cache refresh...")
+        scores = get_all_webfleet_scores_BATCH(days)
+        if not scores:
+            # The batch pull returns {} on any Webfleet failure: keep serving
+            # the previous scores rather than zeroing the leaderboard
+            print(f"[WARN] [CACHE REFRESH] Empty {days}-day pull - keeping previous scores")
+            return False
         
         with _cache_lock:
-            _cache['scores'] = scores
-            _cache['last_updated'] = datetime.now()
+            if days == PRIMARY_WINDOW:
+                _cache['scores'] = scores
+                _cache['last_updated'] = datetime.now()
+                _cache['version'] += 1
+            else:
+                _cache['windows'][days] = {'scores': scores, 'last_updated': datetime.now()}
+        
+        try:
+            get_score_history().record(days, scores)
+        except Exception as e:
+            print(f"[WARN] [CACHE REFRESH] Could not record score history: {e}")
         
-        print(f"[OK] [CACHE REFRESH] Complete - {len(scores)} drivers cached")
+        print(f"[OK] [CACHE REFRESH] Complete - {len(scores)} drivers cached ({days}-day window)")
+        ok = True
         return True
     except Exception as e:
         print(f"[WARN] [CACHE REFRESH] Failed: {e}")
         return False
+    finally:
+        job = _jobs.get(days)
+        if job is not None:
+            with _cache_lock:
+                job['last_run'] = datetime.fromtimestamp(started)
+                job['last_duration_s'] = round(time.time() - started, 2)
+                job['last_ok'] = ok
+                job['runs'] += 1
+                job['next_run'] = datetime.now() + timedelta(seconds=_jittered(job['interval']))
+            _scheduler_wake.set()
+
+
+def _scheduler_loop():
+    """Run each window's refresh when due; sleeps until the earliest next_run"""
+    while True:
+        _scheduler_wake.clear()
+        now = datetime.now()
+        with _cache_lock:
+            due = [d for d, job in _jobs.items() if job['next_run'] is None or job['next_run'] <= now]
+        
+        for days in due:
+            try:
+                refresh_webfleet_cache(days)
+            except Exception as e:
+                print(f"[WARN] [SCHEDULER] {days}-day refresh failed: {e}")
+        
+        with _cache_lock:
+            upcoming = [job['next_run'] for job in _jobs.values() if job['next_run'] is not None]
+        wait = (min(upcoming) - datetime.now()).total_seconds() if upcoming else 60
+        # Woken early when a manual refresh reschedules a job
+        _scheduler_wake.wait(timeout=min(max(wait, 1), 3600))
 
 
 def start_scheduler():
     """
     Start the cache refresh scheduler (one-time initialization)
     - Runs once per app lifetime
-    - Initializes cache if empty
-    - Subsequent refreshes happen on-demand via /api/webfleet/refresh-scores
+    - Loads the 7-day window immediately
+    - A daemon thread then refreshes every window in OPTIDRIVE_SCHEDULE on its
+      own jittered interval (manual refresh via /api/webfleet/refresh-scores)
     
     This is SIMPLE and SAFE - no external scheduler required
     """
@@ -76,106 +182,72 @@ def start_scheduler():
     except Exception as e:
         print(f"[WARNING] [SCHEDULER] Cache initialization failed: {e}\n")
         print("   Cache will be loaded on first request")
+    
+    # Longer windows load shortly after startup, spread out so they don't
+    # hit Webfleet together
+    with _cache_lock:
+        for days, job in _jobs.items():
+            if job['next_run'] is None:
+                job['next_run'] = datetime.now() + timedelta(seconds=random.uniform(30, 180))
+    
+    threading.Thread(target=_scheduler_loop, daemon=True, name="optidrive-scheduler").start()
+    print(f"[SCHEDULER] OptiDrive refresh thread started "
+          f"({', '.join(f'{d}d every {i // 3600}h' for d, i in OPTIDRIVE_SCHEDULE.items())}, ±{OPTIDRIVE_JITTER:.0%} jitter)")
 
 
-
-
-
-def get_all_webfleet_scores_BATCH():
+def get_all_webfleet_scores_BATCH(days=PRIMARY_WINDOW):
     """
     [*] TRUE BATCH MODE - Fetches ALL scores from Webfleet in ONE operation
     This does NOT call the API for each driver individually!
+    `days` is the OptiDrive window ending today
     """
     try:
-        webfleet = WebfleetAPI()
-        
         print("\n" + "="*80)
         print("[*] BATCH MODE: Fetching ALL OptiDrive data at once")
         print("="*80)
         
-        # Get date range (7 days)
+        # Get date range (window ending today)
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=7)
+        start_date = end_date - timedelta(days=days)
         range_from = start_date.strftime('%Y%m%d')
         range_to = end_date.strftime('%Y%m%d')
         
-        # ⚡ SINGLE API CALL - Get ALL OptiDrive scores at once!
-        optidrive_params = {
-            'account': webfleet.account,
-            'apikey': webfleet.api_key,
-            'lang': 'en',
-            'action': 'showOptiDriveIndicator',
-            'rangefrom_string': range_from,
-            'rangeto_string': range_to,
-            'outputformat': 'json',
-            'useUTF8': 'true',
-            'useISO8601': 'true'
-        }
-        
-        print(f"[*] Calling showOptiDriveIndicator (batch)...")
+        # ⚡ TWO INDEPENDENT ACTIONS, DISPATCHED CONCURRENTLY on the shared client
+        print(f"[*] Calling showOptiDriveIndicator + showDriverReportExtern (batch)...")
         print(f"   Date range: {range_from} to {range_to}")
         
-        optidrive_response = requests.get(
-            webfleet.base_url,
-            params=optidrive_params,
-            auth=HTTPBasicAuth(webfleet.username, webfleet.password),
-            timeout=30
-        )
+        results = fetch_many({
+            'optidrive': ('showOptiDriveIndicator', {'rangefrom_string': range_from, 'rangeto_string': range_to}),
+            'drivers': ('showDriverReportExtern', {})
+        })
+        optidrive_data = results['optidrive']
+        driver_data = results['drivers']
         
-        if optidrive_response.status_code != 200:
-            print(f"[ERROR] OptiDrive API error: {optidrive_response.status_code}")
+        if isinstance(optidrive_data, Exception):
+            print(f"[ERROR] OptiDrive API error: {optidrive_data}")
             return {}
         
-        optidrive_data = optidrive_response.json()
-        
         if not isinstance(optidrive_data, list):
             print(f"[WARN] Unexpected response format: {type(optidrive_data)}")
             return {}
         
         print(f"[OK] Got {len(optidrive_data)} driver scores from Webfleet")
         
-        # ⚡ Now get driver emails to map names to emails
-        print(f"[*] Fetching driver emails...")
-        
-        driver_params = {
-            'account': webfleet.account,
-            'apikey': webfleet.api_key,
-            'lang': 'en',
-            'action': 'showDriverReportExtern',
-            'outputformat': 'json',
-            'useUTF8': 'true',
-            'useISO8601': 'true'
-        }
-        
-        driver_response = requests.get(
-            webfleet.base_url,
-            params=driver_params,
-            auth=HTTPBasicAuth(webfleet.username, webfleet.password),
-            timeout=30
-        )
-        
-        if driver_response.status_code != 200:
-            print(f"[ERROR] Driver API error: {driver_response.status_code}")
+        if isinstance(driver_data, Exception):
+            print(f"[ERROR] Driver API error: {driver_data}")
             return {}
         
-        driver_data = driver_response.json()
-        
         if not isinstance(driver_data, list):
             print(f"[WARN] Unexpected driver data format")
             return {}
         
         print(f"[OK] Got {len(driver_data)} driver records")
         
-        # Build name to email mapping
-        name_to_email = {}
-        for driver in driver_data:
-            if isinstance(driver, dict):
-                name = (driver.get('name1', '') or driver.get('drivername', '')).strip().lower()
-                email = driver.get('email', '').strip().lower()
-                if name and email:
-                    name_to_email[name] = email
+        # Identity index: driver number / normalised name → email
+        # (shared with the leaderboard, chat and compliance lookups)
+        driver_index = update_driver_index(webfleet_drivers=driver_data)
         
-        print(f"[OK] Mapped {len(name_to_email)} driver names to emails")
+        print(f"[OK] Indexed {len(driver_index)} Webfleet drivers")
         
         # Build email to score mapping
         email_to_score = {}
@@ -187,9 +259,10 @@ def get_all_webfleet_scores_BATCH():
             
             driver_name = driver_score.get('drivername', '').strip().lower()
             optidrive_raw = driver_score.get('optidrive_indicator', 0)
+            identity = driver_index.lookup(name=driver_name, driver_no=driver_score.get('driverno'))
+            email = identity['email'] if identity else ''
             
-            if driver_name and driver_name in name_to_email:
-                email = name_to_email[driver_name]
+            if driver_name and email:
                 
                 try:
                     score_float = float(optidrive_raw)
@@ -221,237 +294,323 @@ def get_all_webfleet_scores_BATCH():
         return {}
 
 
-@router.get("/engineers")
-def get_engineers_with_scores():
+def _salesforce_watermark(sf):
     """
-    Get engineers from Salesforce with Webfleet scores
-    ⚡ TRUE BATCH MODE - Uses cached scores (auto-refreshes every 7 days)
+    Change marker for the Salesforce data behind the leaderboard, or None if
+    it could not be read. Aggregates are cached briefly so a burst of
+    leaderboard requests costs one round of MAX()/COUNT() queries.
     """
-    try:
-        # ✅ Start scheduler on first request
-        start_scheduler()
-        
-        sf = SalesforceService()
-        
-        print("\n" + "="*80)
-        print("[*] BATCH LOADING MODE (Using Cache)")
-        print("="*80 + "\n")
-        
-        # ✅ Use cached scores (refreshed automatically every 7 days)
-        email_to_score = _cache.get('scores', {})
-        
-        # If cache is empty, do initial fetch
-        if not email_to_score:
-            print("[WARN] Cache empty - doing initial fetch...")
-            email_to_score = get_all_webfleet_scores_BATCH()
-            _cache['scores'] = email_to_score
-            _cache['last_updated'] = datetime.now()
-        
-        scores_with_data = len([s for s in email_to_score.values() if s > 0])
-        print(f"[OK] Using {scores_with_data} cached scores")
-        print(f"   Last updated: {_cache.get('last_updated', 'Unknown')}\n")
-        
-        # ⚡ STEP 2: Get ALL Salesforce engineers with their vehicle allocations
-        print("[*] Fetching engineers and their vehicle assignments from Salesforce...")
-        
-        # Get engineers
-        engineer_query = """
-            SELECT 
-                Id, 
-                Name, 
-                RelatedRecord.Email,
-                Trade_Lookup__c
-            FROM ServiceResource
-            WHERE IsActive = true 
-            AND RelatedRecord.Email != null
-            ORDER BY Name ASC
-        """
-        
-        if sf.mock_mode or not sf.sf:
-            print("[WARN] Salesforce not connected - returning empty engineer list")
-            return {
-                "total": 0,
-                "total_salesforce_engineers": 0,
-                "engineers_in_webfleet": 0,
-                "with_scores": 0,
-                "without_scores": 0,
-                "last_cache_update": _cache.get('last_updated').isoformat() if _cache.get('last_updated') else None,
-                "engineers": []
-            }
+    stamps = object_watermarks(sf, LEADERBOARD_WATERMARK_OBJECTS, cache_ttl=LEADERBOARD_WATERMARK_TTL)
+    if stamps is None:
+        return None
+    return (org_today().isoformat(),) + stamps
 
-        result = sf.sf.query(engineer_query)
-        all_engineers = result.get('records', [])
-        
-        print(f"[OK] Found {len(all_engineers)} active engineers")
-        
-        # Get vehicle allocations for all engineers (including van numbers)
-        print("[*] Fetching vehicle data and allocations...")
-        
-        # First: Get all vehicle van_numbers
-        vehicle_query = """
-            SELECT Id, Name, Van_Number__c
-            FROM Vehicle__c
-            LIMIT 5000
-        """
-        
-        try:
-            vehicle_result = sf.sf.query(vehicle_query)
-            all_vehicles = vehicle_result.get('records', [])
-            print(f"[OK] Found {len(all_vehicles)} vehicles")
-            
-            # Build Vehicle ID → van_number mapping
-            vehicle_to_van = {}
-            for idx, vehicle in enumerate(all_vehicles):
-                vehicle_id = vehicle.get('Id', '')
-                van_number = vehicle.get('Van_Number__c', '')
-                vehicle_name = vehicle.get('Name', '')
-                
-                # Use Van_Number__c if available, otherwise use Name
-                display_name = van_number if van_number else vehicle_name
-                if not display_name:
-                    display_name = 'N/A'
-                
-                if vehicle_id:
-                    vehicle_to_van[vehicle_id] = display_name
-                
-                # Debug: show first 5 vehicles
-                if idx < 5:
-                    print(f"   Vehicle {vehicle_id[:10]}... -> Van: '{van_number}' | Name: '{vehicle_name}' -> Using: '{display_name}'")
-            
-            print(f"[OK] Built vehicle van_number map: {len(vehicle_to_van)} vehicles")
-        except Exception as e:
-            print(f"[WARN] Error fetching vehicles: {e}")
-            import traceback
-            traceback.print_exc()
-            vehicle_to_van = {}
-        
-        # Second: Get active allocations by Service_Resource ID
-        print("[*] Fetching active allocations...")
-        allocation_query = """
-            SELECT 
-                Service_Resource__c,
-                Vehicle__c,
-                Start_date__c
-            FROM Vehicle_Allocation__c
-            WHERE Service_Resource__c != null
-            AND Start_date__c <= TODAY
-            AND (End_date__c = NULL OR End_date__c >= TODAY)
-            ORDER BY Start_date__c DESC
-        """
-        
-        try:
-            allocation_result = sf.sf.query(allocation_query)
-            all_allocations = allocation_result.get('records', [])
-            print(f"[OK] Found {len(all_allocations)} active allocations")
-            
-            # Build Service_Resource ID -> van_number mapping
-            service_resource_to_van = {}
-            for allocation in all_allocations:
-                service_resource_id = allocation.get('Service_Resource__c', '')
-                vehicle_id = allocation.get('Vehicle__c', '')
-                van_number = vehicle_to_van.get(vehicle_id, 'N/A')
-                
-                # Store most recent allocation for each engineer (only if not already mapped)
-                if service_resource_id and service_resource_id not in service_resource_to_van:
-                    service_resource_to_van[service_resource_id] = van_number
-                    if len(service_resource_to_van) <= 5:
-                        print(f"   Allocation: {service_resource_id[:10]}... -> Vehicle {vehicle_id[:10]}... -> Van: '{van_number}'")
-            
-            print(f"[OK] Mapped {len(service_resource_to_van)} service resources to van numbers\n")
-            
-        except Exception as e:
-            print(f"[WARN] Error fetching allocations: {e}")
-            import traceback
-            traceback.print_exc()
-            service_resource_to_van = {}
-        
-        # ⚡ STEP 3: Match in memory (NO API calls!)
-        print("[*] Matching engineers with scores...")
-        
-        engineers_list = []
-        matched = 0
-        not_matched = 0
-        
-        for engineer in all_engineers:
-            engineer_id = engineer.get('Id', '')
-            engineer_name = engineer.get('Name', 'Unknown')
-            
-            # Get email
-            related_record = engineer.get('RelatedRecord', {})
-            if related_record and isinstance(related_record, dict):
-                engineer_email = related_record.get('Email', '').strip()
-            else:
-                engineer_email = ''
-            
-            if not engineer_email:
-                continue
-            
-            email_lower = engineer_email.lower()
-            
-            # Get score from cache (instant lookup, no API call!)
-            driving_score = email_to_score.get(email_lower, 0)
-            
-            # Get van_number from service resource mapping using engineer ID
-            van_number = service_resource_to_van.get(engineer_id, 'N/A')
+
+def _build_leaderboard(sf, email_to_score, last_updated):
+    """Join engineers, van allocations and cached scores into the ranked leaderboard"""
+    # ⚡ STEP 2: Get ALL Salesforce engineers with their vehicle allocations
+    print("[*] Fetching engineers and their vehicle assignments from Salesforce...")
+    
+    # Get engineers
+    engineer_query = """
+        SELECT 
+            Id, 
+            Name, 
+            RelatedRecord.Email,
+            Trade_Lookup__c
+        FROM ServiceResource
+        WHERE IsActive = true 
+        AND RelatedRecord.Email != null
+        ORDER BY Name ASC
+    """
+    
+    result = sf.call(lambda client: client.query(engineer_query))
+    all_engineers = result.get('records', [])
+    
+    print(f"[OK] Found {len(all_engineers)} active engineers")
+    
+    # Get vehicle allocations for all engineers (including van numbers)
+    print("[*] Fetching vehicle data and allocations...")
+    
+    # First: Get all vehicle van_numbers
+    vehicle_query = """
+        SELECT Id, Name, Van_Number__c
+        FROM Vehicle__c
+        LIMIT 5000
+    """
+    
+    try:
+        vehicle_result = sf.call(lambda client: client.query(vehicle_query))
+        all_vehicles = vehicle_result.get('records', [])
+        print(f"[OK] Found {len(all_vehicles)} vehicles")
+        
+        # Build Vehicle ID → van_number mapping
+        vehicle_to_van = {}
+        for idx, vehicle in enumerate(all_vehicles):
+            vehicle_id = vehicle.get('Id', '')
+            van_number = vehicle.get('Van_Number__c', '')
+            vehicle_name = vehicle.get('Name', '')
             
-            if driving_score > 0:
-                matched += 1
-            else:
-                not_matched += 1
+            # Use Van_Number__c if available, otherwise use Name
+            display_name = van_number if van_number else vehicle_name
+            if not display_name:
+                display_name = 'N/A'
             
-            score_class = get_score_class(driving_score)
-            trade_group = engineer.get('Trade_Lookup__c', 'N/A')
+            if vehicle_id:
+                vehicle_to_van[vehicle_id] = display_name
             
-            engineers_list.append({
-                "rank": 0,
-                "name": engineer_name,
-                "email": engineer_email,
-                "van_number": van_number,
-                "trade_group": trade_group,
-                "driving_score": driving_score,
-                "score_class": score_class
-            })
-        
-        # Sort by score
-        engineers_list.sort(key=lambda x: (-x['driving_score'], x['name']))
-        
-        # Update ranks
-        for idx, engineer in enumerate(engineers_list):
-            engineer['rank'] = idx + 1
-        
-        # Debug: show top 5 engineers being returned
-        print(f"\n[*] TOP 5 ENGINEERS BEING SENT TO FRONTEND:")
-        for eng in engineers_list[:5]:
-            print(f"   {eng['rank']}. {eng['name']} -> Van: '{eng['van_number']}'   | Score: {eng['driving_score']}")
-        
-        print(f"\n{'='*80}")
-        print(f"[OK] COMPLETE!")
-        print(f"   Total engineers: {len(engineers_list)}")
-        print(f"   [OK] With scores: {matched}")
-        print(f"   [WARN] Without scores: {not_matched}")
+            # Debug: show first 5 vehicles
+            if idx < 5:
+                print(f"   Vehicle {vehicle_id[:10]}... -> Van: '{van_number}' | Name: '{vehicle_name}' -> Using: '{display_name}'")
         
-        if matched > 0:
-            avg_score = sum(e['driving_score'] for e in engineers_list if e['driving_score'] > 0) / matched
-            print(f"   [STATS] Average score: {avg_score:.2f}")
+        print(f"[OK] Built vehicle van_number map: {len(vehicle_to_van)} vehicles")
+    except Exception as e:
+        print(f"[WARN] Error fetching vehicles: {e}")
+        import traceback
+        traceback.print_exc()
+        vehicle_to_van = {}
+    
+    # Second: Get active allocations by Service_Resource ID
+    print("[*] Fetching active allocations...")
+    allocation_query = """
+        SELECT 
+            Service_Resource__c,
+            Vehicle__c,
+            Start_date__c
+        FROM Vehicle_Allocation__c
+        WHERE Service_Resource__c != null
+        AND Start_date__c <= TODAY
+        AND (End_date__c = NULL OR End_date__c >= TODAY)
+        ORDER BY Start_date__c DESC
+    """
+    
+    try:
+        allocation_result = sf.call(lambda client: client.query(allocation_query))
+        all_allocations = allocation_result.get('records', [])
+        print(f"[OK] Found {len(all_allocations)} active allocations")
+        
+        # Build Service_Resource ID -> van_number mapping
+        service_resource_to_van = {}
+        for allocation in all_allocations:
+            service_resource_id = allocation.get('Service_Resource__c', '')
+            vehicle_id = allocation.get('Vehicle__c', '')
+            van_number = vehicle_to_van.get(vehicle_id, 'N/A')
             
-            # Show top 5
-            print(f"\n   [TOP] Top 5:")
-            for eng in engineers_list[:5]:
-                if eng['driving_score'] > 0:
-                    print(f"      {eng['rank']}. {eng['name']}: {eng['driving_score']}")
+            # Store most recent allocation for each engineer (only if not already mapped)
+            if service_resource_id and service_resource_id not in service_resource_to_van:
+                service_resource_to_van[service_resource_id] = van_number
+                if len(service_resource_to_van) <= 5:
+                    print(f"   Allocation: {service_resource_id[:10]}... -> Vehicle {vehicle_id[:10]}... -> Van: '{van_number}'")
         
-        print("="*80 + "\n")
+        print(f"[OK] Mapped {len(service_resource_to_van)} service resources to van numbers\n")
         
-        return {
-            "total": len(engineers_list),
-            "total_salesforce_engineers": len(all_engineers),
-            "engineers_in_webfleet": len(engineers_list),
-            "with_scores": matched,
-            "without_scores": not_matched,
-            "last_cache_update": _cache.get('last_updated').isoformat() if _cache.get('last_updated') else None,
-            "engineers": engineers_list
+    except Exception as e:
+        print(f"[WARN] Error fetching allocations: {e}")
+        import traceback
+        traceback.print_exc()
+        service_resource_to_van = {}
+    
+    # ⚡ STEP 3: Match in memory (NO API calls!)
+    print("[*] Matching engineers with scores...")
+    
+    # Link Salesforce engineers into the identity index so engineers whose
+    # Webfleet email differs still pick up their score (matched by name).
+    # Each engineer carries its (still empty) leaderboard row as 'data', so
+    # the row survives later index rebuilds from the Webfleet refresh; the
+    # rows are filled in below.
+    def _engineer_email(e):
+        related = e.get('RelatedRecord')
+        return ((related.get('Email') or '') if isinstance(related, dict) else '').strip()
+    
+    rows = {e['Id']: {} for e in all_engineers if e.get('Id') and _engineer_email(e)}
+    driver_index = update_driver_index(engineers=[
+        {
+            'Id': e.get('Id', ''),
+            'Name': e.get('Name', ''),
+            'Email': _engineer_email(e),
+            'data': rows.get(e.get('Id', ''))
         }
+        for e in all_engineers
+    ])
+    
+    engineers_list = []
+    matched = 0
+    not_matched = 0
+    
+    for engineer in all_engineers:
+        engineer_id = engineer.get('Id', '')
+        engineer_name = engineer.get('Name', 'Unknown')
+        
+        engineer_email = _engineer_email(engineer)
+        if not engineer_email:
+            continue
+        
+        email_lower = engineer_email.lower()
+        
+        # Get score from cache (instant lookup, no API call!)
+        driving_score = email_to_score.get(email_lower)
+        identity = driver_index.by_sf_id(engineer_id)
+        if driving_score is None and identity:
+            driving_score = next((email_to_score[e] for e in identity['emails'] if e in email_to_score), None)
+        driving_score = driving_score or 0
+        
+        # Get van_number from service resource mapping using engineer ID
+        van_number = service_resource_to_van.get(engineer_id, 'N/A')
+        
+        if driving_score > 0:
+            matched += 1
+        else:
+            not_matched += 1
+        
+        score_class = get_score_class(driving_score)
+        trade_group = engineer.get('Trade_Lookup__c', 'N/A')
+        
+        row = rows.get(engineer_id) or {}
+        row.update({
+            "rank": 0,
+            "name": engineer_name,
+            "email": engineer_email,
+            "van_number": van_number,
+            "trade_group": trade_group,
+            "driving_score": driving_score,
+            "score_class": score_class
+        })
+        engineers_list.append(row)
+    
+    # Sort by score
+    engineers_list.sort(key=lambda x: (-x['driving_score'], x['name']))
+    
+    # Update ranks
+    for idx, engineer in enumerate(engineers_list):
+        engineer['rank'] = idx + 1
+    
+    # Debug: show top 5 engineers being returned
+    print(f"\n[*] TOP 5 ENGINEERS BEING SENT TO FRONTEND:")
+    for eng in engineers_list[:5]:
+        print(f"   {eng['rank']}. {eng['name']} -> Van: '{eng['van_number']}'   | Score: {eng['driving_score']}")
+    
+    print(f"\n{'='*80}")
+    print(f"[OK] COMPLETE!")
+    print(f"   Total engineers: {len(engineers_list)}")
+    print(f"   [OK] With scores: {matched}")
+    print(f"   [WARN] Without scores: {not_matched}")
+    
+    if matched > 0:
+        avg_score = sum(e['driving_score'] for e in engineers_list if e['driving_score'] > 0) / matched
+        print(f"   [STATS] Average score: {avg_score:.2f}")
         
+        # Show top 5
+        print(f"\n   [TOP] Top 5:")
+        for eng in engineers_list[:5]:
+            if eng['driving_score'] > 0:
+                print(f"      {eng['rank']}. {eng['name']}: {eng['driving_score']}")
+    
+    print("="*80 + "\n")
+    
+    return {
+        "total": len(engineers_list),
+        "total_salesforce_engineers": len(all_engineers),
+        "engineers_in_webfleet": len(engineers_list),
+        "with_scores": matched,
+        "without_scores": not_matched,
+        "last_cache_update": last_updated.isoformat() if last_updated else None,
+        "engineers": engineers_list
+    }
+    
+
+
+def _empty_leaderboard():
+    last_updated = _cache.get('last_updated')
+    return {
+        "total": 0,
+        "total_salesforce_engineers": 0,
+        "engineers_in_webfleet": 0,
+        "with_scores": 0,
+        "without_scores": 0,
+        "last_cache_update": last_updated.isoformat() if last_updated else None,
+        "engineers": []
+    }
+
+
+def get_leaderboard_snapshot():
+    """
+    Current leaderboard as {'payload', 'etag', ...}.
+    Rebuilt only when refresh_webfleet_cache has run since the last build or
+    the Salesforce watermark moved; otherwise served from memory.
+    """
+    # ✅ Start scheduler on first request
+    start_scheduler()
+
+    # If cache is empty, do initial fetch
+    if not _cache.get('scores'):
+        print("[WARN] Cache empty - doing initial fetch...")
+        refresh_webfleet_cache()
+
+    sf = SalesforceService()
+    if sf.mock_mode or not sf.sf:
+        print("[WARN] Salesforce not connected - returning empty engineer list")
+        payload = _empty_leaderboard()
+        return {'payload': payload, 'etag': _etag_for(payload), 'built_at': None, 'builds': _leaderboard['builds']}
+
+    watermark = _salesforce_watermark(sf)
+
+    with _leaderboard_lock:
+        current = _leaderboard['key']
+        version = _cache['version']
+        if current is not None and current[0] == version and (watermark is None or current[1] == watermark):
+            # Unchanged (or Salesforce watermark unavailable) — serve the snapshot
+            return dict(_leaderboard)
+
+        reason = "initial build" if current is None else (
+            "scores refreshed" if current[0] != version else "Salesforce data changed")
+        print(f"\n[LEADERBOARD] Rebuilding snapshot ({reason})...")
+
+        email_to_score = _cache.get('scores', {})
+        last_updated = _cache.get('last_updated')
+        scores_with_data = len([s for s in email_to_score.values() if s > 0])
+        print(f"[OK] Using {scores_with_data} cached scores")
+        print(f"   Last updated: {last_updated or 'Unknown'}\n")
+
+        payload = _build_leaderboard(sf, email_to_score, last_updated)
+        _leaderboard.update({
+            'key': (version, watermark),
+            'payload': payload,
+            'etag': _etag_for(payload),
+            'built_at': datetime.now(),
+            'builds': _leaderboard['builds'] + 1
+        })
+        return dict(_leaderboard)
+
+
+def _etag_for(payload):
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+@router.get("/engineers")
+def get_engineers_with_scores(request: Request, response: Response):
+    """
+    Get engineers from Salesforce with Webfleet scores
+    ⚡ Served from the leaderboard snapshot; honours If-None-Match (304)
+    """
+    try:
+        snapshot = get_leaderboard_snapshot()
+        etag = snapshot['etag']
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+        return snapshot['payload']
+
     except Exception as e:
         print(f"[ERROR] Error: {e}")
         import traceback
@@ -461,25 +620,55 @@ def get_engineers_with_scores():
 
 # ✅ NEW: Manual refresh endpoint
 @router.post("/refresh-scores")
-def manual_refresh_scores():
+def manual_refresh_scores(window: int = PRIMARY_WINDOW):
     """
     ✅ MANUAL REFRESH: Force immediate cache update
-    Use this if you want to refresh before the 7-day automatic cycle
+    Use this if you want to refresh before the scheduled run (?window=30 for
+    a longer OptiDrive window)
     """
+    if window not in _jobs:
+        raise HTTPException(status_code=400, detail=f"Unknown window {window}; scheduled windows: {sorted(_jobs)}")
     try:
-        refresh_webfleet_cache()
+        refreshed = refresh_webfleet_cache(window)
+        
+        if window == PRIMARY_WINDOW:
+            last_updated = _cache.get('last_updated')
+            scores = _cache.get('scores', {})
+        else:
+            cached = _cache['windows'].get(window, {})
+            last_updated = cached.get('last_updated')
+            scores = cached.get('scores', {})
         
         return {
-            "status": "success",
-            "message": "Webfleet scores refreshed successfully",
-            "last_updated": _cache.get('last_updated').isoformat() if _cache.get('last_updated') else None,
-            "total_scores": len(_cache.get('scores', {}))
+            "status": "success" if refreshed else "stale",
+            "message": ("Webfleet scores refreshed successfully" if refreshed
+                        else "Webfleet pull failed or came back empty - previous scores kept"),
+            "window_days": window,
+            "last_updated": last_updated.isoformat() if last_updated else None,
+            "total_scores": len(scores)
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Refresh failed: {str(e)}")
 
 
+def _job_status(days, job):
+    def iso(value):
+        return value.isoformat() if value else None
+    cached = _cache['windows'].get(days, {}) if days != PRIMARY_WINDOW else {
+        'scores': _cache.get('scores', {}), 'last_updated': _cache.get('last_updated')}
+    return {
+        "interval_hours": round(job['interval'] / 3600, 2),
+        "last_run": iso(job['last_run']),
+        "last_duration_s": job['last_duration_s'],
+        "last_ok": job['last_ok'],
+        "next_run": iso(job['next_run']),
+        "runs": job['runs'],
+        "cached_scores": len(cached.get('scores') or {}),
+        "last_updated": iso(cached.get('last_updated'))
+    }
+
+
 # ✅ NEW: Check cache status
 @router.get("/cache-status")
 def get_cache_status():
@@ -489,8 +678,14 @@ def get_cache_status():
     last_updated = _cache.get('last_updated')
     
     if last_updated:
-        next_update = last_updated + timedelta(days=7)
-        time_until_refresh = next_update - datetime.now()
+        primary = _jobs[PRIMARY_WINDOW]
+        next_update = primary['next_run'] or last_updated + timedelta(seconds=primary['interval'])
+        time_until_refresh = max(next_update - datetime.now(), timedelta(0))
+        
+        try:
+            history = get_score_history().status()
+        except Exception as e:
+            history = {"error": str(e)}
         
         return {
             "cache_exists": True,
@@ -498,7 +693,16 @@ def get_cache_status():
             "next_update": next_update.isoformat(),
             "days_until_refresh": time_until_refresh.days,
             "hours_until_refresh": time_until_refresh.seconds // 3600,
-            "total_cached_scores": len(_cache.get('scores', {}))
+            "last_run_duration_s": primary['last_duration_s'],
+            "total_cached_scores": len(_cache.get('scores', {})),
+            "scheduler_running": _cache['scheduler_started'],
+            "windows": {days: _job_status(days, job) for days, job in _jobs.items()},
+            "history": history,
+            "leaderboard": {
+                "etag": _leaderboard.get('etag'),
+                "built_at": _leaderboard['built_at'].isoformat() if _leaderboard.get('built_at') else None,
+                "builds": _leaderboard['builds']
+            }
         }
     else:
         return {
@@ -507,6 +711,26 @@ def get_cache_status():
         }
 
 
+@router.get("/score-history/{email}")
+def get_score_history_for_driver(email: str, window: int = PRIMARY_WINDOW, days: int = 90):
+    """
+    Score trend for one driver from the local history store (no Webfleet calls)
+    """
+    history = get_score_history()
+    series = history.series(email, window, days)
+    return {
+        "email": email.strip().lower(),
+        "window_days": window,
+        "days": days,
+        "series": series,
+        "latest": series[-1]["score"] if series else None,
+        "change": round(series[-1]["score"] - series[0]["score"], 2) if len(series) > 1 else None,
+        "rolling_avg_7d": history.rolling_average(email, window, 7),
+        "rolling_avg_30d": history.rolling_average(email, window, 30),
+        "rolling_avg_90d": history.rolling_average(email, window, 90)
+    }
+
+
 @router.get("/test-connection")
 def test_webfleet_connection():
     """Test Webfleet API connection"""
@@ -549,6 +773,7 @@ def load_engineers_with_scores():
     ✅ EXPORTED FUNCTION: Load engineers with scores for app startup cache
     Returns the full result dict with engineers list
     
-    This is used by FastAPI startup event to preload the global driver cache
+    This is used by FastAPI startup event to preload the global driver cache;
+    it builds the same snapshot /engineers serves, so the first request is free
     """
-    return get_engineers_with_scores()
+    return get_leaderboard_snapshot()['payload']
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
-import os
-from simple_salesforce import Salesforce
-from dotenv import load_dotenv
+import copy
 
-_dir = os.path.dirname(os.path.abspath(__file__))
-load_dotenv(os.path.join(_dir, ".env"), override=True)
+from simple_salesforce.exceptions import SalesforceExpiredSession
+
+from salesforce_session import SalesforceSessionManager, get_session_manager
+from soql_cache import get_query_cache
 
 
 class SalesforceService:
@@ -12,111 +12,141 @@ class SalesforceService:
     Pure Salesforce data access layer - NO intelligence, just execution
     """
 
-    def __init__(self):
-        username       = os.getenv("SALESFORCE_USERNAME") or os.getenv("SF_USERNAME")
-        password       = os.getenv("SALESFORCE_PASSWORD") or os.getenv("SF_PASSWORD")
-        security_token = os.getenv("SALESFORCE_SECURITY_TOKEN") or os.getenv("SF_SECURITY_TOKEN")
-        domain         = os.getenv("SALESFORCE_DOMAIN") or os.getenv("SF_DOMAIN", "login")
+    def __init__(self, session_manager: SalesforceSessionManager = None):
+        # Borrow the process-wide session instead of logging in per request
+        self._sessions = session_manager or get_session_manager()
+
+    @property
+    def sf(self):
+        """
+        The manager's current client — looked up on every access, so
+        long-lived module-level services pick up refreshed sessions too.
+        """
+        return self._sessions.get()
+
+    @property
+    def mock_mode(self) -> bool:
+        return self.sf is None
 
-        if not all([username, password, security_token]) or "your_" in str(username):
-            print("[WARNING] Salesforce credentials not configured. Using mock data mode.")
-            self.sf        = None
-            self.mock_mode = True
-            return
+    def call(self, fn):
+        """
+        Run fn(sf) against the shared client and, if Salesforce rejects the
+        session (401 / INVALID_SESSION_ID), log in again once and retry.
 
+        Routes use this for the simple_salesforce calls the service doesn't
+        wrap, e.g. sf.call(lambda client: client.Asset.update(asset_id, data)).
+        """
+        sf = self.sf
+        if sf is None:
+            raise RuntimeError("Salesforce not connected")
         try:
-            self.sf = Salesforce(
-                username=username,
-                password=password,
-                security_token=security_token,
-                version="60.0",
-            )
-            self.mock_mode = False
-            print("[OK] Connected to Salesforce (production) - API v60.0")
-        except Exception as e:
-            print(f"[WARNING] Failed to connect to Salesforce: {e}. Using mock data mode.")
-            self.sf        = None
-            self.mock_mode = True
+            return fn(sf)
+        except SalesforceExpiredSession:
+            print("[WARNING] Salesforce session expired — logging in again")
+            sf = self._sessions.relogin(stale=sf)
+            if sf is None:
+                raise
+            return fn(sf)
+
+    def session_credentials(self, refresh: bool = False):
+        """
+        (access_token, instance_url) for raw REST downloads that bypass
+        simple_salesforce; refresh=True forces a new login after a 401.
+        """
+        sf = self.sf
+        if refresh and sf is not None:
+            sf = self._sessions.relogin(stale=sf)
+        if sf is None:
+            return None, None
+        return sf.session_id, f"https://{sf.sf_instance}"
 
     # ─────────────────────────────────────────────────────────────────────────
     # CORE QUERY METHODS
     # ─────────────────────────────────────────────────────────────────────────
 
-    def execute_soql(self, query: str) -> list:
+    def execute_soql(self, query: str, cache_ttl: float = None) -> list:
         """
         Execute ANY SOQL query and return ALL results with automatic pagination.
         Uses query_all() so it never silently truncates at 2000 records.
         For aggregate queries (SUM/COUNT with GROUP BY) falls back to query().
+
+        Pass cache_ttl (seconds) for read-only queries that can be served from
+        the shared result cache — see soql_cache.py.
+        """
+        try:
+            return self.query_soql(query, cache_ttl=cache_ttl)
+
+        except Exception as e:
+            print(f"[ERROR] SOQL failed: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+
+    def query_soql(self, query: str, cache_ttl: float = None) -> list:
+        """
+        Like execute_soql but raises on failure instead of returning [],
+        for callers that need to tell "no rows" apart from "query failed".
         """
         if self.mock_mode or not self.sf:
             print("[WARNING] Mock mode: skipping query")
             return []
-
-        try:
-            print(f"[SEARCH] Executing: {query[:150]}...")
-
-            # Aggregate queries (GROUP BY, COUNT, SUM, AVG) can't use query_all — use query() instead
-            query_upper = query.upper()
-            is_aggregate = "GROUP BY" in query_upper or (
-                any(fn in query_upper for fn in ["COUNT(", "SUM(", "AVG(", "MIN(", "MAX("])
-                and "GROUP BY" not in query_upper
+        if cache_ttl:
+            records = get_query_cache().get_or_load(
+                "soql", query, cache_ttl, lambda: self._run_soql(query)
             )
+            # Callers annotate records (and nested Vehicle__r / Service_Resource__r
+            # dicts) in place — never hand out any part of the cached entry
+            return copy.deepcopy(records)
+        return self._run_soql(query)
+
+    def _run_soql(self, query: str) -> list:
+        print(f"[SEARCH] Executing: {query[:150]}...")
+
+        # Aggregate queries (GROUP BY, COUNT, SUM, AVG) can't use query_all — use query() instead
+        query_upper = query.upper()
+        is_aggregate = "GROUP BY" in query_upper or (
+            any(fn in query_upper for fn in ["COUNT(", "SUM(", "AVG(", "MIN(", "MAX("])
+            and "GROUP BY" not in query_upper
+        )
 
-            if is_aggregate:
-                result = self.sf.query(query)
-            else:
-                result = self.sf.query_all(query)
-
-            records = result.get("records", [])
+        if is_aggregate:
+            result = self.call(lambda sf: sf.query(query))
+            if not result.get("done", True):
+                # Aggregate results can't be paged with queryMore — a partial
+                # answer would silently undercount, so fail loudly instead
+                raise ValueError(
+                    f"Aggregate query truncated at {len(result.get('records', []))} of "
+                    f"{result.get('totalSize')} groups — narrow the query: {query[:150]}"
+                )
+        else:
+            result = self.call(lambda sf: sf.query_all(query))
 
-            # Clean SF metadata from all records recursively
-            cleaned = [self._clean_record(r) for r in records]
+        records = result.get("records", [])
 
-            print(f"[OK] Returned {len(cleaned)} records (total in SF: {result.get('totalSize', len(cleaned))})")
-            return cleaned
+        # Clean SF metadata from all records recursively
+        cleaned = [self._clean_record(r) for r in records]
 
-        except Exception as e:
-            print(f"[ERROR] SOQL failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+        print(f"[OK] Returned {len(cleaned)} records (total in SF: {result.get('totalSize', len(cleaned))})")
+        return cleaned
 
-    def execute_soql_count(self, query: str) -> int:
+    def execute_soql_count(self, query: str, cache_ttl: float = None) -> int:
         """
         Execute a COUNT() aggregate SOQL query and return the integer result.
         Handles both:
           - SELECT COUNT() FROM ...          → uses totalSize
           - SELECT COUNT(Id) cnt FROM ...    → reads first record field
+        Accepts cache_ttl like execute_soql.
         """
         if self.mock_mode or not self.sf:
             print("[WARNING] Mock mode: skipping count query")
             return 0
 
         try:
-            print(f"[COUNT] Executing: {query[:150]}...")
-            # COUNT queries must use query() not query_all()
-            result = self.sf.query(query)
-
-            # SELECT COUNT() returns totalSize directly
-            if "SELECT COUNT()" in query.upper():
-                count = result.get("totalSize", 0)
-                print(f"[OK] COUNT() result: {count}")
-                return int(count)
-
-            # SELECT COUNT(Id) alias returns in records[0]
-            records = result.get("records", [])
-            if records:
-                first = records[0]
-                for key, val in first.items():
-                    if key != "attributes" and val is not None:
-                        count = int(val)
-                        print(f"[OK] COUNT field [{key}]: {count}")
-                        return count
-
-            # Fallback to totalSize
-            count = result.get("totalSize", 0)
-            print(f"[OK] COUNT fallback totalSize: {count}")
-            return int(count)
+            if cache_ttl:
+                return get_query_cache().get_or_load(
+                    "count", query, cache_ttl, lambda: self._run_soql_count(query)
+                )
+            return self._run_soql_count(query)
 
         except Exception as e:
             print(f"[ERROR] COUNT query failed: {e}")
@@ -124,6 +154,39 @@ class SalesforceService:
             traceback.print_exc()
             return 0
 
+    def _run_soql_count(self, query: str) -> int:
+        print(f"[COUNT] Executing: {query[:150]}...")
+        # COUNT queries must use query() not query_all()
+        result = self.call(lambda sf: sf.query(query))
+
+        # SELECT COUNT() returns totalSize directly
+        if "SELECT COUNT()" in query.upper():
+            count = result.get("totalSize", 0)
+            print(f"[OK] COUNT() result: {count}")
+            return int(count)
+
+        # SELECT COUNT(Id) alias returns in records[0]
+        records = result.get("records", [])
+        if records:
+            first = records[0]
+            for key, val in first.items():
+                if key != "attributes" and val is not None:
+                    count = int(val)
+                    print(f"[OK] COUNT field [{key}]: {count}")
+                    return count
+
+        # Fallback to totalSize
+        count = result.get("totalSize", 0)
+        print(f"[OK] COUNT fallback totalSize: {count}")
+        return int(count)
+
+    def invalidate_cache(self, *objects: str) -> int:
+        """
+        Drop cached query results that read from the given sObjects
+        (everything when called with no arguments). Call after writes.
+        """
+        return get_query_cache().invalidate(objects or None)
+
     def _clean_record(self, record: dict) -> dict:
         """Recursively strip Salesforce 'attributes' metadata from records."""
         clean = {}
@@ -249,6 +312,16 @@ class SalesforceService:
             ORDER BY Status__c
         """)
 
+    def get_service_territories(self, cache_ttl: float = 3600) -> list:
+        """Distinct Vehicle__c.Service_Territory__c values (depot names). Raises on failure."""
+        rows = self.query_soql("""
+            SELECT Service_Territory__c t
+            FROM Vehicle__c
+            WHERE Service_Territory__c != NULL
+            GROUP BY Service_Territory__c
+        """, cache_ttl=cache_ttl)
+        return [r.get("t") for r in rows if r.get("t")]
+
     def search_vehicle(self, search_term: str) -> list:
         return self.execute_soql(f"""
             SELECT Id, Name, Reg_No__c, Van_Number__c, Status__c, Trade_Group__c
@@ -276,8 +349,9 @@ class SalesforceService:
             return {"success": False, "message": "Mock mode enabled"}
         try:
             print(f"[CREATE] Creating vehicle: {vehicle_data}")
-            result = self.sf.Vehicle__c.create(vehicle_data)
+            result = self.call(lambda sf: sf.Vehicle__c.create(vehicle_data))
             print(f"[OK] Vehicle created: {result.get('id')}")
+            self.invalidate_cache("Vehicle__c")
             return {"success": result.get("success", True), "id": result.get("id"), **result}
         except Exception as e:
             print(f"[ERROR] Create vehicle failed: {e}")
@@ -288,8 +362,7 @@ class SalesforceService:
             return {"fields": [], "message": "Mock mode enabled"}
         try:
             print(f"[DESCRIBE] {object_name}...")
-            obj      = getattr(self.sf, object_name)
-            metadata = obj.describe()
+            metadata = self.call(lambda sf: getattr(sf, object_name).describe())
             print(f"[OK] Described {object_name}")
             return metadata
         except Exception as e:
@@ -302,9 +375,14 @@ class SalesforceService:
             return {"totalSize": 0, "records": []}
         try:
             print(f"[QUERY] Executing: {query[:150]}...")
-            result = self.sf.query(query)
+            result = self.call(lambda sf: sf.query(query))
             print(f"[OK] Query returned {result.get('totalSize', 0)} records")
             return result
         except Exception as e:
             print(f"[ERROR] Query failed: {e}")
-            return {"totalSize": 0, "records": [], "error": str(e)}
\ No newline at end of file
+            return {"totalSize": 0, "records": [], "error": str(e)}
+
+
+def get_salesforce_service() -> SalesforceService:
+    """FastAPI dependency — SalesforceService bound to the shared session."""
+    return SalesforceService()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+salesforce_session.py — one authenticated Salesforce session per process.
+
+Every SalesforceService used to do a full username/password/token login in
+its constructor, so each dashboard tile paid for a SOAP login before its
+first SOQL call. The manager below logs in once, keeps the session on a
+keep-alive HTTP connection pool, and only logs in again when Salesforce
+rejects the session (401 / INVALID_SESSION_ID) or it reaches its max age.
+
+Routes borrow the shared session through SalesforceService (or the
+get_salesforce_service FastAPI dependency in salesforce_service.py).
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from simple_salesforce import Salesforce
+from dotenv import load_dotenv
+
+_dir = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(_dir, ".env"), override=True)
+
+SF_API_VERSION        = "60.0"
+SF_POOL_SIZE          = int(os.getenv("SF_POOL_SIZE", "20"))
+# Salesforce's default session timeout is 2h — refresh a little before that
+SF_SESSION_MAX_AGE    = int(os.getenv("SF_SESSION_MAX_AGE", str(90 * 60)))
+# After a failed login, wait before trying again instead of hammering SF
+SF_LOGIN_RETRY_DELAY  = int(os.getenv("SF_LOGIN_RETRY_DELAY", "30"))
+
+
+def _credentials() -> Optional[dict]:
+    username       = os.getenv("SALESFORCE_USERNAME") or os.getenv("SF_USERNAME")
+    password       = os.getenv("SALESFORCE_PASSWORD") or os.getenv("SF_PASSWORD")
+    security_token = os.getenv("SALESFORCE_SECURITY_TOKEN") or os.getenv("SF_SECURITY_TOKEN")
+
+    if not all([username, password, security_token]) or "your_" in str(username):
+        return None
+    return {"username": username, "password": password, "security_token": security_token}
+
+
+def _build_http_session(pool_size: int) -> requests.Session:
+    """requests.Session with a keep-alive pool sized for concurrent route handlers."""
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+
+class SalesforceSessionManager:
+    """
+    Process-wide holder of the authenticated simple_salesforce client.
+
+    get()     → shared client (logs in lazily on first use)
+    relogin() → drop a rejected session and log in again (once per stale client,
+                so concurrent callers that hit the same 401 share one login)
+    """
+
+    def __init__(self, pool_size: int = SF_POOL_SIZE, max_age: int = SF_SESSION_MAX_AGE):
+        self._lock         = threading.Lock()
+        self._http         = _build_http_session(pool_size)
+        self._sf           = None
+        self._logged_in_at = 0.0
+        self._last_failure = 0.0
+        self.max_age       = max_age
+        self.login_count   = 0
+        self.relogin_count = 0
+        self._warned_no_credentials = False
+
+    def get(self) -> Optional[Salesforce]:
+        sf = self._sf
+        if sf is not None and not self._expired():
+            return sf
+        with self._lock:
+            if self._sf is None or self._expired():
+                self._login()
+            return self._sf
+
+    def relogin(self, stale: Optional[Salesforce] = None) -> Optional[Salesforce]:
+        with self._lock:
+            if stale is not None and self._sf is not None and self._sf is not stale:
+                # Another thread already replaced the rejected session
+                return self._sf
+            self.relogin_count += 1
+            self._sf = None
+            self._last_failure = 0.0
+            self._login()
+            return self._sf
+
+    def reset(self):
+        with self._lock:
+            self._sf = None
+            self._logged_in_at = 0.0
+
+    def status(self) -> dict:
+        return {
+            "connected":     self._sf is not None,
+            "session_age_s": round(time.time() - self._logged_in_at, 1) if self._sf else None,
+            "max_age_s":     self.max_age,
+            "logins":        self.login_count,
+            "relogins":      self.relogin_count,
+        }
+
+    # ── internals (call with self._lock held) ────────────────────────────────
+
+    def _expired(self) -> bool:
+        return self.max_age > 0 and (time.time() - self._logged_in_at) > self.max_age
+
+    def _login(self):
+        creds = _credentials()
+        if creds is None:
+            if not self._warned_no_credentials:
+                print("[WARNING] Salesforce credentials not configured. Using mock data mode.")
+                self._warned_no_credentials = True
+            self._sf = None
+            return
+
+        if self._last_failure and time.time() - self._last_failure < SF_LOGIN_RETRY_DELAY:
+            self._sf = None
+            return
+
+        try:
+            self._sf = Salesforce(
+                **creds,
+                version=SF_API_VERSION,
+                session=self._http,
+            )
+            self._logged_in_at = time.time()
+            self._last_failure = 0.0
+            self.login_count += 1
+            print(f"[OK] Connected to Salesforce (production) - API v{SF_API_VERSION} [shared session #{self.login_count}]")
+        except Exception as e:
+            print(f"[WARNING] Failed to connect to Salesforce: {e}. Using mock data mode.")
+            self._sf = None
+            self._last_failure = time.time()
+
+
+_manager: Optional[SalesforceSessionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> SalesforceSessionManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = SalesforceSessionManager()
+    return _manager
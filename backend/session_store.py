@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+session_store.py — login sessions for routes/auth.py.
+
+Sessions used to live in a module-level dict: expired entries were only
+dropped when someone looked them up, and a login made on one worker was
+unknown to every other worker. SESSION_STORE picks the backend:
+
+  memory  TTL map with a background sweeper and a SESSION_MAX_ENTRIES cap
+          (oldest sessions are evicted first). Single process only.
+  sqlite  shared file at SESSION_STORE_PATH — several uvicorn workers on one
+          host (or instances sharing a volume) see the same sessions.
+  redis   any Redis-protocol server at SESSION_REDIS_URL (Redis, Memorystore,
+          Valkey, a local redis-server for development); the server expires
+          keys itself. Needs the `redis` package.
+
+Every backend stores {"user", "created_at", "expires_at"} per session id and
+returns the same shape, with datetimes, from get().
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+_dir = os.path.dirname(os.path.abspath(__file__))
+
+SESSION_STORE          = os.getenv("SESSION_STORE", "memory").strip().lower()   # memory | sqlite | redis
+SESSION_TTL_HOURS      = float(os.getenv("SESSION_TTL_HOURS", "24"))
+SESSION_MAX_ENTRIES    = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+SESSION_STORE_PATH     = os.getenv("SESSION_STORE_PATH", os.path.join(_dir, "sessions.db"))
+SESSION_REDIS_URL      = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_REDIS_PREFIX   = os.getenv("SESSION_REDIS_PREFIX", "aspect:session:")
+
+
+def _record(user: Dict[str, Any], created_at: float, expires_at: float) -> Dict[str, Any]:
+    return {
+        "user":       user,
+        "created_at": datetime.fromtimestamp(created_at),
+        "expires_at": datetime.fromtimestamp(expires_at),
+    }
+
+
+class _SweptStore:
+    """Background thread that calls sweep() every SESSION_SWEEP_INTERVAL seconds."""
+
+    name = "base"
+
+    def __init__(self, ttl_seconds: float, sweep_interval: int):
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stats = {"created": 0, "expired": 0, "evicted": 0, "deleted": 0}
+
+    def sweep(self) -> int:
+        return 0
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"[SESSION_STORE] Swept {removed} expired sessions ({self.name})")
+            except Exception as e:
+                print(f"[SESSION_STORE] Sweep failed: {e}")
+
+    def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True, name="session-sweeper")
+            self._sweeper.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+class MemorySessionStore(_SweptStore):
+    name = "memory"
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_HOURS * 3600,
+                 max_entries: int = SESSION_MAX_ENTRIES, sweep_interval: int = SESSION_SWEEP_INTERVAL):
+        super().__init__(ttl_seconds, sweep_interval)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # id → (user, created_at, expires_at), oldest first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def put(self, session_id: str, user: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        entry = (user, now, now + self.ttl_seconds)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = entry
+            self._stats["created"] += 1
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                self._stats["evicted"] += 1
+        return _record(*entry)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._sessions[session_id]
+                self._stats["expired"] += 1
+                return None
+        return _record(*entry)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                return False
+            self._stats["deleted"] += 1
+            return True
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, _, expires_at) in self._sessions.items() if expires_at <= now]
+            for sid in expired:
+                del self._sessions[sid]
+            self._stats["expired"] += len(expired)
+        return len(expired)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.name, "active": len(self._sessions),
+                    "max_entries": self.max_entries, **self._stats}
+
+
+class SQLiteSessionStore(_SweptStore):
+    name = "sqlite"
+
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl_seconds: float = SESSION_TTL_HOURS * 3600,
+                 max_entries: int = SESSION_MAX_ENTRIES, sweep_interval: int = SESSION_SWEEP_INTERVAL):
+        super().__init__(ttl_seconds, sweep_interval)
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._create_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id         TEXT PRIMARY KEY,
+                    user       TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_created ON sessions (created_at)")
+
+    def put(self, session_id: str, user: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (id, user, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                         (session_id, json.dumps(user), now, expires_at))
+            evicted = conn.execute("""
+                DELETE FROM sessions WHERE id IN (
+                    SELECT id FROM sessions ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,)).rowcount
+        self._stats["created"] += 1
+        self._stats["evicted"] += max(evicted, 0)
+        return _record(user, now, expires_at)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT user, created_at, expires_at FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[2] <= time.time():
+            self.delete(session_id)
+            self._stats["expired"] += 1
+            return None
+        return _record(json.loads(row[0]), row[1], row[2])
+
+    def delete(self, session_id: str) -> bool:
+        conn = self._conn()
+        with self._write_lock, conn:
+            deleted = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+        if deleted:
+            self._stats["deleted"] += 1
+        return deleted
+
+    def sweep(self) -> int:
+        conn = self._conn()
+        with self._write_lock, conn:
+            removed = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        self._stats["expired"] += removed
+        return removed
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "active": self.count(), "max_entries": self.max_entries,
+                "path": self.path, **self._stats}
+
+
+class RedisSessionStore(_SweptStore):
+    """Keys carry their own TTL, so there is nothing to sweep and no local cap (use maxmemory-policy)."""
+
+    name = "redis"
+
+    def __init__(self, url: str = SESSION_REDIS_URL, prefix: str = SESSION_REDIS_PREFIX,
+                 ttl_seconds: float = SESSION_TTL_HOURS * 3600):
+        super().__init__(ttl_seconds, sweep_interval=0)
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=5)
+        self.client.ping()
+
+    def put(self, session_id: str, user: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        payload = json.dumps({"user": user, "created_at": now, "expires_at": expires_at})
+        self.client.set(self.prefix + session_id, payload, ex=max(1, int(self.ttl_seconds)))
+        self._stats["created"] += 1
+        return _record(user, now, expires_at)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        payload = self.client.get(self.prefix + session_id)
+        if payload is None:
+            return None
+        data = json.loads(payload)
+        return _record(data["user"], data["created_at"], data["expires_at"])
+
+    def delete(self, session_id: str) -> bool:
+        deleted = self.client.delete(self.prefix + session_id) > 0
+        if deleted:
+            self._stats["deleted"] += 1
+        return deleted
+
+    def count(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=500))
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "active": self.count(), "prefix": self.prefix, **self._stats}
+
+
+def _create_store(kind: str):
+    if kind == "redis":
+        if not REDIS_AVAILABLE:
+            print("[WARNING] redis package not installed - SESSION_STORE=redis falling back to sqlite")
+        else:
+            try:
+                return RedisSessionStore()
+            except Exception as e:
+                print(f"[SESSION_STORE] Redis unavailable at {SESSION_REDIS_URL} ({e}) - falling back to sqlite")
+        kind = "sqlite"
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    if kind != "memory":
+        print(f"[SESSION_STORE] Unknown SESSION_STORE={kind!r} - using memory")
+    return MemorySessionStore()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Process-wide session store for SESSION_STORE, sweeper started on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create_store(SESSION_STORE).start()
+    return _store
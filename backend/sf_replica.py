@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+sf_replica.py — local SQLite read-replica of the core Salesforce objects.
+
+A background worker mirrors the objects in REPLICA_OBJECTS into a local
+SQLite file so dashboard / cost / compliance code can read indexed tables in
+milliseconds instead of pulling thousands of records through the REST API.
+
+Sync is incremental:
+  - each object keeps a SystemModstamp watermark in the sync_state table
+  - every pass asks only for rows modified since the watermark, using
+    queryAll so soft-deleted rows come back with IsDeleted = true and are
+    removed locally
+  - a periodic full resync catches hard deletes / emptied recycle bins
+
+Enable with SF_REPLICA_ENABLED=1. Readers check replica_ready(sobject)
+and fall back to SOQL while the replica is disabled or stale; the cost
+analysis tile (/api/dashboard/cost-analysis) reads its per-vehicle cost
+totals this way.
+
+The sync source is anything exposing simple_salesforce's
+query_all(query, include_deleted=...) signature; RecordedSource replays
+recorded responses (fixtures/sf_replica_fixture.json, see
+test_sf_replica.py) so the sync can be exercised offline.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+_dir = os.path.dirname(os.path.abspath(__file__))
+
+SF_REPLICA_PATH          = os.getenv("SF_REPLICA_PATH", os.path.join(_dir, "sf_replica.db"))
+SF_REPLICA_INTERVAL      = int(os.getenv("SF_REPLICA_INTERVAL", "300"))
+SF_REPLICA_FULL_INTERVAL = int(os.getenv("SF_REPLICA_FULL_INTERVAL", str(24 * 3600)))
+
+# sObject → (own fields to mirror, columns to index locally)
+# Only the object's own fields are mirrored: a parent edit does not bump the
+# child's SystemModstamp, so relationship fields (Vehicle__r.Name) would go
+# stale. Join locally on the Id columns instead.
+REPLICA_OBJECTS: Dict[str, Dict[str, List[str]]] = {
+    "Vehicle__c": {
+        "fields": [
+            "Name", "Reg_No__c", "Van_Number__c", "Status__c", "Trade_Group__c",
+            "Vehicle_Type__c", "Vehicle_Ownership__c", "Service_Territory__c",
+            "Make_Model__c", "Description__c", "Tracking_Number__c", "Leaver__c",
+            "Last_Service_Date__c", "Next_Service_Date__c",
+            "Last_MOT_Date__c", "Next_MOT_Date__c",
+            "Last_Road_Tax__c", "Next_Road_Tax__c", "CreatedDate",
+        ],
+        "index": ["Reg_No__c", "Van_Number__c", "Status__c", "Trade_Group__c"],
+    },
+    "Vehicle_Allocation__c": {
+        "fields": [
+            "Vehicle__c", "Service_Resource__c", "Internal_Staff__c",
+            "Start_date__c", "End_date__c", "Reserved_For__c", "Contact_Number__c",
+        ],
+        "index": ["Vehicle__c", "Service_Resource__c", "End_date__c"],
+    },
+    "Vehicle_Service_Payment__c": {
+        "fields": ["Vehicle__c", "Type__c", "Payment_value__c", "Description__c", "CreatedDate"],
+        "index": ["Vehicle__c", "Type__c"],
+    },
+    "Vehicle_Cost__c": {
+        "fields": ["Vehicle__c", "Type__c", "Payment_value__c", "Date__c", "Description__c", "CreatedDate"],
+        "index": ["Vehicle__c", "Type__c"],
+    },
+    "ServiceResource": {
+        "fields": [
+            "Name", "IsActive", "RelatedRecordId", "Trade_Lookup__c",
+            "Trade_Group_Postcode__c", "Is_User_Active__c", "FSM__c",
+        ],
+        "index": ["Name", "IsActive"],
+    },
+    "Vehicle_Condition_Form__c": {
+        "fields": [
+            "Name", "Vehicle__c", "Current_Engineer_Assigned_to_Vehicle__c",
+            "CreatedDate", "LastModifiedDate",
+        ],
+        "index": ["Vehicle__c", "CreatedDate"],
+    },
+}
+
+
+def _soql_datetime(value: str) -> str:
+    """'2024-05-01T10:11:12.000+0000' → '2024-05-01T10:11:12Z' (SOQL literal)."""
+    return value[:19] + "Z"
+
+
+def _clean(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k != "attributes"}
+
+
+class ReplicaStore:
+    """SQLite tables mirroring REPLICA_OBJECTS plus a sync_state watermark table."""
+
+    def __init__(self, path: str = SF_REPLICA_PATH, objects: Dict[str, Dict[str, List[str]]] = None):
+        self.path    = path
+        self.objects = objects or REPLICA_OBJECTS
+        self._local  = threading.local()
+        self._write_lock = threading.Lock()
+        self._create_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    sobject        TEXT PRIMARY KEY,
+                    watermark      TEXT,
+                    last_sync_at   REAL,
+                    last_full_sync REAL,
+                    last_error     TEXT
+                )
+            """)
+            for sobject, spec in self.objects.items():
+                cols = ", ".join(f'"{c}"' for c in spec["index"])
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS "{sobject}" (
+                        Id             TEXT PRIMARY KEY,
+                        SystemModstamp TEXT,
+                        {cols + "," if cols else ""}
+                        data           TEXT NOT NULL
+                    )
+                """)
+                for col in spec["index"]:
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{sobject}_{col}" ON "{sobject}" ("{col}")')
+
+    # ── writes (sync worker) ─────────────────────────────────────────────────
+
+    def apply(self, sobject: str, records: List[dict], full: bool = False) -> Dict[str, int]:
+        """Upsert live rows, delete IsDeleted rows; a full pass replaces the table."""
+        index_cols = self.objects[sobject]["index"]
+        columns    = ["Id", "SystemModstamp", *index_cols, "data"]
+        col_sql    = ", ".join(f'"{c}"' for c in columns)
+        marks      = ", ".join("?" for _ in columns)
+
+        upserts, deletes = [], []
+        watermark = None
+        for rec in records:
+            rec = _clean(rec)
+            stamp = rec.get("SystemModstamp")
+            if stamp and (watermark is None or stamp > watermark):
+                watermark = stamp
+            if rec.pop("IsDeleted", False):
+                deletes.append((rec["Id"],))
+                continue
+            upserts.append((rec["Id"], stamp, *[rec.get(c) for c in index_cols],
+                            json.dumps(rec, default=str)))
+
+        conn = self._conn()
+        with self._write_lock, conn:
+            if full:
+                conn.execute(f'DELETE FROM "{sobject}"')
+            if deletes:
+                conn.executemany(f'DELETE FROM "{sobject}" WHERE Id = ?', deletes)
+            if upserts:
+                conn.executemany(f'INSERT OR REPLACE INTO "{sobject}" ({col_sql}) VALUES ({marks})', upserts)
+
+            now = time.time()
+            prev = self.sync_state(sobject)
+            conn.execute("""
+                INSERT OR REPLACE INTO sync_state (sobject, watermark, last_sync_at, last_full_sync, last_error)
+                VALUES (?, ?, ?, ?, NULL)
+            """, (
+                sobject,
+                watermark or prev.get("watermark"),
+                now,
+                now if full else prev.get("last_full_sync"),
+            ))
+        return {"upserted": len(upserts), "deleted": len(deletes)}
+
+    def record_error(self, sobject: str, error: str):
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute("INSERT OR IGNORE INTO sync_state (sobject) VALUES (?)", (sobject,))
+            conn.execute("UPDATE sync_state SET last_error = ? WHERE sobject = ?", (error[:500], sobject))
+
+    # ── reads ────────────────────────────────────────────────────────────────
+
+    def sync_state(self, sobject: str) -> dict:
+        row = self._conn().execute("SELECT * FROM sync_state WHERE sobject = ?", (sobject,)).fetchone()
+        return dict(row) if row else {}
+
+    def is_fresh(self, sobject: str, max_age: float = SF_REPLICA_INTERVAL * 2) -> bool:
+        last = self.sync_state(sobject).get("last_sync_at")
+        return bool(last) and (time.time() - last) <= max_age
+
+    def records(self, sobject: str, where: str = "", params: tuple = (), order_by: str = "") -> List[dict]:
+        """
+        Rows as the same dicts execute_soql returns (own fields only).
+        `where` / `order_by` may reference the indexed columns, e.g.
+            store.records("Vehicle_Allocation__c", "End_date__c IS NULL")
+        """
+        sql = f'SELECT data FROM "{sobject}"'
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        return [json.loads(r["data"]) for r in self._conn().execute(sql, params)]
+
+    def group_sum(self, sobject: str, group_by: Sequence[str], field: str,
+                  where: str = "", params: tuple = ()) -> List[dict]:
+        """
+        SELECT group_by..., SUM(field) total ... GROUP BY group_by — rows
+        shaped like the equivalent SOQL aggregate. group_by must be indexed
+        columns; field is read from the stored record.
+        """
+        cols = ", ".join(f'"{c}"' for c in group_by)
+        sql = (f'SELECT {cols}, SUM(json_extract(data, ?)) AS total FROM "{sobject}"'
+               + (f" WHERE {where}" if where else "") + f" GROUP BY {cols}")
+        return [dict(r) for r in self._conn().execute(sql, (f"$.{field}", *params))]
+
+    def count(self, sobject: str, where: str = "", params: tuple = ()) -> int:
+        sql = f'SELECT COUNT(*) FROM "{sobject}"' + (f" WHERE {where}" if where else "")
+        return self._conn().execute(sql, params).fetchone()[0]
+
+    def status(self) -> dict:
+        out = {}
+        for sobject in self.objects:
+            state = self.sync_state(sobject)
+            last  = state.get("last_sync_at")
+            out[sobject] = {
+                "rows":       self.count(sobject),
+                "watermark":  state.get("watermark"),
+                "age_s":      round(time.time() - last, 1) if last else None,
+                "last_error": state.get("last_error"),
+            }
+        return out
+
+
+class _SalesforceSource:
+    """query_all() backed by the shared SalesforceService session (re-logs in on 401)."""
+
+    def __init__(self):
+        from salesforce_service import SalesforceService
+        self._svc = SalesforceService()
+
+    def query_all(self, query: str, include_deleted: bool = False) -> dict:
+        if self._svc.mock_mode:
+            raise RuntimeError("Salesforce not connected")
+        return self._svc.call(lambda sf: sf.query_all(query, include_deleted=include_deleted))
+
+
+class RecordedSource:
+    """
+    Offline stand-in for Salesforce: replays recorded query_all() responses
+    in order, per sObject, and keeps the (query, include_deleted) calls it
+    received so callers can check the watermark filter.
+
+        {"Vehicle_Cost__c": [{"records": [...]}, {"records": [...]}], ...}
+    """
+
+    def __init__(self, responses: Dict[str, List[dict]]):
+        self._responses = {k: list(v) for k, v in responses.items()}
+        self.calls: List[tuple] = []
+
+    @classmethod
+    def from_file(cls, path: str) -> "RecordedSource":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def query_all(self, query: str, include_deleted: bool = False) -> dict:
+        sobject = query.split(" FROM ", 1)[1].split()[0]
+        self.calls.append((query, include_deleted))
+        pending = self._responses.get(sobject)
+        if not pending:
+            raise RuntimeError(f"No recorded response left for {sobject}")
+        return pending.pop(0)
+
+
+class ReplicaSync:
+    """Pulls changes for each replicated object into a ReplicaStore."""
+
+    def __init__(self, store: ReplicaStore, source=None,
+                 full_interval: float = SF_REPLICA_FULL_INTERVAL):
+        self.store         = store
+        self.source        = source or _SalesforceSource()
+        self.full_interval = full_interval
+
+    def sync_object(self, sobject: str, full: bool = None) -> Dict[str, int]:
+        spec  = self.store.objects[sobject]
+        state = self.store.sync_state(sobject)
+        if full is None:
+            last_full = state.get("last_full_sync")
+            full = not state.get("watermark") or not last_full or (time.time() - last_full) > self.full_interval
+
+        fields = ", ".join(["Id", "SystemModstamp", "IsDeleted", *spec["fields"]])
+        query  = f"SELECT {fields} FROM {sobject}"
+        if not full:
+            # >= rather than > — SOQL literals drop milliseconds; re-applying a row is harmless
+            query += f" WHERE SystemModstamp >= {_soql_datetime(state['watermark'])}"
+        query += " ORDER BY SystemModstamp ASC"
+
+        started = time.time()
+        result  = self.source.query_all(query, include_deleted=not full)
+        counts  = self.store.apply(sobject, result.get("records", []), full=full)
+        print(f"[REPLICA] {sobject}: {'full' if full else 'incremental'} sync "
+              f"+{counts['upserted']} -{counts['deleted']} in {time.time() - started:.2f}s")
+        return counts
+
+    def sync_all(self, full: bool = None) -> Dict[str, object]:
+        results = {}
+        for sobject in self.store.objects:
+            try:
+                results[sobject] = self.sync_object(sobject, full=full)
+            except Exception as e:
+                print(f"[REPLICA] {sobject} sync failed: {e}")
+                self.store.record_error(sobject, str(e))
+                results[sobject] = {"error": str(e)}
+        return results
+
+
+# ─── Process-wide store + background worker ──────────────────────────────────
+
+_store: Optional[ReplicaStore] = None
+_store_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+
+
+def get_replica_store() -> ReplicaStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ReplicaStore()
+    return _store
+
+
+def start_replica_worker(interval: int = SF_REPLICA_INTERVAL) -> Optional[threading.Thread]:
+    """Start the periodic sync thread once per process (no-op if already running)."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return _worker
+
+    def _loop():
+        sync = ReplicaSync(get_replica_store())
+        while True:
+            started = time.time()
+            try:
+                sync.sync_all()
+            except Exception as e:
+                print(f"[REPLICA] Sync pass failed: {e}")
+            time.sleep(max(5, interval - (time.time() - started)))
+
+    _worker = threading.Thread(target=_loop, daemon=True, name="sf-replica-sync")
+    _worker.start()
+    print(f"[REPLICA] Sync worker started → {SF_REPLICA_PATH} (every {interval}s)")
+    return _worker
+
+
+def replica_enabled() -> bool:
+    return os.getenv("SF_REPLICA_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+def replica_ready(sobject: str) -> bool:
+    """True when reads of sobject can be served from the replica."""
+    if not replica_enabled():
+        return False
+    try:
+        return get_replica_store().is_fresh(sobject)
+    except Exception as e:
+        print(f"[REPLICA] {sobject} unavailable: {e}")
+        return False
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+single_flight.py — coalesce concurrent identical requests into one computation.
+
+When the dashboard opens, every tab fires the same handful of expensive
+endpoints at once. With single-flight, the first request for a key (endpoint
++ parameters) runs the handler; requests that arrive while it is still
+running wait for that result instead of starting their own Salesforce query
+chain. Nothing is cached afterwards — the next request after completion runs
+fresh (endpoint-level caches stay the handlers' own business).
+
+    @router.get("/vehicle-summary")
+    @coalesce("dashboard.vehicle-summary")
+    def get_vehicle_summary(...): ...
+
+    @router.get("/vehicle-financial-overview")
+    @coalesce("cost.vehicle-financial-overview", key=lambda kw: (kw.get("trade_group") or "").lower())
+    def get_vehicle_financial_overview(trade_group: str = None, ...): ...
+
+Sync handlers run in FastAPI's threadpool, so waiting is a threading.Event.
+Counters are exposed through /api/dashboard/debug-cache.
+"""
+import functools
+import threading
+import time
+from typing import Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters", "started")
+
+    def __init__(self):
+        self.done    = threading.Event()
+        self.result  = None
+        self.error   = None
+        self.waiters = 0
+        self.started = time.time()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _counter(self, name: str) -> Dict[str, float]:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = {"executed": 0, "coalesced": 0, "errors": 0, "max_waiters": 0, "last_run_s": None}
+        return stats
+
+    def do(self, name: str, key: Hashable, fn: Callable):
+        """Run fn() once per concurrent (name, key); everyone gets its result or exception."""
+        flight_key = (name, key)
+        with self._lock:
+            stats = self._counter(name)
+            call = self._calls.get(flight_key)
+            if call is not None:
+                call.waiters += 1
+                stats["coalesced"] += 1
+                stats["max_waiters"] = max(stats["max_waiters"], call.waiters)
+                leader = False
+            else:
+                call = self._calls[flight_key] = _Call()
+                stats["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(flight_key, None)
+                stats["last_run_s"] = round(time.time() - call.started, 3)
+            call.done.set()
+            if call.waiters:
+                print(f"[COALESCE] {name} {key!r}: 1 computation served {call.waiters + 1} requests")
+
+    def stats(self) -> dict:
+        with self._lock:
+            endpoints = {name: dict(s) for name, s in self._stats.items()}
+            in_flight = len(self._calls)
+        executed = sum(s["executed"] for s in endpoints.values())
+        coalesced = sum(s["coalesced"] for s in endpoints.values())
+        return {
+            "in_flight": in_flight,
+            "executed": executed,
+            "coalesced": coalesced,
+            "coalesce_ratio": round(coalesced / (executed + coalesced), 3) if executed + coalesced else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
+
+
+def coalesce(name: str, key: Callable[[dict], Hashable] = None):
+    """
+    Route decorator: concurrent calls with the same key share one execution.
+    `key` receives the handler's keyword arguments (defaults to none — one
+    flight per endpoint). Put it below @router.get so FastAPI still sees the
+    original signature.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            flight_key = key(kwargs) if key else None
+            return _single_flight.do(name, flight_key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+soql_aggregates.py — push counting/summing to Salesforce and run independent
+aggregate queries side by side.
+
+Routes used to download whole tables (every Vehicle__c row, every payment)
+only to count or sum them in Python. These helpers send GROUP BY aggregates
+instead, and run_parallel() fans independent queries out over a small shared
+thread pool so a tile costs one round trip of wall time instead of N.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+SOQL_PARALLELISM = int(os.getenv("SOQL_PARALLELISM", "6"))
+# Timezone the Salesforce org evaluates TODAY / NEXT_N_DAYS in
+SF_ORG_TIMEZONE  = os.getenv("SF_ORG_TIMEZONE", "Europe/London")
+# Ids per IN (...) literal — keeps each GET well under the SOQL / URL length limits
+SOQL_IN_CHUNK    = int(os.getenv("SOQL_IN_CHUNK", "300"))
+# Vehicles per GROUP BY Vehicle__c, Type__c chunk (× types must stay < 2,000
+# groups — aggregate results are not paginated)
+COST_GROUP_CHUNK = 150
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=SOQL_PARALLELISM, thread_name_prefix="soql")
+    return _pool
+
+
+def run_parallel(tasks: Dict[str, Callable]) -> Dict[str, object]:
+    """
+    Run independent zero-arg callables concurrently and return {name: result}.
+    A task that raises is reported as its exception object so one failing
+    aggregate never sinks the others — callers decide the fallback.
+    """
+    futures = {name: _executor().submit(fn) for name, fn in tasks.items()}
+    results = {}
+    for name, fut in futures.items():
+        try:
+            results[name] = fut.result()
+        except Exception as e:
+            print(f"[WARN] Parallel task '{name}' failed: {e}")
+            results[name] = e
+    return results
+
+
+def soql_in(values: Iterable[str]) -> str:
+    """Quote values for a SOQL IN (...) list."""
+    return ", ".join("'" + str(v).replace("\\", "\\\\").replace("'", "\\'") + "'" for v in values)
+
+
+def chunked(values: List, size: int = SOQL_IN_CHUNK) -> List[List]:
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def query_in_chunks(sf, template: str, ids: List[str], chunk_size: int = SOQL_IN_CHUNK,
+                    cache_ttl: float = None) -> List[dict]:
+    """
+    Run `template` (containing an {ids} placeholder) once per chunk of ids,
+    chunks in parallel, and return the concatenated rows. Raises if any
+    chunk fails so callers never mistake a partial result for a full one.
+    """
+    tasks = {
+        f"chunk{i}": (lambda q=template.format(ids=soql_in(chunk)): sf.query_soql(q, cache_ttl=cache_ttl))
+        for i, chunk in enumerate(chunked(ids, chunk_size))
+    }
+    rows = []
+    for name, result in run_parallel(tasks).items():
+        if isinstance(result, Exception):
+            raise result
+        rows.extend(result)
+    return rows
+
+
+def org_today() -> date:
+    """Today's date in the org timezone (what SOQL TODAY means)."""
+    if ZoneInfo is not None:
+        try:
+            return datetime.now(ZoneInfo(SF_ORG_TIMEZONE)).date()
+        except Exception:
+            pass
+    return date.today()
+
+
+def object_watermarks(sf, objects: Iterable[str], field: str = "SystemModstamp",
+                      cache_ttl: float = None) -> Optional[tuple]:
+    """
+    ((MAX(field), COUNT(Id)) per object, in order) as a cheap "has anything
+    changed" marker for derived views, or None if any aggregate failed.
+    MAX() alone does not move when a record is deleted; the count does.
+    """
+    objects = list(objects)
+    results = run_parallel({
+        obj: (lambda o=obj: sf.query_soql(f"SELECT MAX({field}) m, COUNT(Id) n FROM {o}", cache_ttl=cache_ttl))
+        for obj in objects
+    })
+    if any(isinstance(r, Exception) for r in results.values()):
+        return None
+    return tuple(
+        (results[o][0].get("m"), int(results[o][0].get("n") or 0)) if results[o] else (None, 0)
+        for o in objects
+    )
+
+
+def parse_sf_date(value) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def group_count(sf, sobject: str, field: str, where: str = None,
+                cache_ttl: float = None) -> Dict[Optional[str], int]:
+    """SELECT field, COUNT(Id) ... GROUP BY field → {value: count}."""
+    query = f"SELECT {field}, COUNT(Id) cnt FROM {sobject}"
+    if where:
+        query += f" WHERE {where}"
+    query += f" GROUP BY {field}"
+    rows = sf.execute_soql(query, cache_ttl=cache_ttl) or []
+    return {r.get(field): int(r.get("cnt") or 0) for r in rows}
+
+
+# ─── Vehicle due dates ────────────────────────────────────────────────────────
+
+DUE_WINDOW_DAYS = 30
+
+# One query returns only the vehicles due for *something*; the three
+# per-bucket conditions mirror the old get_*_due_count queries exactly.
+DUE_DATES_SOQL = f"""
+    SELECT Next_Service_Date__c, Next_MOT_Date__c, Next_Road_Tax__c, Leaver__c
+    FROM Vehicle__c
+    WHERE (Next_Service_Date__c >= TODAY AND Next_Service_Date__c <= NEXT_N_DAYS:{DUE_WINDOW_DAYS} AND Leaver__c = false)
+       OR (Next_MOT_Date__c != NULL AND Next_MOT_Date__c <= NEXT_N_DAYS:{DUE_WINDOW_DAYS})
+       OR (Next_Road_Tax__c >= TODAY AND Next_Road_Tax__c <= NEXT_N_DAYS:{DUE_WINDOW_DAYS} AND Leaver__c = false)
+"""
+
+
+def bucket_due_dates(rows: List[dict], today: date = None,
+                     days: int = DUE_WINDOW_DAYS) -> Dict[str, int]:
+    """Count service / MOT / tax due from the rows returned by DUE_DATES_SOQL."""
+    today   = today or org_today()
+    horizon = today + timedelta(days=days)
+    counts  = {"due_service": 0, "mot_due": 0, "tax_due": 0}
+
+    for r in rows:
+        leaver  = bool(r.get("Leaver__c"))
+        service = parse_sf_date(r.get("Next_Service_Date__c"))
+        mot     = parse_sf_date(r.get("Next_MOT_Date__c"))
+        tax     = parse_sf_date(r.get("Next_Road_Tax__c"))
+
+        if service and not leaver and today <= service <= horizon:
+            counts["due_service"] += 1
+        if mot and mot <= horizon:
+            counts["mot_due"] += 1
+        if tax and not leaver and today <= tax <= horizon:
+            counts["tax_due"] += 1
+    return counts
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+soql_cache.py — opt-in result cache for SalesforceService.execute_soql.
+
+Dashboard tiles run the same read-only SOQL many times a minute. Callers opt
+in per query with a TTL:
+
+    sf.execute_soql(query, cache_ttl=60)
+
+Entries are keyed by normalised SOQL text and kept in a size-bounded LRU.
+Once an entry is older than its TTL it is still served for a further
+stale window while ONE background thread refreshes it
+(stale-while-revalidate); after that window it is a normal miss.
+
+Write paths call SalesforceService.invalidate_cache("Vehicle__c", ...) which
+drops every cached query that reads from those objects — including queries
+that only reach them through a relationship path (Vehicle__r.Name). A load
+that was already in flight when its objects were invalidated is returned to
+its caller but not cached.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+SOQL_CACHE_MAX_ENTRIES = int(os.getenv("SOQL_CACHE_MAX_ENTRIES", "256"))
+# How long past its TTL an entry may be served while it is refreshed
+SOQL_CACHE_STALE_FACTOR = float(os.getenv("SOQL_CACHE_STALE_FACTOR", "2"))
+
+_WS_RE   = re.compile(r"\s+")
+_FROM_RE = re.compile(r"\bFROM\s+([A-Za-z0-9_]+)", re.IGNORECASE)
+_REL_RE  = re.compile(r"\b([A-Za-z0-9_]+__r)\.", re.IGNORECASE)
+
+# Lookups whose target object isn't simply <name>__c. Any other X__r is
+# recorded as X__c; add an entry here when a new lookup breaks that rule.
+RELATIONSHIP_OBJECTS = {
+    "service_resource__r": "serviceresource",
+    "user__r": "user",
+}
+
+
+def normalize_soql(query: str) -> str:
+    """Collapse whitespace so differently-indented copies share a key."""
+    return _WS_RE.sub(" ", query).strip()
+
+
+def soql_objects(query: str) -> frozenset:
+    """sObject names a query reads: outer and sub-select FROMs plus the parents of X__r.Field paths."""
+    objects = {m.lower() for m in _FROM_RE.findall(query)}
+    for rel in _REL_RE.findall(query):
+        rel = rel.lower()
+        objects.add(RELATIONSHIP_OBJECTS.get(rel, rel[:-3] + "__c"))
+    return frozenset(objects)
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "ttl", "objects", "refreshing")
+
+    def __init__(self, value, ttl: float, objects: frozenset):
+        self.value      = value
+        self.fetched_at = time.time()
+        self.ttl        = ttl
+        self.objects    = objects
+        self.refreshing = False
+
+
+class SoqlResultCache:
+    def __init__(self, max_entries: int = SOQL_CACHE_MAX_ENTRIES,
+                 stale_factor: float = SOQL_CACHE_STALE_FACTOR):
+        self._lock        = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Bumped by invalidate() so loads that started earlier aren't cached
+        self._generation = 0
+        self._object_generations: Dict[str, int] = {}
+        self.max_entries  = max_entries
+        self.stale_factor = stale_factor
+        self.hits         = 0
+        self.stale_hits   = 0
+        self.misses       = 0
+        self.evictions    = 0
+        self.invalidations = 0
+        self.refreshes    = 0
+        self.refresh_errors = 0
+
+    def get_or_load(self, kind: str, query: str, ttl: float, loader: Callable):
+        """
+        Return the cached result for (kind, query) or call loader() to fetch it.
+        loader must raise on failure — failures are never cached.
+        """
+        key = f"{kind}:{normalize_soql(query)}"
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if age <= entry.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+                if age <= entry.ttl * (1 + self.stale_factor):
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        threading.Thread(
+                            target=self._refresh, args=(key, entry, loader, self._token(entry.objects)),
+                            daemon=True, name="soql-cache-refresh",
+                        ).start()
+                    return entry.value
+            self.misses += 1
+            objects = soql_objects(query)
+            token = self._token(objects)
+
+        value = loader()
+        self._store(key, value, ttl, objects, token)
+        return value
+
+    def invalidate(self, objects: Optional[Iterable[str]] = None) -> int:
+        """Drop entries reading from any of `objects` (all entries when None)."""
+        with self._lock:
+            if objects is None:
+                self._generation += 1
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                wanted = {o.lower() for o in objects}
+                for o in wanted:
+                    self._object_generations[o] = self._object_generations.get(o, 0) + 1
+                stale  = [k for k, e in self._entries.items() if e.objects & wanted]
+                for k in stale:
+                    del self._entries[k]
+                dropped = len(stale)
+            self.invalidations += dropped
+        if dropped:
+            print(f"[CACHE] Invalidated {dropped} SOQL result(s) for {sorted(objects) if objects else 'ALL'}")
+        return dropped
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries":        len(self._entries),
+                "max_entries":    self.max_entries,
+                "hits":           self.hits,
+                "stale_hits":     self.stale_hits,
+                "misses":         self.misses,
+                "hit_rate":       round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0,
+                "evictions":      self.evictions,
+                "invalidations":  self.invalidations,
+                "refreshes":      self.refreshes,
+                "refresh_errors": self.refresh_errors,
+            }
+
+    # ── internals ────────────────────────────────────────────────────────────
+
+    def _token(self, objects: frozenset) -> tuple:
+        """Invalidation generations for `objects` — call with self._lock held."""
+        return self._generation, tuple(self._object_generations.get(o, 0) for o in sorted(objects))
+
+    def _store(self, key: str, value, ttl: float, objects: frozenset, token: tuple) -> bool:
+        with self._lock:
+            if self._token(objects) != token:
+                # invalidate() ran while this was loading — the rows may predate the write
+                return False
+            self._entries[key] = _Entry(value, ttl, objects)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def _refresh(self, key: str, entry: _Entry, loader: Callable, token: tuple):
+        try:
+            value = loader()
+        except Exception as e:
+            print(f"[CACHE] Background refresh failed, keeping stale result: {e}")
+            with self._lock:
+                entry.refreshing = False
+                self.refresh_errors += 1
+            return
+        with self._lock:
+            # Skip if the entry was replaced while we were fetching
+            if self._entries.get(key) is not entry:
+                return
+        if self._store(key, value, entry.ttl, entry.objects, token):
+            with self._lock:
+                self.refreshes += 1
+
+
+_cache: Optional[SoqlResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> SoqlResultCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SoqlResultCache()
+    return _cache
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Offline check of the chatbot's local intent fast path (intent_router.py) —
+no Groq or Salesforce connection needed.
+
+  1. "vehicles at <depot>" only routes locally for a known service territory
+  2. phrasings with a status word, a second preposition or an unknown place
+     fall through to the LLM (route() returns None) and are not cached
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intent_router import IntentRouter
+
+TERRITORIES = ["Croydon", "London", "Leeds"]
+
+
+def test_location_rule():
+    router = IntentRouter(known_locations=lambda: TERRITORIES)
+
+    for question, location in [("Show vehicles at Croydon depot", "Croydon"),
+                               ("vans in london?", "London"),
+                               ("list all vehicles at the Leeds depot", "Leeds")]:
+        intent = router.route(question)
+        assert intent and intent["intent"] == "get_vehicles_by_location", (question, intent)
+        assert intent["parameters"] == {"location": location}, (question, intent)
+
+    # Regressions: these used to come back as locations "Risk", "London"
+    # (spare filter dropped) and "Depot In Leeds"
+    for question in ["show me vehicles at risk",
+                     "list spare vans in London",
+                     "vehicles at the depot in Leeds",
+                     "vehicles in Manchester"]:
+        intent = router.route(question)
+        assert intent is None or intent["intent"] != "get_vehicles_by_location", (question, intent)
+        assert router.route(question) == intent, question
+
+    # No territory list (or Salesforce down) → never guess a location
+    for loader in (None, lambda: (_ for _ in ()).throw(RuntimeError("offline"))):
+        assert IntentRouter(known_locations=loader).route("vehicles at Croydon") is None
+
+    print("✅ Intent router: location rule only accepts known territories")
+
+
+if __name__ == "__main__":
+    test_location_rule()
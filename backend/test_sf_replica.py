@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Offline check of the Salesforce replica sync against recorded responses
+(fixtures/sf_replica_fixture.json) — no Salesforce connection needed.
+
+  1. first pass is a full sync (no watermark yet)
+  2. second pass asks only for rows since the watermark, via queryAll, and
+     drops the row that came back IsDeleted = true
+  3. a forced full resync removes a row that was hard-deleted in Salesforce
+"""
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sf_replica import REPLICA_OBJECTS, RecordedSource, ReplicaStore, ReplicaSync
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sf_replica_fixture.json")
+SOBJECT = "Vehicle_Cost__c"
+
+
+def test_replica_sync():
+    with tempfile.TemporaryDirectory() as tmp:
+        store  = ReplicaStore(os.path.join(tmp, "replica.db"), objects={SOBJECT: REPLICA_OBJECTS[SOBJECT]})
+        source = RecordedSource.from_file(FIXTURE)
+        sync   = ReplicaSync(store, source=source)
+
+        # 1. Full sync
+        counts = sync.sync_object(SOBJECT)
+        query, include_deleted = source.calls[-1]
+        assert "WHERE" not in query and not include_deleted, query
+        assert counts == {"upserted": 3, "deleted": 0}, counts
+        assert store.sync_state(SOBJECT)["watermark"] == "2024-05-03T08:15:00.000+0000"
+
+        # 2. Incremental: watermark filter, queryAll, soft delete applied
+        counts = sync.sync_object(SOBJECT)
+        query, include_deleted = source.calls[-1]
+        assert "SystemModstamp >= 2024-05-03T08:15:00Z" in query and include_deleted, query
+        assert counts == {"upserted": 2, "deleted": 1}, counts
+        ids = sorted(r["Id"] for r in store.records(SOBJECT))
+        assert ids == ["a0C000000000001AAA", "a0C000000000003AAA", "a0C000000000004AAA"], ids
+        assert store.sync_state(SOBJECT)["watermark"] == "2024-05-05T16:45:00.000+0000"
+
+        totals = {(r["Vehicle__c"], r["Type__c"]): r["total"] for r in store.group_sum(
+            SOBJECT, ("Vehicle__c", "Type__c"), "Payment_value__c")}
+        assert totals == {("a0V000000000001AAA", "Fuel"): 180.75,
+                          ("a0V000000000002AAA", "Fuel"): 80.0}, totals
+
+        # 3. Forced resync drops the hard-deleted row
+        counts = sync.sync_object(SOBJECT, full=True)
+        assert counts == {"upserted": 2, "deleted": 0}, counts
+        assert store.count(SOBJECT) == 2
+        assert store.is_fresh(SOBJECT)
+
+    print("✅ Replica sync: full, incremental (queryAll deletes) and resync OK")
+
+
+if __name__ == "__main__":
+    test_replica_sync()
@@ -1,14 +1,15 @@
 # -*- coding: utf-8 -*-
-import requests
-from requests.auth import HTTPBasicAuth
 from datetime import datetime, timedelta
 import os
 import hashlib
+
+from webfleet_client import WebfleetError, fetch, fetch_many
  
 class WebfleetAPI:
     """Handle Webfleet API calls for driving scores"""
     
     def __init__(self):
+        # Requests go through the shared pooled client (webfleet_client.py)
         self.base_url = "https://csv.webfleet.com/extern"
         self.username = os.getenv('WEBFLEET_USERNAME')
         self.password = os.getenv('WEBFLEET_PASSWORD')
@@ -36,31 +37,22 @@ class WebfleetAPI:
             range_from = start_date.strftime('%Y%m%d')
             range_to = end_date.strftime('%Y%m%d')
             
-            # STEP 1: Get all drivers to find by email
-            driver_params = {
-                'account': self.account,
-                'apikey': self.api_key,
-                'lang': 'en',
-                'action': 'showDriverReportExtern',
-                'outputformat': 'json',
-                'useUTF8': 'true',
-                'useISO8601': 'true'
-            }
-            
-            # Get all drivers
-            driver_response = requests.get(
-                self.base_url,
-                params=driver_params,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=10
-            )
-            
-            if driver_response.status_code != 200:
-                print(f"❌ Webfleet API error: Status {driver_response.status_code}")
+            # STEP 1: Get all drivers (to find by email) and the OptiDrive
+            # scores together — the two actions don't depend on each other
+            # [OK] NO rangepattern parameter!
+            results = fetch_many({
+                'drivers': ('showDriverReportExtern', {}),
+                'optidrive': ('showOptiDriveIndicator', {
+                    'rangefrom_string': range_from,  # [OK] 7 days only
+                    'rangeto_string': range_to
+                })
+            })
+            driver_data = results['drivers']
+            
+            if isinstance(driver_data, Exception):
+                print(f"❌ Webfleet API error: {driver_data}")
                 return 0
             
-            driver_data = driver_response.json()
-            
             if not driver_data or not isinstance(driver_data, list):
                 print(f"[WARNING] No valid driver data returned")
                 return 0
@@ -84,31 +76,11 @@ class WebfleetAPI:
                 return 0
             
             # STEP 3: Get OptiDrive score using the driver's name from Webfleet
-            # [OK] NO rangepattern parameter!
-            optidrive_params = {
-                'account': self.account,
-                'apikey': self.api_key,
-                'lang': 'en',
-                'action': 'showOptiDriveIndicator',
-                'rangefrom_string': range_from,  # [OK] 7 days only
-                'rangeto_string': range_to,
-                'outputformat': 'json',
-                'useUTF8': 'true',
-                'useISO8601': 'true'
-            }
-            
-            optidrive_response = requests.get(
-                self.base_url,
-                params=optidrive_params,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=10
-            )
-            
-            if optidrive_response.status_code != 200:
-                print(f"❌ OptiDrive API error: Status {optidrive_response.status_code}")
-                return 0
+            optidrive_data = results['optidrive']
             
-            optidrive_data = optidrive_response.json()
+            if isinstance(optidrive_data, Exception):
+                print(f"❌ OptiDrive API error: {optidrive_data}")
+                return 0
             
             if not optidrive_data or not isinstance(optidrive_data, list):
                 print(f"[WARNING] No OptiDrive data returned")
@@ -169,30 +141,23 @@ class WebfleetAPI:
                 print("[WARNING]  Webfleet credentials not configured - using demo scores")
                 return {}, {}
             
-            print("📡 BATCH: Fetching all drivers...")
-            # BATCH 1: Get all drivers
-            driver_params = {
-                'account': self.account,
-                'apikey': self.api_key,
-                'lang': 'en',
-                'action': 'showDriverReportExtern',
-                'outputformat': 'json',
-                'useUTF8': 'true',
-                'useISO8601': 'true'
-            }
-            
-            driver_response = requests.get(
-                self.base_url,
-                params=driver_params,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
-            )
-            
-            if driver_response.status_code != 200:
-                print(f"❌ Driver API error: {driver_response.status_code}")
-                return {}, {}
+            # BATCH 1 + 2: all drivers and ALL OptiDrive scores (7-day range,
+            # no email filter), fetched concurrently
+            print("📡 BATCH: Fetching all drivers and OptiDrive scores (7 days)...")
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=7)
+            range_from = start_date.strftime('%Y%m%d')
+            range_to = end_date.strftime('%Y%m%d')
             
-            drivers_list = driver_response.json()
+            results = fetch_many({
+                'drivers': ('showDriverReportExtern', {}),
+                'optidrive': ('showOptiDriveIndicator', {'rangefrom_string': range_from, 'rangeto_string': range_to})
+            })
+            
+            drivers_list = results['drivers']
+            if isinstance(drivers_list, Exception):
+                print(f"❌ Driver API error: {drivers_list}")
+                return {}, {}
             if not isinstance(drivers_list, list):
                 return {}, {}
             
@@ -205,37 +170,10 @@ class WebfleetAPI:
             
             print(f"[OK] Fetched {len(drivers_by_email)} drivers")
             
-            # BATCH 2: Get ALL OptiDrive scores (7-day range, no email filter)
-            print("📡 BATCH: Fetching ALL OptiDrive scores (7 days)...")
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=7)
-            range_from = start_date.strftime('%Y%m%d')
-            range_to = end_date.strftime('%Y%m%d')
-            
-            optidrive_params = {
-                'account': self.account,
-                'apikey': self.api_key,
-                'lang': 'en',
-                'action': 'showOptiDriveIndicator',
-                'rangefrom_string': range_from,
-                'rangeto_string': range_to,
-                'outputformat': 'json',
-                'useUTF8': 'true',
-                'useISO8601': 'true'
-            }
-            
-            optidrive_response = requests.get(
-                self.base_url,
-                params=optidrive_params,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
-            )
-            
-            if optidrive_response.status_code != 200:
-                print(f"❌ OptiDrive API error: {optidrive_response.status_code}")
+            optidrive_list = results['optidrive']
+            if isinstance(optidrive_list, Exception):
+                print(f"❌ OptiDrive API error: {optidrive_list}")
                 return drivers_by_email, {}
-            
-            optidrive_list = optidrive_response.json()
             if not isinstance(optidrive_list, list):
                 return drivers_by_email, {}
             
@@ -289,30 +227,11 @@ class WebfleetAPI:
             range_from = start_date.strftime('%Y%m%d')
             range_to = end_date.strftime('%Y%m%d')
             
-            params = {
-                'account': self.account,
-                'apikey': self.api_key,
-                'lang': 'en',
-                'action': 'showOptiDriveIndicator',
-                'rangefrom_string': range_from,
-                'rangeto_string': range_to,
-                'outputformat': 'json',
-                'useUTF8': 'true',
-                'useISO8601': 'true'
-            }
-            
-            response = requests.get(
-                self.base_url,
-                params=params,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=10
-            )
-            
-            if response.status_code != 200:
+            try:
+                data = fetch('showOptiDriveIndicator', rangefrom_string=range_from, rangeto_string=range_to)
+            except WebfleetError:
                 return 0
             
-            data = response.json()
-            
             if not data or not isinstance(data, list):
                 return 0
             
@@ -356,27 +275,11 @@ class WebfleetAPI:
     def get_all_vehicle_locations(self):
         """Get current locations for ALL vehicles/drivers"""
         try:
-            vehicle_params = {
-                'account': self.account,
-                'username': self.username,
-                'password': self.password,
-                'apikey': self.api_key,
-                'lang': 'en',
-                'outputformat': 'json',
-                'action': 'showObjectReportExtern'
-            }
-            
-            vehicle_response = requests.get(
-                self.base_url,
-                params=vehicle_params,
-                timeout=30
-            )
-            
-            if vehicle_response.status_code != 200:
+            try:
+                vehicle_data = fetch('showObjectReportExtern')
+            except WebfleetError:
                 return {}
             
-            vehicle_data = vehicle_response.json()
-            
             if not vehicle_data or not isinstance(vehicle_data, list):
                 return {}
             
@@ -449,32 +352,19 @@ class WebfleetAPI:
         """Get all drivers with their scores from Webfleet"""
         try:
             # Try to get from Webfleet API first
-            driver_params = {
-                'account': self.account,
-                'apikey': self.api_key,
-                'lang': 'en',
-                'action': 'showDriverReportExtern',
-                'outputformat': 'json',
-                'useUTF8': 'true',
-                'useISO8601': 'true'
-            }
-            
-            driver_response = requests.get(
-                self.base_url,
-                params=driver_params,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
-            )
-            
-            if driver_response.status_code == 200:
-                drivers_list = driver_response.json()
-                if isinstance(drivers_list, list):
-                    # Add scores to each driver
-                    for driver in drivers_list:
-                        email = driver.get('email', '')
-                        if email:
-                            driver['optidrive_indicator'] = self._generate_demo_score(email)
-                    return drivers_list
+            try:
+                drivers_list = fetch('showDriverReportExtern')
+            except WebfleetError as e:
+                print(f"[WARNING] Driver API error: {e}")
+                drivers_list = None
+            
+            if isinstance(drivers_list, list):
+                # Add scores to each driver
+                for driver in drivers_list:
+                    email = driver.get('email', '')
+                    if email:
+                        driver['optidrive_indicator'] = self._generate_demo_score(email)
+                return drivers_list
             
             # Fallback to demo data
             print("[WARNING] Failed to fetch drivers from Webfleet, using demo data")
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+webfleet_client.py — shared async client for the WEBFLEET.connect CSV/JSON API.
+
+All Webfleet calls go through one httpx.AsyncClient (keep-alive pool) owned
+by a background event loop thread, so the route handlers, the OptiDrive
+scheduler and the chatbot share connections and rate limits no matter which
+thread they run on.
+
+  - fetch(action, **params)      one action, blocking (sync callers)
+  - fetch_many({name: (action, params)})
+                                 independent actions dispatched concurrently
+  - await fetch_async(action, **params)
+                                 the same from async code on any event loop
+
+Webfleet enforces per-action quotas (requests per minute, per account).
+Each action gets a token bucket sized from WEBFLEET_RATE_LIMITS, so
+concurrent refreshes queue locally instead of tripping quota errors.
+Transport errors, 429/5xx and Webfleet quota error codes are retried with
+exponential backoff and jitter.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+WEBFLEET_BASE_URL = os.getenv("WEBFLEET_BASE_URL", "https://csv.webfleet.com/extern")
+WEBFLEET_TIMEOUT = float(os.getenv("WEBFLEET_TIMEOUT", "30"))
+WEBFLEET_MAX_RETRIES = int(os.getenv("WEBFLEET_MAX_RETRIES", "3"))
+WEBFLEET_MAX_CONNECTIONS = int(os.getenv("WEBFLEET_MAX_CONNECTIONS", "10"))
+
+# Requests per minute per action (WEBFLEET.connect quotas); unknown actions use "default".
+# Override with e.g. WEBFLEET_RATE_LIMITS="showOptiDriveIndicator=6,default=10"
+DEFAULT_RATE_LIMITS = {
+    "showOptiDriveIndicator": 6,
+    "showDriverReportExtern": 10,
+    "showObjectReportExtern": 6,
+    "showEventReportExtern": 10,
+    "showDriverGroups": 10,
+    "default": 10,
+}
+
+# errorCode values Webfleet returns (with HTTP 200) when a quota is exhausted
+QUOTA_ERROR_CODES = {8011, 8014, 8015}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _rate_limits() -> Dict[str, int]:
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for part in os.getenv("WEBFLEET_RATE_LIMITS", "").split(","):
+        if "=" in part:
+            action, per_minute = part.split("=", 1)
+            limits[action.strip()] = int(per_minute)
+    return limits
+
+
+class WebfleetError(Exception):
+    def __init__(self, action: str, message: str, status: int = None, code: int = None):
+        super().__init__(f"{action}: {message}")
+        self.action = action
+        self.status = status
+        self.code = code
+
+
+class TokenBucket:
+    """`rate` tokens per minute, bursting up to `capacity`; acquire() waits for a token."""
+
+    def __init__(self, per_minute: int, capacity: int = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Take one token; returns seconds spent waiting."""
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= 1
+        return waited
+
+    def drain(self):
+        """Webfleet says the quota is spent — stop bursting until tokens refill."""
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = time.monotonic()
+
+
+class WebfleetClient:
+    def __init__(self, account: str = None, username: str = None, password: str = None,
+                 api_key: str = None, base_url: str = WEBFLEET_BASE_URL):
+        self.account = account or os.getenv("WEBFLEET_ACCOUNT")
+        self.username = username or os.getenv("WEBFLEET_USERNAME")
+        self.password = password or os.getenv("WEBFLEET_PASSWORD")
+        self.api_key = api_key or os.getenv("WEBFLEET_API_KEY")
+        self.base_url = base_url
+        self.configured = all([self.account, self.username, self.password, self.api_key])
+
+        self._limits = _rate_limits()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._stats = {"calls": 0, "retries": 0, "errors": 0, "throttled_s": 0.0}
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.username or "", self.password or ""),
+                timeout=WEBFLEET_TIMEOUT,
+                limits=httpx.Limits(max_connections=WEBFLEET_MAX_CONNECTIONS,
+                                    max_keepalive_connections=WEBFLEET_MAX_CONNECTIONS),
+            )
+        return self._http
+
+    def _bucket(self, action: str) -> TokenBucket:
+        bucket = self._buckets.get(action)
+        if bucket is None:
+            bucket = self._buckets[action] = TokenBucket(self._limits.get(action, self._limits["default"]))
+        return bucket
+
+    async def call(self, action: str, **params):
+        """Run one Webfleet action and return the parsed JSON body."""
+        query = {
+            "account": self.account,
+            "apikey": self.api_key,
+            "lang": "en",
+            "action": action,
+            "outputformat": "json",
+            "useUTF8": "true",
+            "useISO8601": "true",
+        }
+        query.update(params)
+        bucket = self._bucket(action)
+
+        for attempt in range(WEBFLEET_MAX_RETRIES + 1):
+            self._stats["throttled_s"] += await bucket.acquire()
+            self._stats["calls"] += 1
+            retry_reason = None
+            try:
+                response = await self._client().get("", params=query)
+                if response.status_code in RETRY_STATUS:
+                    retry_reason = f"HTTP {response.status_code}"
+                    if response.status_code == 429:
+                        bucket.drain()
+                elif response.status_code != 200:
+                    raise WebfleetError(action, f"HTTP {response.status_code}", status=response.status_code)
+                else:
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        raise WebfleetError(action, f"non-JSON response: {response.text[:120]!r}")
+                    code = data.get("errorCode") if isinstance(data, dict) else None
+                    if code is None:
+                        return data
+                    if int(code) not in QUOTA_ERROR_CODES:
+                        raise WebfleetError(action, data.get("errorMsg", "error"), code=int(code))
+                    retry_reason = f"quota error {code}"
+                    bucket.drain()
+            except httpx.TransportError as e:
+                retry_reason = f"{type(e).__name__}: {e}"
+            except WebfleetError:
+                self._stats["errors"] += 1
+                raise
+
+            if attempt == WEBFLEET_MAX_RETRIES:
+                self._stats["errors"] += 1
+                raise WebfleetError(action, f"gave up after {attempt + 1} attempts ({retry_reason})")
+            delay = min(30.0, 2 ** attempt) * (0.5 + random.random())
+            self._stats["retries"] += 1
+            print(f"[WEBFLEET] {action} {retry_reason} — retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def call_many(self, requests: Dict[str, Tuple[str, dict]]) -> Dict[str, object]:
+        """{name: (action, params)} → {name: result or WebfleetError}, dispatched concurrently."""
+        names = list(requests)
+        results = await asyncio.gather(
+            *(self.call(action, **(params or {})) for action, params in requests.values()),
+            return_exceptions=True,
+        )
+        return dict(zip(names, results))
+
+    def stats(self) -> dict:
+        return {
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self._stats.items()},
+            "tokens": {a: round(b.tokens, 2) for a, b in self._buckets.items()},
+        }
+
+
+# ── shared loop + sync facade ───────────────────────────────────────────────
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client: Optional[WebfleetClient] = None
+_client_lock = threading.Lock()
+
+
+def _ensure_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _client_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name="webfleet-client").start()
+                _loop = loop
+    return _loop
+
+
+def get_webfleet_client() -> WebfleetClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WebfleetClient()
+    return _client
+
+
+def _run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _ensure_loop()).result()
+
+
+def fetch(action: str, **params):
+    """Blocking call() on the shared client; raises WebfleetError."""
+    return _run(get_webfleet_client().call(action, **params))
+
+
+async def fetch_async(action: str, **params):
+    """fetch() for coroutines — awaits the shared loop without blocking the caller's loop."""
+    future = asyncio.run_coroutine_threadsafe(get_webfleet_client().call(action, **params), _ensure_loop())
+    return await asyncio.wrap_future(future)
+
+
+def fetch_many(requests: Dict[str, Tuple[str, dict]]) -> Dict[str, object]:
+    """Blocking call_many() on the shared client; failed actions come back as WebfleetError."""
+    return _run(get_webfleet_client().call_many(requests))